@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+FER2013 二进制缓存功能检查（不需要真实数据集）
+用 tools/generate_synthetic_data.py 在临时目录写一个小的合成 CSV，检查：
+    - 缓存中的各划分与 decode_fer2013_csv 的结果完全一致
+    - 缓存新鲜时直接复用，修改（touch）CSV 后自动重建
+    - 缓存损坏（魔数错误、文件被截断）时重建，缓存不可写时退回内存解码
+"""
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(script_dir))
+sys.path.insert(0, os.path.join(project_root, 'src'))
+sys.path.insert(0, os.path.join(project_root, 'tools'))
+
+from dataset import (USAGES, decode_fer2013_csv, default_cache_path, load_fer2013_cache,
+                     load_fer2013_split)
+from generate_synthetic_data import write_synthetic_csv
+
+NUM_ROWS = 300
+
+
+def check(condition, message):
+    print(f"{'✓' if condition else '✗'} {message}")
+    return condition
+
+
+def expected_splits(csv_path):
+    """直接解码 CSV 得到的各划分 {usage: (images, labels)}"""
+    images, labels, usage_codes = decode_fer2013_csv(csv_path)
+    return {usage: (images[usage_codes == code], labels[usage_codes == code])
+            for code, usage in enumerate(USAGES)}
+
+
+def splits_equal(actual, expected):
+    return all(np.array_equal(np.asarray(actual[u][0]), expected[u][0])
+               and np.array_equal(np.asarray(actual[u][1]), expected[u][1]) for u in USAGES)
+
+
+def test_round_trip(csv_path, expected):
+    print("\n[1] 缓存内容与 CSV 解码结果一致")
+    cache = load_fer2013_cache(csv_path)
+    ok = check(os.path.exists(default_cache_path(csv_path)), f"缓存已写入 {default_cache_path(csv_path)}")
+    ok &= check(len(cache) == NUM_ROWS, f"样本数 {len(cache)} == {NUM_ROWS}")
+    ok &= check(all(len(expected[u][1]) > 0 for u in USAGES), "每个划分都有样本")
+    ok &= check(splits_equal({u: cache.split(u) for u in USAGES}, expected), "各划分的图像和标签完全一致")
+    ok &= check(splits_equal({u: load_fer2013_split(csv_path, u) for u in USAGES}, expected),
+                "load_fer2013_split 返回相同结果")
+    return ok
+
+
+def test_rebuild_on_touch(csv_path, expected):
+    print("\n[2] 修改 CSV 后重建")
+    cache_path = default_cache_path(csv_path)
+    before = os.stat(cache_path).st_mtime_ns
+    load_fer2013_cache(csv_path)
+    ok = check(os.stat(cache_path).st_mtime_ns == before, "CSV 未变化时复用缓存，不重建")
+
+    stat = os.stat(csv_path)
+    new_mtime = stat.st_mtime_ns + 5 * 10 ** 9
+    os.utime(csv_path, ns=(stat.st_atime_ns, new_mtime))
+    cache = load_fer2013_cache(csv_path)
+    ok &= check(cache.header['source_mtime_ns'] == new_mtime, "touch CSV 后缓存按新的修改时间重建")
+    ok &= check(cache.is_fresh(csv_path), "重建后的缓存是新鲜的")
+    ok &= check(splits_equal({u: cache.split(u) for u in USAGES}, expected), "重建后内容不变")
+    return ok
+
+
+def test_corrupt_cache(csv_path, expected):
+    print("\n[3] 缓存损坏")
+    cache_path = default_cache_path(csv_path)
+    ok = True
+
+    with open(cache_path, 'r+b') as f:
+        f.write(b'XXXXXXXX')
+    ok &= check(splits_equal({u: load_fer2013_split(csv_path, u) for u in USAGES}, expected),
+                "魔数损坏：重建缓存并返回正确数据")
+
+    size = os.path.getsize(cache_path)
+    with open(cache_path, 'r+b') as f:
+        f.truncate(size // 2)
+    ok &= check(splits_equal({u: load_fer2013_split(csv_path, u) for u in USAGES}, expected),
+                "文件被截断：重建缓存并返回正确数据")
+    ok &= check(os.path.getsize(cache_path) == size, "重建后的缓存大小恢复")
+
+    unwritable = os.path.join(os.path.dirname(csv_path), 'missing_dir', 'fer2013.cache')
+    actual = {u: load_fer2013_split(csv_path, u, cache_path=unwritable) for u in USAGES}
+    ok &= check(splits_equal(actual, expected), "缓存不可写：退回内存解码并返回正确数据")
+    ok &= check(not os.path.exists(unwritable), "没有留下缓存文件")
+    return ok
+
+
+def main():
+    print("=" * 70)
+    print("  FER2013 二进制缓存功能检查")
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = write_synthetic_csv(os.path.join(tmp_dir, 'fer2013.csv'), num_rows=NUM_ROWS, seed=0)
+        expected = expected_splits(csv_path)
+        results = [test_round_trip(csv_path, expected),
+                   test_rebuild_on_touch(csv_path, expected),
+                   test_corrupt_cache(csv_path, expected)]
+
+    print("\n" + "=" * 70)
+    if all(results):
+        print("✓ 全部检查通过")
+        sys.exit(0)
+    print(f"✗ {results.count(False)} 项检查失败")
+    sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
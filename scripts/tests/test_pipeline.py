@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+摄像头流水线功能检查（不需要摄像头和模型）
+用合成帧源和桩 visualizer 无窗口运行 WebcamPipeline，检查：
+    - 帧源结束后剩余帧被取完，最后一帧一定被显示，流水线正常退出
+    - 丢旧队列的丢帧计数：每帧要么被显示要么被丢弃一次
+    - max_frames 对无限帧源也能结束运行
+"""
+
+import os
+import sys
+import threading
+import time
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(script_dir))
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from pipeline import DropOldestQueue, SyntheticFrameSource, WebcamPipeline, _STOP
+
+RUN_TIMEOUT = 30.0
+
+
+class StubVisualizer:
+    """只模拟耗时的 visualizer：检测 detect_delay 秒，推理 infer_delay 秒，不画任何东西"""
+
+    def __init__(self, detect_delay=0.0, infer_delay=0.0):
+        self.detect_delay = detect_delay
+        self.infer_delay = infer_delay
+
+    def locate_faces(self, frame, tracker=None):
+        time.sleep(self.detect_delay)
+        return [], [], None
+
+    def predict_located(self, frame, faces, tracks=None, prediction_cache=None):
+        time.sleep(self.infer_delay)
+        return []
+
+    def draw_prediction(self, *args, **kwargs):
+        pass
+
+    def save_frame(self, *args, **kwargs):
+        pass
+
+
+def run_pipeline(visualizer, source, **kwargs):
+    """
+    在子线程中运行流水线，超时视为没有退出
+
+    Returns:
+        (result 或 None, 显示过的帧 id 列表)
+    """
+    shown = []
+    pipeline = WebcamPipeline(visualizer, source, headless=True,
+                              on_frame=lambda frame, item: shown.append(item['id']), **kwargs)
+    box = {}
+    thread = threading.Thread(target=lambda: box.setdefault('result', pipeline.run()), daemon=True)
+    thread.start()
+    thread.join(RUN_TIMEOUT)
+    if thread.is_alive():
+        pipeline.stop_event.set()
+        return None, shown
+    return box['result'], shown
+
+
+def check(condition, message):
+    print(f"{'✓' if condition else '✗'} {message}")
+    return condition
+
+
+def test_queue():
+    print("\n[1] DropOldestQueue")
+    q = DropOldestQueue(maxsize=1)
+    for i in range(5):
+        q.put(i)
+    ok = check(q.dropped == 4, f"放入 5 个元素、容量 1 时丢弃 4 个 (dropped={q.dropped})")
+    ok &= check(q.get(timeout=0.1) == 4, "剩下的是最新的元素")
+
+    pipeline = WebcamPipeline(StubVisualizer(), SyntheticFrameSource(num_frames=0), headless=True)
+    q = DropOldestQueue(maxsize=1)
+    q.put('last')
+    q.close()
+    ok &= check(pipeline._get(q) == 'last', "close() 之后仍能取到最后一个元素")
+    ok &= check(pipeline._get(q) is _STOP, "关闭且取空后返回结束标记")
+    return ok
+
+
+def test_drain_with_drops(num_frames=60):
+    print(f"\n[2] 慢检测阶段 + 有限帧源（{num_frames} 帧，不限速）")
+    result, shown = run_pipeline(StubVisualizer(detect_delay=0.01, infer_delay=0.002),
+                                 SyntheticFrameSource(num_frames=num_frames))
+    if not check(result is not None, f"流水线在 {RUN_TIMEOUT:.0f}s 内退出"):
+        return False
+    dropped = result['dropped']
+    total_dropped = sum(dropped.values())
+    print(f"  captured={result['frames_captured']}, displayed={result['frames_displayed']}, dropped={dropped}")
+    ok = check(result['frames_captured'] == num_frames, "帧源的所有帧都被采集")
+    ok &= check(bool(shown) and shown[-1] == num_frames, f"最后一帧被显示 (last id={shown[-1] if shown else None})")
+    ok &= check(shown == sorted(shown), "显示顺序与采集顺序一致")
+    ok &= check(total_dropped > 0, "慢阶段使上游丢帧")
+    ok &= check(result['frames_displayed'] + total_dropped == num_frames,
+                "显示帧数 + 丢帧数 == 采集帧数")
+    return ok
+
+
+def test_no_drops(num_frames=20):
+    print(f"\n[3] 快处理 + 限速帧源（{num_frames} 帧，50 FPS）")
+    result, shown = run_pipeline(StubVisualizer(), SyntheticFrameSource(num_frames=num_frames, fps=50),
+                                 queue_size=4)
+    if not check(result is not None, f"流水线在 {RUN_TIMEOUT:.0f}s 内退出"):
+        return False
+    ok = check(shown == list(range(1, num_frames + 1)), f"全部 {num_frames} 帧按顺序显示")
+    ok &= check(sum(result['dropped'].values()) == 0, "没有丢帧")
+    return ok
+
+
+def test_max_frames(max_frames=15):
+    print(f"\n[4] max_frames={max_frames} + 无限帧源")
+    result, shown = run_pipeline(StubVisualizer(infer_delay=0.002), SyntheticFrameSource(num_frames=None),
+                                 max_frames=max_frames)
+    if not check(result is not None, f"流水线在 {RUN_TIMEOUT:.0f}s 内退出"):
+        return False
+    ok = check(result['frames_displayed'] == max_frames, f"显示 {max_frames} 帧后停止")
+    ok &= check(len(shown) == max_frames, "on_frame 回调次数与显示帧数一致")
+    return ok
+
+
+def main():
+    print("=" * 70)
+    print("  摄像头流水线功能检查（无窗口）")
+    print("=" * 70)
+
+    results = [test_queue(), test_drain_with_drops(), test_no_drops(), test_max_frames()]
+
+    print("\n" + "=" * 70)
+    if all(results):
+        print("✓ 全部检查通过")
+        sys.exit(0)
+    print(f"✗ {results.count(False)} 项检查失败")
+    sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+# backends.py
+"""
+推理后端
+统一接口 predict(inputs) -> 概率：输入 float32 [N, 1, 48, 48]，输出 [N, num_classes]（已做 softmax）
+
+    mindspore    训练框架直接运行检查点（.ckpt），GRAPH_MODE
+    lite         MindSpore Lite 运行导出的 MindIR（.mindir）
+    onnxruntime  ONNX Runtime CPU 运行导出的 ONNX（.onnx）
+
+导出的模型由 export.py 生成，输入批大小固定，predict 会自动分块并补零。
+各后端的依赖在创建时才导入，只用 ONNX Runtime / Lite 时不会加载 MindSpore 训练框架。
+"""
+import json
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+
+# 已注册的后端：name -> class
+BACKENDS = OrderedDict()
+
+# 按文件扩展名自动选择后端
+BACKEND_BY_EXTENSION = {
+    '.ckpt': 'mindspore',
+    '.mindir': 'lite',
+    '.ms': 'lite',
+    '.onnx': 'onnxruntime',
+}
+
+
+def register_backend(cls):
+    """注册后端类（类装饰器）"""
+    BACKENDS[cls.name] = cls
+    return cls
+
+
+def artifact_meta_path(path):
+    """导出模型的描述文件路径（与模型同名的 .json）"""
+    return os.path.splitext(path)[0] + '.json'
+
+
+def read_artifact_meta(path):
+    """读取导出模型的描述文件，不存在时返回空字典"""
+    meta_path = artifact_meta_path(path)
+    if not os.path.exists(meta_path):
+        return {}
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _require(module, package):
+    """导入可选依赖，缺失时给出安装提示"""
+    try:
+        return __import__(module, fromlist=['_'])
+    except ImportError as e:
+        raise ImportError(f"{module} is required for this backend. Install it with: pip install {package}") from e
+
+
+class InferenceBackend:
+    """
+    推理后端基类
+
+    子类实现 run(batch)；batch_size 不为 None 时模型输入批大小固定，
+    predict 负责把任意数量的输入分块并补零到该大小。
+    """
+
+    name = None
+
+    def __init__(self, path):
+        self.path = path
+        self.batch_size = None
+        self._buffer = None
+
+    def run(self, batch):
+        """对一个批次做前向推理，返回概率数组"""
+        raise NotImplementedError
+
+    def predict(self, inputs):
+        """
+        Args:
+            inputs: float32 数组 [N, 1, 48, 48]
+
+        Returns:
+            概率数组 [N, num_classes]
+        """
+        inputs = np.ascontiguousarray(inputs, dtype=np.float32)
+        if self.batch_size is None or len(inputs) == self.batch_size:
+            return np.asarray(self.run(inputs))
+
+        if self._buffer is None:
+            self._buffer = np.zeros((self.batch_size,) + inputs.shape[1:], dtype=np.float32)
+        outputs = []
+        for start in range(0, len(inputs), self.batch_size):
+            chunk = inputs[start:start + self.batch_size]
+            n = len(chunk)
+            if n == self.batch_size:
+                outputs.append(np.asarray(self.run(chunk)))
+                continue
+            self._buffer[:n] = chunk
+            self._buffer[n:] = 0
+            outputs.append(np.asarray(self.run(self._buffer))[:n])
+        return np.concatenate(outputs) if outputs else np.empty((0, 0), dtype=np.float32)
+
+    def describe(self):
+        batch = self.batch_size if self.batch_size is not None else 'dynamic'
+        return f"{self.name} ({os.path.basename(self.path)}, batch={batch})"
+
+    def close(self):
+        pass
+
+
+@register_backend
+class MindSporeBackend(InferenceBackend):
+    """MindSpore 训练框架直接运行检查点（默认折叠 BatchNorm、移除 Dropout）"""
+
+    name = 'mindspore'
+
+    def __init__(self, path, device_target='CPU', num_threads=None, architecture=None, optimize=True):
+        super().__init__(path)
+        import mindspore as ms
+        from mindspore import context
+        from model_registry import load_network
+
+        context.set_context(mode=context.GRAPH_MODE, device_target=device_target)
+        self._ms = ms
+        self.net = load_network(path, architecture=architecture, optimize=optimize)
+
+    def run(self, batch):
+        output = self.net(self._ms.Tensor(batch))
+        return self._ms.ops.softmax(output).asnumpy()
+
+
+@register_backend
+class LiteBackend(InferenceBackend):
+    """MindSpore Lite 运行导出的 MindIR"""
+
+    name = 'lite'
+
+    def __init__(self, path, device_target='CPU', num_threads=None, architecture=None):
+        super().__init__(path)
+        mslite = _require('mindspore_lite', 'mindspore-lite')
+
+        lite_context = mslite.Context()
+        lite_context.target = ['cpu']
+        if num_threads:
+            lite_context.cpu.thread_num = num_threads
+
+        model_type = mslite.ModelType.MINDIR if path.endswith('.mindir') else mslite.ModelType.MINDIR_LITE
+        self.model = mslite.Model()
+        self.model.build_from_file(path, model_type, lite_context)
+        self.inputs = self.model.get_inputs()
+        self.batch_size = int(self.inputs[0].shape[0])
+
+    def run(self, batch):
+        self.inputs[0].set_data_from_numpy(batch)
+        outputs = self.model.predict(self.inputs)
+        return outputs[0].get_data_to_numpy()
+
+
+@register_backend
+class OnnxRuntimeBackend(InferenceBackend):
+    """ONNX Runtime CPU 运行导出的 ONNX"""
+
+    name = 'onnxruntime'
+
+    def __init__(self, path, device_target='CPU', num_threads=None, architecture=None):
+        super().__init__(path)
+        ort = _require('onnxruntime', 'onnxruntime')
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        batch = model_input.shape[0]
+        self.batch_size = batch if isinstance(batch, int) else None
+
+    def run(self, batch):
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+def load_backend(path, backend=None, device_target='CPU', num_threads=None, architecture=None):
+    """
+    创建推理后端
+
+    Args:
+        path: 检查点或导出的模型路径
+        backend: 后端名称（None 或 'auto' 表示按扩展名选择）
+        device_target: MindSpore 后端的设备类型
+        num_threads: 推理线程数（None 表示后端默认）
+        architecture: MindSpore 后端的模型结构名称（None 表示自动识别）
+
+    Returns:
+        InferenceBackend
+    """
+    if backend in (None, 'auto'):
+        ext = os.path.splitext(path)[1].lower()
+        backend = BACKEND_BY_EXTENSION.get(ext, 'mindspore')
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend: {backend}. Available: {', '.join(BACKENDS)}")
+
+    instance = BACKENDS[backend](path, device_target=device_target, num_threads=num_threads,
+                                 architecture=architecture)
+    print(f"[INFO] Inference backend: {instance.describe()}")
+    return instance
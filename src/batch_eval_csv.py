@@ -7,14 +7,12 @@
 import argparse
 import numpy as np
 import pandas as pd
-import mindspore as ms
-from mindspore import context
-from mindspore.train.serialization import load_checkpoint, load_param_into_net
 import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 from matplotlib.patches import Patch
 import os
+import time
 from tqdm import tqdm
 
 # 添加 src 目录到路径
@@ -22,11 +20,8 @@ import sys
 script_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, script_dir)
 
-from model import SimpleCNN
-try:
-    from model_legacy import SimpleCNN_Legacy
-except ImportError:
-    SimpleCNN_Legacy = None
+from dataset import load_fer2013_split
+from backends import load_backend, BACKENDS
 
 # 表情标签
 EMOTIONS = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
@@ -44,53 +39,25 @@ EMOTION_COLORS = {
 class CSVBatchEvaluator:
     """CSV 批量评估器"""
 
-    def __init__(self, ckpt_path, device_target='CPU', output_dir='output/batch'):
+    def __init__(self, ckpt_path, device_target='CPU', output_dir='output/batch', backend=None):
         """
         初始化评估器
 
         Args:
-            ckpt_path: 模型检查点路径
+            ckpt_path: 模型检查点或导出的推理模型路径（.ckpt / .mindir / .onnx）
             device_target: 设备类型
             output_dir: 输出目录
+            backend: 推理后端名称（None 表示按文件扩展名选择，见 backends.BACKENDS）
         """
-        context.set_context(mode=context.GRAPH_MODE, device_target=device_target)
-
         print(f"[INFO] Loading model from {ckpt_path}")
-        self.net = self._load_model_with_auto_detection(ckpt_path)
-        self.net.set_train(False)
+        self.backend = load_backend(ckpt_path, backend=backend, device_target=device_target)
+        self.net = getattr(self.backend, 'net', None)
 
         self.output_dir = output_dir
         os.makedirs(output_dir, exist_ok=True)
 
         print(f"[INFO] Evaluator initialized. Output: {output_dir}")
 
-    def _load_model_with_auto_detection(self, ckpt_path):
-        """自动检测并加载正确版本的模型"""
-        param_dict = load_checkpoint(ckpt_path)
-        classifier_key = 'classifier.0.weight'
-
-        if classifier_key in param_dict:
-            classifier_shape = param_dict[classifier_key].shape
-            print(f"[INFO] Detected classifier shape: {classifier_shape}")
-
-            if classifier_shape == (128, 128):
-                if SimpleCNN_Legacy is None:
-                    print("[ERROR] Legacy model detected but model_legacy.py not found")
-                    raise ImportError("Please ensure model_legacy.py exists in src/")
-                print("[INFO] Loading legacy model (128 -> 128 -> 7)")
-                net = SimpleCNN_Legacy(7)
-            else:
-                print("[INFO] Loading current model (512 -> 256 -> 128 -> 7)")
-                net = SimpleCNN(7)
-
-            load_param_into_net(net, param_dict)
-            return net
-        else:
-            print("[WARNING] Cannot determine model version, using current model")
-            net = SimpleCNN(7)
-            load_param_into_net(net, param_dict)
-            return net
-
     def preprocess_pixels(self, pixels_str):
         """
         预处理像素字符串
@@ -122,14 +89,122 @@ class CSVBatchEvaluator:
             (emotion_idx, probability, all_probs)
         """
         tensor = self.preprocess_pixels(pixels_str)
-        output = self.net(ms.Tensor(tensor))
-        probs = ms.ops.softmax(output)[0].asnumpy()
+        probs = self.backend.predict(tensor)[0]
 
         idx = int(np.argmax(probs))
         probability = float(probs[idx])
 
         return idx, probability, probs
 
+    def predict_batch(self, images, batch_size=256):
+        """
+        按固定批大小批量预测
+
+        Args:
+            images: uint8 数组 (N, 48, 48)，可以是内存映射
+            batch_size: 每次前向推理的样本数，最后一批补零到相同大小以避免重新编译
+
+        Returns:
+            概率数组 (N, 7)
+        """
+        num = len(images)
+        probs = np.empty((num, len(EMOTIONS)), dtype=np.float32)
+        buffer = np.zeros((batch_size, 1, 48, 48), dtype=np.float32)
+
+        for start in range(0, num, batch_size):
+            chunk = images[start:start + batch_size]
+            n = len(chunk)
+            buffer[:n, 0] = chunk
+            buffer[:n] /= 255.0
+            buffer[n:] = 0
+            probs[start:start + n] = self.backend.predict(buffer)[:n]
+
+        return probs
+
+    def evaluate_split(self, csv_path, usage='PrivateTest', batch_size=256):
+        """
+        单次遍历评估整个划分
+
+        划分只解码一次（使用 FER2013 缓存），按固定批大小流式推理，
+        混淆矩阵在整批上用向量化计数累积。
+
+        Args:
+            csv_path: CSV 文件路径
+            usage: 使用哪个数据集 (Training/PublicTest/PrivateTest)
+            batch_size: 批大小
+
+        Returns:
+            (混淆矩阵 [7, 7]（行: 真实类别，列: 预测类别）, 吞吐量 images/sec)
+        """
+        images, labels = load_fer2013_split(csv_path, usage)
+        print(f"[INFO] Found {len(labels)} images in {usage} set")
+
+        num_classes = len(EMOTIONS)
+        confusion = np.zeros((num_classes, num_classes), dtype=np.int64)
+
+        start_time = time.time()
+        for start in tqdm(range(0, len(labels), batch_size), desc=f"Evaluating {usage}"):
+            batch_labels = labels[start:start + batch_size].astype(np.int64)
+            probs = self.predict_batch(images[start:start + batch_size], batch_size)
+            preds = np.argmax(probs, axis=1)
+            confusion += np.bincount(batch_labels * num_classes + preds,
+                                     minlength=num_classes * num_classes).reshape(num_classes, num_classes)
+        elapsed = time.time() - start_time
+
+        throughput = len(labels) / elapsed if elapsed > 0 else 0.0
+        print(f"[INFO] Evaluated {len(labels)} images in {elapsed:.2f}s ({throughput:.1f} images/sec)")
+        return confusion, throughput
+
+    def results_from_confusion(self, confusion):
+        """
+        把混淆矩阵拆成与 evaluate_category 相同格式的逐类别结果
+
+        Args:
+            confusion: 混淆矩阵 [7, 7]
+
+        Returns:
+            结果字典列表（跳过没有样本的类别）
+        """
+        results = []
+        for emotion_idx, emotion_name in enumerate(EMOTIONS):
+            row = confusion[emotion_idx]
+            total = int(row.sum())
+            if total == 0:
+                print(f"\n[WARNING] No data found for {emotion_name}")
+                continue
+
+            correct = int(row[emotion_idx])
+            results.append({
+                'category': emotion_name,
+                'total': total,
+                'correct': correct,
+                'accuracy': correct / total,
+                'distribution': {e: int(c) for e, c in zip(EMOTIONS, row)}
+            })
+        return results
+
+    def print_category_result(self, result):
+        """打印单个类别的评估结果"""
+        category_name = result['category']
+        total = result['total']
+
+        print(f"\n[INFO] Category: {category_name.upper()}")
+        print(f"[INFO] Total images: {total}")
+        print(f"[INFO] Correct predictions: {result['correct']}")
+        print(f"[INFO] Accuracy: {result['accuracy']:.2%}")
+        print("\n[STATISTICS] Prediction distribution:")
+        for emotion, count in result['distribution'].items():
+            percentage = count / total * 100 if total > 0 else 0
+            marker = " ← TRUE LABEL" if emotion == category_name else ""
+            print(f"  {emotion}: {count} ({percentage:.1f}%){marker}")
+
+    def save_confusion_matrix(self, confusion):
+        """保存混淆矩阵为 CSV"""
+        output_path = os.path.join(self.output_dir, 'confusion_matrix.csv')
+        df = pd.DataFrame(confusion, index=EMOTIONS, columns=EMOTIONS)
+        df.to_csv(output_path)
+        print(f"[SAVE] Confusion matrix saved to {output_path}")
+
     def evaluate_category(self, df_category, category_name):
         """
         评估单个类别
@@ -172,58 +247,42 @@ class CSVBatchEvaluator:
         # 计算准确率
         accuracy = correct / total if total > 0 else 0
 
-        print(f"\n[INFO] Category: {category_name.upper()}")
-        print(f"[INFO] Total images: {total}")
-        print(f"[INFO] Correct predictions: {correct}")
-        print(f"[INFO] Accuracy: {accuracy:.2%}")
-        print("\n[STATISTICS] Prediction distribution:")
-        for emotion, count in emotion_counts.items():
-            percentage = count / total * 100 if total > 0 else 0
-            marker = " ← TRUE LABEL" if emotion == category_name else ""
-            print(f"  {emotion}: {count} ({percentage:.1f}%){marker}")
-
-        return {
+        result = {
             'category': category_name,
             'total': total,
             'correct': correct,
             'accuracy': accuracy,
             'distribution': emotion_counts
         }
+        self.print_category_result(result)
+        return result
 
-    def evaluate_all_categories(self, csv_path, usage='PrivateTest'):
+    def evaluate_all_categories(self, csv_path, usage='PrivateTest', batch_size=256):
         """
         评估所有类别
 
         Args:
             csv_path: CSV 文件路径
             usage: 使用哪个数据集 (Training/PublicTest/PrivateTest)
+            batch_size: 批大小
         """
         print("\n" + "="*70)
         print("CSV BATCH EVALUATION - ALL CATEGORIES")
         print("="*70)
         print(f"[INFO] CSV file: {csv_path}")
         print(f"[INFO] Usage: {usage}")
+        print(f"[INFO] Batch size: {batch_size}")
 
-        # 读取 CSV
+        # 单次遍历得到混淆矩阵，再按类别拆分
         print("\n[INFO] Loading CSV file...")
-        df = pd.read_csv(csv_path)
-
-        # 过滤指定的数据集
-        df = df[df['Usage'] == usage]
-        print(f"[INFO] Found {len(df)} images in {usage} set")
-
-        # 按类别分组
-        all_results = []
-        for emotion_idx, emotion_name in enumerate(EMOTIONS):
-            df_category = df[df['emotion'] == emotion_idx]
-
-            if len(df_category) == 0:
-                print(f"\n[WARNING] No data found for {emotion_name}")
-                continue
+        confusion, throughput = self.evaluate_split(csv_path, usage, batch_size)
+        all_results = self.results_from_confusion(confusion)
 
-            # 评估该类别
-            result = self.evaluate_category(df_category, emotion_name)
-            all_results.append(result)
+        for result in all_results:
+            print(f"\n{'='*70}")
+            print(f"Category: {result['category'].upper()}")
+            print(f"{'='*70}")
+            self.print_category_result(result)
 
             # 保存统计图
             self.save_statistics(
@@ -232,15 +291,26 @@ class CSVBatchEvaluator:
                 result['accuracy']
             )
 
+        print("\n[STATISTICS] Confusion matrix (rows: true, cols: predicted):")
+        print(confusion)
+        self.save_confusion_matrix(confusion)
+
         # 生成总体报告
         if len(all_results) > 0:
             self.generate_overall_report(all_results)
 
+        total = int(confusion.sum())
+        overall_acc = np.trace(confusion) / total if total > 0 else 0
+        print(f"[INFO] Overall accuracy: {overall_acc:.2%}")
+        print(f"[INFO] Throughput: {throughput:.1f} images/sec")
+
         print(f"\n{'='*70}")
         print("ALL CATEGORIES EVALUATED!")
         print(f"Results saved to: {self.output_dir}")
         print(f"{'='*70}\n")
 
+        return all_results
+
     def save_statistics(self, emotion_counts, category_name, accuracy):
         """保存统计图"""
         fig, ax = plt.subplots(figsize=(10, 6))
@@ -377,7 +447,9 @@ def main():
     parser.add_argument('--csv', type=str, required=True,
                        help='FER2013 CSV 文件路径')
     parser.add_argument('--ckpt', type=str, required=True,
-                       help='模型检查点路径')
+                       help='模型检查点或导出的推理模型路径 (.ckpt / .mindir / .onnx)')
+    parser.add_argument('--backend', type=str, default='auto', choices=['auto'] + list(BACKENDS),
+                       help='推理后端 (默认: auto，按文件扩展名选择)')
     parser.add_argument('--usage', type=str, default='PrivateTest',
                        choices=['Training', 'PublicTest', 'PrivateTest'],
                        help='使用哪个数据集 (默认: PrivateTest)')
@@ -386,6 +458,8 @@ def main():
                        help='计算设备')
     parser.add_argument('--output', type=str, default='output/batch_csv',
                        help='输出目录')
+    parser.add_argument('--batch_size', type=int, default=256,
+                       help='推理批大小 (默认: 256)')
 
     args = parser.parse_args()
 
@@ -402,11 +476,12 @@ def main():
     evaluator = CSVBatchEvaluator(
         ckpt_path=args.ckpt,
         device_target=args.device,
-        output_dir=args.output
+        output_dir=args.output,
+        backend=args.backend
     )
 
     # 评估所有类别
-    evaluator.evaluate_all_categories(args.csv, args.usage)
+    evaluator.evaluate_all_categories(args.csv, args.usage, args.batch_size)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+SimpleCNN 逐 Cell 前向计时（PyNative 模式）
+CellTimer 在启用时把选中子 Cell 的 construct 替换为带计时的包装，detach 后恢复原方法；
+未启用时网络上没有任何包装，推理没有额外开销。
+
+每个 Cell 统计包含子 Cell 的总时间（inclusive）和去掉被计时子 Cell 后的自身时间（self），
+计时前后同步设备，结果为实际执行时间而不是下发时间。
+
+命令行在多个批大小下各运行 N 次，输出按自身时间排序的热点表和 JSON。
+
+与 tools/profile_model.py 的延迟列不同：那里在图模式下把每个单元单独编译、单独计时（中位数），
+反映的是该单元编译后的计算量；这里在 PyNative 模式下对整网一次前向中的各 Cell 计时（均值），
+包含逐算子下发开销和 Cell 之间的相互影响，适合找 PyNative/调试场景下的热点。
+两者数值不能直接比较，参数量、FLOPs 和注意力消融只在 profile_model.py 中提供。
+
+示例:
+    python src/cell_timing.py --ckpt_path checkpoints/best_model.ckpt --batch_sizes 1 4 32 --runs 50
+"""
+
+import argparse
+import fnmatch
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+
+import numpy as np
+import mindspore as ms
+from mindspore import Tensor
+
+
+# 默认计时的子 Cell：stem、各 stage、每个残差块、注意力模块和分类器
+DEFAULT_PATTERNS = (
+    'conv1', 'bn1', 'layer?', 'layer?.[0-9]', 'layer?.[0-9][0-9]',
+    'layer?.*.channel_attention', 'layer?.*.spatial_attention', 'classifier',
+)
+
+
+def _resolve_synchronize():
+    for module in ('runtime', 'hal'):
+        sync = getattr(getattr(ms, module, None), 'synchronize', None)
+        if sync is not None:
+            return sync
+    return lambda: None
+
+
+class CellTimer:
+    """
+    子 Cell 前向计时器
+
+    Args:
+        net: 网络（需在 PyNative 模式下运行）
+        patterns: 要计时的子 Cell 名称（fnmatch 通配符），None 表示所有子 Cell
+
+    用法:
+        with CellTimer(net) as timer:
+            net(x)
+        rows = timer.summary(runs=1)
+    """
+
+    def __init__(self, net, patterns=DEFAULT_PATTERNS):
+        self.net = net
+        self.cells = OrderedDict(
+            (name, cell) for name, cell in net.cells_and_names()
+            if name and (patterns is None or any(fnmatch.fnmatchcase(name, p) for p in patterns)))
+        self.stats = OrderedDict((name, {'calls': 0, 'total': 0.0, 'self': 0.0}) for name in self.cells)
+        self._stack = []
+        self._attached = False
+        self._sync = _resolve_synchronize()
+
+    def _wrap(self, name, construct):
+        stats = self.stats[name]
+        stack = self._stack
+        sync = self._sync
+
+        def timed_construct(*args, **kwargs):
+            sync()
+            stack.append(0.0)
+            start = time.perf_counter()
+            output = construct(*args, **kwargs)
+            sync()
+            elapsed = time.perf_counter() - start
+            child_time = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            stats['calls'] += 1
+            stats['total'] += elapsed
+            stats['self'] += elapsed - child_time
+            return output
+
+        return timed_construct
+
+    def attach(self):
+        """给选中的 Cell 装上计时包装（实例属性覆盖类方法）"""
+        if ms.get_context('mode') != ms.PYNATIVE_MODE:
+            raise RuntimeError("CellTimer requires PyNative mode: "
+                               "context.set_context(mode=context.PYNATIVE_MODE)")
+        if not self._attached:
+            for name, cell in self.cells.items():
+                object.__setattr__(cell, 'construct', self._wrap(name, cell.construct))
+            self._attached = True
+        return self
+
+    def detach(self):
+        """移除计时包装，恢复原 construct"""
+        if self._attached:
+            for cell in self.cells.values():
+                cell.__dict__.pop('construct', None)
+            self._attached = False
+        self._stack.clear()
+
+    def reset(self):
+        for stats in self.stats.values():
+            stats.update(calls=0, total=0.0, self=0.0)
+
+    def __enter__(self):
+        return self.attach()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.detach()
+        return False
+
+    def summary(self, runs):
+        """
+        Returns:
+            按自身时间降序的 [{'name', 'calls', 'total_ms', 'self_ms'}]，时间为每次前向的平均值
+        """
+        rows = [{
+            'name': name,
+            'calls': stats['calls'] // max(1, runs),
+            'total_ms': stats['total'] * 1000 / max(1, runs),
+            'self_ms': stats['self'] * 1000 / max(1, runs),
+        } for name, stats in self.stats.items() if stats['calls']]
+        rows.sort(key=lambda r: r['self_ms'], reverse=True)
+        return rows
+
+
+def time_forward(net, x, runs, warmup=3):
+    """不装计时包装时的前向平均延迟（毫秒）"""
+    sync = _resolve_synchronize()
+    for _ in range(warmup):
+        net(x)
+    sync()
+    start = time.perf_counter()
+    for _ in range(runs):
+        net(x)
+    sync()
+    return (time.perf_counter() - start) * 1000 / runs
+
+
+def profile_batch_size(net, timer, batch_size, runs, warmup=3):
+    """
+    在一个批大小下计时
+
+    Returns:
+        {'batch_size', 'forward_ms', 'instrumented_ms', 'cells'}
+    """
+    x = Tensor(np.random.rand(batch_size, 1, 48, 48).astype(np.float32))
+    forward_ms = time_forward(net, x, runs, warmup)
+
+    timer.reset()
+    with timer:
+        for _ in range(warmup):
+            net(x)
+        timer.reset()
+        start = time.perf_counter()
+        for _ in range(runs):
+            net(x)
+        instrumented_ms = (time.perf_counter() - start) * 1000 / runs
+    return {
+        'batch_size': batch_size,
+        'forward_ms': forward_ms,
+        'instrumented_ms': instrumented_ms,
+        'cells': timer.summary(runs),
+    }
+
+
+def print_report(result, top=None):
+    forward_ms = result['forward_ms']
+    print(f"\nBatch size {result['batch_size']}: {forward_ms:.3f} ms per forward "
+          f"({result['instrumented_ms']:.3f} ms instrumented)")
+    print(f"{'Cell':<34} {'Calls':>6} {'Self(ms)':>10} {'Total(ms)':>10} {'Self%':>7}")
+    print("-" * 71)
+    cells = result['cells'][:top] if top else result['cells']
+    for r in cells:
+        print(f"{r['name']:<34} {r['calls']:>6} {r['self_ms']:>10.3f} {r['total_ms']:>10.3f} "
+              f"{r['self_ms'] / result['instrumented_ms']:>7.1%}")
+
+
+def main():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, script_dir)
+    from mindspore import context
+    from model import SimpleCNN
+    from model_registry import load_network
+    from optimize import optimize_for_inference
+
+    parser = argparse.ArgumentParser(description='SimpleCNN 逐 Cell 前向计时（PyNative 模式）')
+    parser.add_argument('--ckpt_path', type=str, default=None, help='检查点路径（不给时使用随机初始化的 SimpleCNN）')
+    parser.add_argument('--batch_sizes', type=int, nargs='+', default=[1, 4, 32], help='计时的批大小')
+    parser.add_argument('--runs', type=int, default=50, help='每个批大小的前向次数')
+    parser.add_argument('--warmup', type=int, default=3, help='预热次数')
+    parser.add_argument('--cells', type=str, nargs='+', default=None,
+                        help='要计时的子 Cell 名称通配符（默认 stem、stage、残差块、注意力、分类器）')
+    parser.add_argument('--all_cells', action='store_true', help='计时所有子 Cell（开销较大）')
+    parser.add_argument('--no_optimize', action='store_true', help='不折叠 BatchNorm（默认按推理图计时）')
+    parser.add_argument('--top', type=int, default=None, help='表格只显示前 N 个热点')
+    parser.add_argument('--device_target', type=str, default='CPU', choices=['CPU', 'GPU', 'Ascend'])
+    parser.add_argument('--output', type=str, default='cell_timing.json', help='结果 JSON 保存路径')
+    args = parser.parse_args()
+
+    context.set_context(mode=context.PYNATIVE_MODE, device_target=args.device_target)
+
+    if args.ckpt_path:
+        net = load_network(args.ckpt_path, cached=False, optimize=not args.no_optimize)
+    else:
+        net = SimpleCNN(num_classes=7)
+        net.set_train(False)
+        if not args.no_optimize:
+            net, _ = optimize_for_inference(net)
+
+    patterns = None if args.all_cells else (args.cells or DEFAULT_PATTERNS)
+    timer = CellTimer(net, patterns)
+    print(f"[INFO] Timing {len(timer.cells)} cells, {args.runs} runs per batch size")
+
+    results = []
+    for batch_size in args.batch_sizes:
+        result = profile_batch_size(net, timer, batch_size, args.runs, args.warmup)
+        print_report(result, args.top)
+        results.append(result)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'checkpoint': args.ckpt_path, 'optimized': not args.no_optimize, 'runs': args.runs,
+                   'device_target': args.device_target, 'results': results}, f, indent=2)
+    print(f"\n[SAVE] Results saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,34 +1,225 @@
 import csv
+import json
+import os
 import numpy as np
 import pandas as pd
 import cv2
 from pathlib import Path
 
+from augment import BatchAugmenter
+
+
+# FER2013 缓存格式版本：格式变化时递增，旧缓存会被自动重建
+CACHE_VERSION = 1
+CACHE_MAGIC = b'FER2013C'
+USAGES = ('Training', 'PublicTest', 'PrivateTest')
+IMAGE_SIZE = 48
+_CACHE_ALIGN = 64
+
+
+def default_cache_path(csv_path):
+    """缓存文件默认放在 CSV 旁边，文件名带版本号，例如 fer2013.v1.cache"""
+    root, _ = os.path.splitext(str(csv_path))
+    return f'{root}.v{CACHE_VERSION}.cache'
+
+
+def decode_fer2013_csv(csv_path):
+    """
+    一次性把 FER2013 CSV 解码为紧凑数组
+
+    Args:
+        csv_path: fer2013.csv 路径
+
+    Returns:
+        (images, labels, usage): uint8 (N,48,48)、uint8 (N,)、uint8 (N,)
+        usage 为 USAGES 中的下标，未知用途记为 len(USAGES)
+    """
+    df = pd.read_csv(csv_path)
+    num = len(df)
+
+    images = np.empty((num, IMAGE_SIZE, IMAGE_SIZE), dtype=np.uint8)
+    for i, img_str in enumerate(df['pixels'].values):
+        images[i] = np.asarray(img_str.split(), dtype=np.uint8).reshape(IMAGE_SIZE, IMAGE_SIZE)
+
+    labels = df['emotion'].values.astype(np.uint8)
+    usage_codes = {name: code for code, name in enumerate(USAGES)}
+    usage = np.array([usage_codes.get(u, len(USAGES)) for u in df['Usage'].values], dtype=np.uint8)
+    return images, labels, usage
+
+
+def _source_signature(csv_path):
+    stat = os.stat(csv_path)
+    return {'source_size': stat.st_size, 'source_mtime_ns': stat.st_mtime_ns}
+
+
+def _align(offset):
+    return (offset + _CACHE_ALIGN - 1) // _CACHE_ALIGN * _CACHE_ALIGN
+
+
+def build_fer2013_cache(csv_path, cache_path=None):
+    """
+    将 fer2013.csv 转换为预解码的二进制缓存
+
+    文件布局: MAGIC | 头长度(uint32) | JSON 头 | labels | usage | images
+    样本按 Usage 稳定排序，使每个划分在文件中是连续的一段，可以直接内存映射切片。
+
+    Args:
+        csv_path: fer2013.csv 路径
+        cache_path: 缓存路径（默认 default_cache_path(csv_path)）
+
+    Returns:
+        缓存文件路径
+    """
+    cache_path = cache_path or default_cache_path(csv_path)
+    print(f"[INFO] Building FER2013 cache: {csv_path} -> {cache_path}")
+
+    images, labels, usage = decode_fer2013_csv(csv_path)
+    order = np.argsort(usage, kind='stable')
+    images, labels, usage = images[order], labels[order], usage[order]
+
+    splits = {}
+    for code, name in enumerate(USAGES):
+        start, stop = np.searchsorted(usage, [code, code + 1])
+        splits[name] = [int(start), int(stop)]
+
+    num = len(labels)
+    header = {'version': CACHE_VERSION, 'num_samples': num, 'splits': splits}
+    header.update(_source_signature(csv_path))
+
+    header_bytes = json.dumps(header).encode('utf-8')
+    labels_offset = _align(len(CACHE_MAGIC) + 4 + len(header_bytes))
+    usage_offset = _align(labels_offset + num)
+    images_offset = _align(usage_offset + num)
+
+    # 写临时文件再原子替换，避免中断后留下损坏的缓存
+    tmp_path = f'{cache_path}.tmp{os.getpid()}'
+    with open(tmp_path, 'wb') as f:
+        f.write(CACHE_MAGIC)
+        f.write(np.uint32(len(header_bytes)).tobytes())
+        f.write(header_bytes)
+        for offset, array in ((labels_offset, labels), (usage_offset, usage), (images_offset, images)):
+            f.seek(offset)
+            f.write(np.ascontiguousarray(array).tobytes())
+    os.replace(tmp_path, cache_path)
+
+    print(f"[INFO] Cached {num} images ({os.path.getsize(cache_path) / 1024 / 1024:.1f} MB)")
+    return cache_path
+
+
+class FER2013Cache:
+    """内存映射的 FER2013 预解码缓存"""
+
+    def __init__(self, cache_path):
+        with open(cache_path, 'rb') as f:
+            magic = f.read(len(CACHE_MAGIC))
+            if magic != CACHE_MAGIC:
+                raise ValueError(f"Not a FER2013 cache file: {cache_path}")
+            header_len = int(np.frombuffer(f.read(4), dtype=np.uint32)[0])
+            self.header = json.loads(f.read(header_len).decode('utf-8'))
+
+        num = self.header['num_samples']
+        labels_offset = _align(len(CACHE_MAGIC) + 4 + header_len)
+        usage_offset = _align(labels_offset + num)
+        images_offset = _align(usage_offset + num)
+
+        self.cache_path = cache_path
+        self.labels = np.fromfile(cache_path, dtype=np.uint8, count=num, offset=labels_offset)
+        self.usage = np.fromfile(cache_path, dtype=np.uint8, count=num, offset=usage_offset)
+        self.images = np.memmap(cache_path, dtype=np.uint8, mode='r', offset=images_offset,
+                                shape=(num, IMAGE_SIZE, IMAGE_SIZE))
+
+    @property
+    def version(self):
+        return self.header.get('version')
+
+    def is_fresh(self, csv_path):
+        """缓存版本与源 CSV 的大小、修改时间均匹配时才可复用"""
+        if self.version != CACHE_VERSION:
+            return False
+        signature = _source_signature(csv_path)
+        return all(self.header.get(k) == v for k, v in signature.items())
+
+    def split(self, usage):
+        """
+        返回某个划分的 (images, labels)
+
+        images 是内存映射切片，不会读入整个文件；usage 不在 USAGES 中时返回全部样本。
+        """
+        if usage not in self.header['splits']:
+            return self.images, self.labels
+        start, stop = self.header['splits'][usage]
+        return self.images[start:stop], self.labels[start:stop]
+
+    def __len__(self):
+        return len(self.labels)
+
+
+def load_fer2013_cache(csv_path, cache_path=None, rebuild=False):
+    """
+    打开 CSV 对应的缓存，不存在、版本不符或源文件已变化时自动重建
+
+    Args:
+        csv_path: fer2013.csv 路径
+        cache_path: 缓存路径（默认 default_cache_path(csv_path)）
+        rebuild: 强制重建
+
+    Returns:
+        FER2013Cache
+    """
+    cache_path = cache_path or default_cache_path(csv_path)
+
+    if not rebuild and os.path.exists(cache_path):
+        try:
+            cache = FER2013Cache(cache_path)
+            if cache.is_fresh(csv_path):
+                return cache
+            print(f"[INFO] FER2013 cache is stale, rebuilding: {cache_path}")
+        except (ValueError, OSError) as e:
+            print(f"[WARNING] Invalid FER2013 cache ({e}), rebuilding")
+
+    build_fer2013_cache(csv_path, cache_path)
+    return FER2013Cache(cache_path)
+
+
+def load_fer2013_split(csv_path, usage, use_cache=True, cache_path=None):
+    """
+    读取某个划分的 (images, labels)，优先使用内存映射缓存
+
+    缓存目录不可写时退回到一次性内存解码。
+    """
+    if use_cache:
+        try:
+            return load_fer2013_cache(csv_path, cache_path).split(usage)
+        except OSError as e:
+            print(f"[WARNING] Cannot use FER2013 cache ({e}), decoding CSV in memory")
+
+    images, labels, usage_codes = decode_fer2013_csv(csv_path)
+    if usage in USAGES:
+        mask = usage_codes == USAGES.index(usage)
+        images, labels = images[mask], labels[mask]
+    return images, labels
+
 
 class FER2013Dataset:
     """FER2013数据集加载器，支持数据增强和Mixup"""
-    def __init__(self, csv_path, usage='Training', augment=False, mixup=False, mixup_alpha=0.2):
-        self.data = pd.read_csv(csv_path)
+    def __init__(self, csv_path, usage='Training', augment=False, mixup=False, mixup_alpha=0.2,
+                 use_cache=True, cache_path=None, raw=False):
         self.usage = usage
         self.augment = augment  # 是否使用数据增强
         self.mixup = mixup  # 是否使用Mixup
         self.mixup_alpha = mixup_alpha  # Mixup的alpha参数
+        # raw=True 时直接返回 uint8 图像和整数标签，增强/Mixup 交给 FER2013BatchTransform 按批处理
+        self.raw = raw
 
-        if usage == 'Training':
-            self.data = self.data[self.data['Usage'] == 'Training']
-        elif usage == 'PublicTest':
-            self.data = self.data[self.data['Usage'] == 'PublicTest']
-        elif usage == 'PrivateTest':
-            self.data = self.data[self.data['Usage'] == 'PrivateTest']
-
-        # 重置索引以避免索引问题
-        self.data = self.data.reset_index(drop=True)
+        # 预解码的 uint8 图像 (N,48,48) 与标签 (N,)，__getitem__ 只做数组索引
+        self.images, self.labels = load_fer2013_split(csv_path, usage, use_cache=use_cache,
+                                                      cache_path=cache_path)
 
     def __getitem__(self, index):
-        row = self.data.iloc[index]
-        img_str = row['pixels']
-        # 修复废弃警告: 使用 np.fromstring 改为推荐的方法
-        img_array = np.array([float(x) for x in img_str.split()], dtype=np.float32).reshape(48, 48)
+        if self.raw:
+            return np.asarray(self.images[index]), np.asarray(self.labels[index], dtype=np.int32)
+
+        img_array = self.images[index].astype(np.float32)
 
         # 数据增强 (仅在训练时)
         if self.augment:
@@ -37,10 +228,8 @@ class FER2013Dataset:
         # Mixup增强（在数据加载时混合）
         if self.mixup and self.usage == 'Training':
             # 随机选择另一个样本
-            mix_index = np.random.randint(0, len(self.data))
-            mix_row = self.data.iloc[mix_index]
-            mix_img_str = mix_row['pixels']
-            mix_img_array = np.array([float(x) for x in mix_img_str.split()], dtype=np.float32).reshape(48, 48)
+            mix_index = np.random.randint(0, len(self.labels))
+            mix_img_array = self.images[mix_index].astype(np.float32)
 
             if self.augment:
                 mix_img_array = self._augment(mix_img_array)
@@ -50,8 +239,8 @@ class FER2013Dataset:
             img_array = lam * img_array + (1 - lam) * mix_img_array
 
             # 使用软标签：返回one-hot混合标签
-            label_a = row['emotion']
-            label_b = mix_row['emotion']
+            label_a = self.labels[index]
+            label_b = self.labels[mix_index]
 
             # 创建混合的one-hot标签
             mixed_label = np.zeros(7, dtype=np.float32)
@@ -69,7 +258,7 @@ class FER2013Dataset:
         img_array = np.expand_dims(img_array, axis=0)  # (1,48,48)
 
         pixels = np.asarray(img_array, dtype=np.float32)
-        label = np.asarray(row['emotion'], dtype=np.int32)
+        label = np.asarray(self.labels[index], dtype=np.int32)
         return pixels, label
 
     def _augment(self, img):
@@ -121,10 +310,84 @@ class FER2013Dataset:
 
 
     def __len__(self):
-        return len(self.data)
+        return len(self.labels)
+
+
+class FER2013BatchTransform:
+    """
+    批级别的增强、Mixup 与归一化，用作 GeneratorDataset.batch 的 per_batch_map
+
+    输入为 raw 模式 FER2013Dataset 产生的 uint8 图像，输出与逐样本路径相同：
+    float32 (B,1,48,48)，标签为 int32 或 one-hot/Mixup 软标签。
+    指定 seed 时每个批次的随机数由 (seed, epoch, batch) 决定，结果与调度顺序无关。
+    """
+
+    def __init__(self, augment=False, mixup=False, mixup_alpha=0.2, onehot=False,
+                 num_classes=7, seed=None):
+        self.augment = augment
+        self.mixup = mixup
+        self.mixup_alpha = mixup_alpha
+        self.onehot = onehot or mixup
+        self.num_classes = num_classes
+        self.seed = seed
+        self.augmenter = BatchAugmenter(seed=seed)
+        self.rng = np.random.default_rng(seed)
+        self._pid = os.getpid()
+
+    def _batch_rng(self, batch_info):
+        if self.seed is None or batch_info is None:
+            # 未固定种子时，fork 出的 worker 会继承相同的随机状态，需要在新进程中重新播种
+            if os.getpid() != self._pid:
+                self._pid = os.getpid()
+                self.rng = np.random.default_rng()
+            return self.rng
+        return np.random.default_rng([self.seed, batch_info.get_epoch_num(), batch_info.get_batch_num()])
+
+    def transform(self, images, labels, rng=None):
+        """
+        处理一整批样本
+
+        Args:
+            images: uint8 (B,48,48)
+            labels: 整数标签 (B,)
+            rng: np.random.Generator（默认使用内部随机数）
+
+        Returns:
+            (pixels, labels): float32 (B,1,48,48) 与 int32 (B,) 或 float32 (B,num_classes)
+        """
+        rng = rng if rng is not None else self.rng
+        images = np.asarray(images)
+        labels = np.asarray(labels, dtype=np.int32).reshape(-1)
+        batch_size = len(labels)
+
+        imgs = self.augmenter(images, rng) if self.augment else images.astype(np.float32)
+
+        if self.mixup:
+            # 批内随机配对，配对样本独立增强，与逐样本路径一致
+            perm = rng.permutation(batch_size)
+            mix_imgs = self.augmenter(images[perm], rng) if self.augment else imgs[perm]
+            lam = rng.beta(self.mixup_alpha, self.mixup_alpha, batch_size).astype(np.float32)
+            imgs = lam[:, None, None] * imgs + (1 - lam[:, None, None]) * mix_imgs
+
+            out_labels = np.zeros((batch_size, self.num_classes), dtype=np.float32)
+            rows = np.arange(batch_size)
+            out_labels[rows, labels] = lam
+            out_labels[rows, labels[perm]] += 1 - lam
+        elif self.onehot:
+            out_labels = np.eye(self.num_classes, dtype=np.float32)[labels]
+        else:
+            out_labels = labels
+
+        pixels = (imgs / 255.0).astype(np.float32)[:, None, :, :]
+        return pixels, out_labels
+
+    def __call__(self, images, labels, batch_info=None):
+        pixels, out_labels = self.transform(np.stack(images), np.stack(labels),
+                                            self._batch_rng(batch_info))
+        return list(pixels), [np.asarray(label) for label in out_labels]
 
 
 
 
 # helper to create MindSpore GeneratorDataset in train script
-# (placed here so train.py 只需 import)
\ No newline at end of file
+# (placed here so train.py 只需 import)
@@ -0,0 +1,157 @@
+# detection.py
+"""
+Haar 人脸检测：检测分辨率与输入分辨率解耦
+在缩小后的图像上检测，再把人脸框映射回原图坐标；
+分类器使用的人脸裁剪仍取自原始帧，不损失清晰度。
+"""
+import os
+import sys
+
+import cv2
+import numpy as np
+
+
+# 检测策略:
+# single  - 只在缩小后的分辨率上检测一次
+# pyramid - 由粗到细：先在 max_side 上检测，没有找到人脸时依次放大 2 倍重试，直到原始分辨率
+DETECT_POLICIES = ('single', 'pyramid')
+
+
+def load_face_cascade():
+    """
+    加载 OpenCV 自带的正面人脸 Haar Cascade，兼容不同安装方式
+
+    Returns:
+        cv2.CascadeClassifier
+    """
+    cascade_path = None
+    try:
+        # 方法 1：使用 cv2.data（OpenCV 4.x）
+        cascade_path = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+    except AttributeError:
+        # 方法 2：使用 OpenCV 安装路径
+        cv2_base = os.path.dirname(cv2.__file__)
+        cascade_path = os.path.join(cv2_base, 'data', 'haarcascade_frontalface_default.xml')
+
+        # 方法 3：如果上面的路径不存在，尝试其他常见位置
+        if not os.path.exists(cascade_path):
+            # Windows conda 环境的常见路径
+            possible_paths = [
+                os.path.join(sys.prefix, 'Library', 'etc', 'haarcascades', 'haarcascade_frontalface_default.xml'),
+                os.path.join(sys.prefix, 'share', 'opencv4', 'haarcascades', 'haarcascade_frontalface_default.xml'),
+                os.path.join(cv2_base, '..', 'data', 'haarcascade_frontalface_default.xml'),
+            ]
+            for path in possible_paths:
+                if os.path.exists(path):
+                    cascade_path = path
+                    break
+
+    face_cascade = cv2.CascadeClassifier(cascade_path)
+
+    # 验证是否加载成功
+    if face_cascade.empty():
+        raise RuntimeError(f"Failed to load face cascade from {cascade_path}")
+    return face_cascade
+
+
+class FaceDetector:
+    """
+    分辨率可配置的 Haar 人脸检测器
+
+    Args:
+        cascade: cv2.CascadeClassifier（None 时自动加载）
+        max_side: 检测图像长边的最大像素数（None 或 0 表示原始分辨率）
+        policy: 检测策略，见 DETECT_POLICIES
+        min_face: 原图中的最小人脸边长（像素），按缩放比例换算成检测分辨率下的 minSize
+        scale_factor, min_neighbors: detectMultiScale 参数
+    """
+
+    def __init__(self, cascade=None, max_side=None, policy='single', min_face=20,
+                 scale_factor=1.05, min_neighbors=3):
+        if policy not in DETECT_POLICIES:
+            raise ValueError(f"Unknown detect policy: {policy}. Available: {', '.join(DETECT_POLICIES)}")
+        self.cascade = cascade if cascade is not None else load_face_cascade()
+        self.max_side = max_side or None
+        self.policy = policy
+        self.min_face = min_face
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+
+    def scales(self, shape):
+        """
+        按策略返回依次尝试的缩放比例（<= 1.0）
+
+        Args:
+            shape: 输入图像形状
+        """
+        long_side = max(shape[0], shape[1])
+        if self.max_side is None or long_side <= self.max_side:
+            return [1.0]
+
+        scale = self.max_side / long_side
+        if self.policy == 'single':
+            return [scale]
+
+        scales = []
+        while scale < 1.0:
+            scales.append(scale)
+            scale *= 2.0
+        scales.append(1.0)
+        return scales
+
+    def detect_at(self, frame, scale):
+        """
+        在指定缩放比例下检测，并把人脸框映射回原图坐标
+
+        Args:
+            frame: BGR 或灰度图像（原始分辨率）
+            scale: 缩放比例
+
+        Returns:
+            int 数组 [N, 4]，每行 (x, y, w, h)
+        """
+        img_h, img_w = frame.shape[:2]
+        if scale < 1.0:
+            size = (max(1, int(round(frame.shape[1] * scale))), max(1, int(round(frame.shape[0] * scale))))
+            # 先缩放再转灰度，转换的像素更少
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if len(frame.shape) == 3 else frame
+
+        min_size = max(1, int(round(self.min_face * scale)))
+        faces = self.cascade.detectMultiScale(
+            gray, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors,
+            minSize=(min_size, min_size), flags=cv2.CASCADE_SCALE_IMAGE
+        )
+        if len(faces) == 0:
+            return np.empty((0, 4), dtype=np.int32)
+
+        boxes = np.asarray(faces, dtype=np.float64)
+        if scale < 1.0:
+            boxes = boxes / scale
+        boxes = np.round(boxes).astype(np.int32)
+
+        # 映射回原图后裁剪到图像范围内
+        boxes[:, 0] = np.clip(boxes[:, 0], 0, img_w - 1)
+        boxes[:, 1] = np.clip(boxes[:, 1], 0, img_h - 1)
+        boxes[:, 2] = np.minimum(boxes[:, 2], img_w - boxes[:, 0])
+        boxes[:, 3] = np.minimum(boxes[:, 3], img_h - boxes[:, 1])
+        return boxes
+
+    def detect(self, frame):
+        """
+        检测人脸
+
+        Args:
+            frame: BGR 或灰度图像
+
+        Returns:
+            原图坐标下的人脸框 int 数组 [N, 4]
+        """
+        boxes = np.empty((0, 4), dtype=np.int32)
+        for scale in self.scales(frame.shape):
+            boxes = self.detect_at(frame, scale)
+            if len(boxes) > 0:
+                break
+        return boxes
+
+    __call__ = detect
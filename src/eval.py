@@ -3,14 +3,13 @@ import argparse
 import mindspore as ms
 from mindspore.train import Model
 from mindspore import context
-from mindspore.train.serialization import load_checkpoint, load_param_into_net
 from mindspore.dataset import GeneratorDataset
 from sklearn.metrics import classification_report
 from sklearn.metrics import confusion_matrix
 
 
 from dataset import FER2013Dataset
-from model import SimpleCNN
+from model_registry import load_network
 import numpy as np
 
 
@@ -42,9 +41,8 @@ def main():
     context.set_context(mode=context.GRAPH_MODE, device_target=args.device_target)
 
 
-    net = SimpleCNN(num_classes=7)
-    param_dict = load_checkpoint(args.ckpt_path)
-    load_param_into_net(net, param_dict)
+    # 根据检查点指纹自动识别模型版本
+    net = load_network(args.ckpt_path)
 
 
     val_ds = create_dataset(args.data_csv, usage='PublicTest', batch_size=args.batch_size)
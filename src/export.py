@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+导出推理模型
+把训练检查点导出为只用于推理的 MindIR / ONNX（包含 softmax，输出即概率），
+并在模型旁写一份同名 .json 描述文件，供 backends.py 和其他工具读取
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import mindspore as ms
+import mindspore.nn as nn
+import mindspore.ops as ops
+from mindspore import context, Tensor
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, script_dir)
+
+from model_registry import load_param_dict, build_network, checkpoint_hash
+from optimize import optimize_for_inference
+from backends import artifact_meta_path, load_backend, MindSporeBackend, BACKEND_BY_EXTENSION
+
+EMOTIONS = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
+EXPORT_FORMATS = {'MINDIR': '.mindir', 'ONNX': '.onnx'}
+
+
+class InferenceNet(nn.Cell):
+    """推理网络：主干 + softmax"""
+
+    def __init__(self, net):
+        super(InferenceNet, self).__init__()
+        self.net = net
+        self.softmax = ops.Softmax(axis=-1)
+
+    def construct(self, x):
+        return self.softmax(self.net(x))
+
+
+def export_model(ckpt_path, output_dir, name=None, formats=('MINDIR', 'ONNX'), batch_size=1,
+                 architecture=None, num_classes=7, optimize=True):
+    """
+    导出推理模型
+
+    Args:
+        ckpt_path: 训练检查点路径
+        output_dir: 输出目录
+        name: 输出文件名（不含扩展名，默认取检查点文件名）
+        formats: 导出格式（MINDIR / ONNX）
+        batch_size: 模型输入的固定批大小
+        architecture: 模型结构名称（None 表示根据检查点自动识别）
+        num_classes: 类别数
+        optimize: 导出前折叠 BatchNorm、移除 Dropout
+
+    Returns:
+        导出的文件路径列表
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    name = name or os.path.splitext(os.path.basename(ckpt_path))[0]
+    file_base = os.path.join(output_dir, name)
+
+    param_dict, _ = load_param_dict(ckpt_path)
+    net, architecture = build_network(param_dict, num_classes, architecture)
+    if optimize:
+        net, _ = optimize_for_inference(net)
+    inference_net = InferenceNet(net)
+    inference_net.set_train(False)
+
+    dummy = Tensor(np.zeros((batch_size, 1, 48, 48), dtype=np.float32))
+    paths = []
+    for fmt in formats:
+        fmt = fmt.upper()
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {fmt}. Available: {', '.join(EXPORT_FORMATS)}")
+        start = time.time()
+        ms.export(inference_net, dummy, file_name=file_base, file_format=fmt)
+        path = file_base + EXPORT_FORMATS[fmt]
+        paths.append(path)
+        print(f"[SAVE] {fmt} exported to {path} ({time.time() - start:.1f}s)")
+
+    meta = {
+        'files': [os.path.basename(p) for p in paths],
+        'input_shape': [batch_size, 1, 48, 48],
+        'input_range': [0.0, 1.0],
+        'output': 'probabilities',
+        'softmax': True,
+        'emotions': EMOTIONS[:num_classes],
+        'architecture': architecture,
+        'optimized': optimize,
+        'checkpoint': os.path.abspath(ckpt_path),
+        'checkpoint_sha256': checkpoint_hash(ckpt_path),
+        'mindspore_version': ms.__version__,
+        'exported_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    with open(artifact_meta_path(file_base), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    print(f"[SAVE] Metadata saved to {artifact_meta_path(file_base)}")
+
+    return paths
+
+
+def verify_export(ckpt_path, paths, num_samples=64, seed=0):
+    """
+    用随机输入比较导出模型与原检查点（未优化网络）的输出概率
+
+    Returns:
+        {path: 最大绝对误差}，后端依赖未安装的模型会跳过
+    """
+    rng = np.random.default_rng(seed)
+    inputs = rng.random((num_samples, 1, 48, 48), dtype=np.float32)
+    reference = MindSporeBackend(ckpt_path, optimize=False).predict(inputs)
+
+    errors = {}
+    for path in paths:
+        try:
+            backend = load_backend(path)
+        except ImportError as e:
+            print(f"[WARNING] Skipping verification of {path}: {e}")
+            continue
+        diff = float(np.abs(backend.predict(inputs) - reference).max())
+        errors[path] = diff
+        print(f"[INFO] {os.path.basename(path)}: max abs diff vs checkpoint = {diff:.2e}")
+        backend.close()
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='导出推理模型 (MindIR / ONNX)')
+    parser.add_argument('--ckpt_path', type=str, required=True, help='训练检查点路径')
+    parser.add_argument('--output_dir', type=str, default='exported', help='输出目录')
+    parser.add_argument('--name', type=str, default=None, help='输出文件名（不含扩展名）')
+    parser.add_argument('--formats', type=str, nargs='+', default=['MINDIR', 'ONNX'],
+                        choices=list(EXPORT_FORMATS), help='导出格式')
+    parser.add_argument('--batch_size', type=int, default=1,
+                        help='模型输入的固定批大小（推理时自动分块补零）')
+    parser.add_argument('--architecture', type=str, default=None,
+                        help='模型结构名称（默认根据检查点自动识别）')
+    parser.add_argument('--device_target', type=str, default='CPU', choices=['CPU', 'GPU', 'Ascend'])
+    parser.add_argument('--no_optimize', action='store_true', help='不折叠 BatchNorm / 移除 Dropout')
+    parser.add_argument('--no_verify', action='store_true', help='不与原检查点比较输出')
+    args = parser.parse_args()
+
+    context.set_context(mode=context.GRAPH_MODE, device_target=args.device_target)
+
+    paths = export_model(args.ckpt_path, args.output_dir, name=args.name, formats=args.formats,
+                         batch_size=args.batch_size, architecture=args.architecture,
+                         optimize=not args.no_optimize)
+
+    if not args.no_verify:
+        verify_export(args.ckpt_path, [p for p in paths if os.path.splitext(p)[1] in BACKEND_BY_EXTENSION])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+FER2013 MindRecord 数据与原生 MindData 管道
+每个划分一次性转换成 MindRecord（灰度 PNG 字节 + int32 标签），训练时由 MindDataset 在 C++ 中读取，
+解码、增强、归一化都用内置 vision 算子，由 num_parallel_workers 个线程并行执行，
+不经过 Python 数据源，可以配合 dataset_sink_mode=True 使用。
+
+增强与 FER2013Dataset._augment 的对应关系:
+    水平翻转 50%            RandomHorizontalFlip(0.5)
+    旋转 ±20° 50%           RandomApply([RandomRotation(20)], 0.5)
+    亮度 0.7-1.3 50%        RandomApply([RandomColorAdjust(brightness)], 0.5)
+    对比度 0.8-1.2 50%      RandomApply([RandomColorAdjust(contrast)], 0.5)
+    平移 ±10% 50%           RandomApply([RandomAffine(translate)], 0.5)
+    Cutout 15% 20%          RandomApply([CutOut(7)], 0.2)
+差异：旋转/平移的空白区域用常数灰度填充（_augment 为边缘复制），Cutout 填 0（_augment 填均值），
+没有内置的加性高斯噪声算子，噪声一项省略；Mixup 使用 MixUpBatch，每个批次共用一个 lambda。
+
+示例:
+    python src/mindrecord_dataset.py --data_csv data/fer2013.csv
+    python src/train.py --data_csv data/fer2013.csv --data_format mindrecord --dataset_sink_mode --augment
+"""
+
+import argparse
+import json
+import os
+
+import cv2
+import numpy as np
+import mindspore.dataset as ds
+import mindspore.dataset.transforms as transforms
+import mindspore.dataset.vision as vision
+from mindspore import dtype as mstype
+from mindspore.mindrecord import FileWriter
+
+from dataset import USAGES, load_fer2013_split, _source_signature
+
+
+# MindRecord 格式版本：schema 或编码方式变化时递增，旧文件会被自动重新转换
+MINDRECORD_VERSION = 1
+MINDRECORD_SCHEMA = {'image': {'type': 'bytes'}, 'label': {'type': 'int32'}}
+META_FILE = 'fer2013_mindrecord.json'
+
+# 旋转/平移后空白区域的填充灰度（接近 FER2013 的平均像素值）
+FILL_VALUE = (128, 128, 128)
+CUTOUT_SIZE = int(48 * 0.15)
+
+
+def default_mindrecord_dir(csv_path):
+    """MindRecord 默认放在 CSV 旁边，例如 fer2013.mindrecord.v1/"""
+    root, _ = os.path.splitext(str(csv_path))
+    return f'{root}.mindrecord.v{MINDRECORD_VERSION}'
+
+
+def mindrecord_path(output_dir, usage):
+    return os.path.join(output_dir, f'fer2013_{usage}.mindrecord')
+
+
+def _read_meta(output_dir):
+    try:
+        with open(os.path.join(output_dir, META_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def convert_fer2013_to_mindrecord(csv_path, output_dir=None, usages=USAGES, num_shards=1, chunk_size=4096):
+    """
+    把 FER2013 各划分写成 MindRecord
+
+    Args:
+        csv_path: fer2013.csv 路径
+        output_dir: 输出目录（默认 default_mindrecord_dir(csv_path)）
+        usages: 要转换的划分
+        num_shards: 每个划分的分片文件数
+        chunk_size: 每次 write_raw_data 写入的样本数
+
+    Returns:
+        {usage: MindRecord 文件路径}（多分片时为第一个分片，MindDataset 会自动找到其余分片）
+    """
+    output_dir = output_dir or default_mindrecord_dir(csv_path)
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"[INFO] Converting {csv_path} to MindRecord: {output_dir}")
+
+    paths, counts = {}, {}
+    for usage in usages:
+        images, labels = load_fer2013_split(csv_path, usage)
+        path = mindrecord_path(output_dir, usage)
+        writer = FileWriter(file_name=path, shard_num=num_shards, overwrite=True)
+        writer.add_schema(MINDRECORD_SCHEMA, f'fer2013_{usage}')
+        writer.add_index(['label'])
+        for start in range(0, len(labels), chunk_size):
+            rows = [{'image': cv2.imencode('.png', np.asarray(img))[1].tobytes(), 'label': int(label)}
+                    for img, label in zip(images[start:start + chunk_size], labels[start:start + chunk_size])]
+            writer.write_raw_data(rows)
+        writer.commit()
+        paths[usage] = f'{path}0' if num_shards > 1 else path
+        counts[usage] = int(len(labels))
+        print(f"[INFO] {usage}: {len(labels)} samples")
+
+    # 元数据最后写入，转换中断时不会被当作有效结果
+    meta = {'version': MINDRECORD_VERSION, 'num_shards': num_shards, 'files': paths, 'num_samples': counts}
+    meta.update(_source_signature(csv_path))
+    with open(os.path.join(output_dir, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    return paths
+
+
+def ensure_mindrecord(csv_path, output_dir=None, rebuild=False, num_shards=1):
+    """
+    返回 CSV 对应的 MindRecord 文件，不存在、版本不符或源文件已变化时自动转换
+
+    Returns:
+        {usage: MindRecord 文件路径}
+    """
+    output_dir = output_dir or default_mindrecord_dir(csv_path)
+    meta = None if rebuild else _read_meta(output_dir)
+    if meta is not None:
+        fresh = (meta.get('version') == MINDRECORD_VERSION
+                 and all(meta.get(k) == v for k, v in _source_signature(csv_path).items())
+                 and all(os.path.exists(p) for p in meta['files'].values()))
+        if fresh and set(meta['files']) >= set(USAGES):
+            return meta['files']
+        print(f"[INFO] MindRecord is stale, converting again: {output_dir}")
+    return convert_fer2013_to_mindrecord(csv_path, output_dir, num_shards=num_shards)
+
+
+def image_transforms(augment=False):
+    """
+    单样本的内置 vision 算子列表：PNG 字节 -> float32 (1,48,48)，取值 0-1
+
+    灰度 PNG 由 Decode 解码为三通道相同的 RGB，颜色算子要求三通道输入；
+    最后 Slice 只保留第一个通道。
+    """
+    ops = [vision.Decode()]
+    if augment:
+        ops += [
+            vision.RandomHorizontalFlip(0.5),
+            transforms.RandomApply([vision.RandomRotation(degrees=20, resample=vision.Inter.BILINEAR,
+                                                          fill_value=FILL_VALUE)], prob=0.5),
+            transforms.RandomApply([vision.RandomColorAdjust(brightness=(0.7, 1.3))], prob=0.5),
+            transforms.RandomApply([vision.RandomColorAdjust(contrast=(0.8, 1.2))], prob=0.5),
+            transforms.RandomApply([vision.RandomAffine(degrees=0, translate=(-0.1, 0.1, -0.1, 0.1),
+                                                        resample=vision.Inter.BILINEAR,
+                                                        fill_value=FILL_VALUE)], prob=0.5),
+        ]
+    ops += [vision.Rescale(1.0 / 255.0, 0.0), vision.HWC2CHW(), transforms.Slice(slice(0, 1))]
+    if augment:
+        ops.append(transforms.RandomApply([vision.CutOut(CUTOUT_SIZE, num_patches=1, is_hwc=False)], prob=0.2))
+    return ops
+
+
+def create_mindrecord_dataset(path, batch_size, shuffle=True, augment=False, mixup=False, mixup_alpha=0.2,
+                              use_soft_labels=False, seed=None, num_workers=4, num_classes=7,
+                              num_shards=None, shard_id=None):
+    """
+    用 MindDataset 和内置算子创建训练/验证数据集，输出与 train.create_dataset 相同的列
+
+    Args:
+        path: MindRecord 文件路径（ensure_mindrecord 的返回值）
+        use_soft_labels: 输出 one-hot float32 标签（用于 SoftTargetCrossEntropy）
+        seed: 随机种子（设置 MindData 全局种子，洗牌与增强可复现）
+        num_workers: 读取和 map 算子的并行线程数
+        num_shards, shard_id: 数据并行时每个进程读取的分片
+
+    Returns:
+        mindspore.dataset.Dataset，列为 image float32 (B,1,48,48) 和 label
+    """
+    if seed is not None:
+        ds.config.set_seed(seed)
+
+    data = ds.MindDataset(path, columns_list=['image', 'label'], shuffle=shuffle,
+                          num_parallel_workers=num_workers, num_shards=num_shards, shard_id=shard_id)
+    data = data.map(operations=image_transforms(augment), input_columns='image',
+                    num_parallel_workers=num_workers)
+
+    if mixup or use_soft_labels:
+        data = data.map(operations=[transforms.OneHot(num_classes), transforms.TypeCast(mstype.float32)],
+                        input_columns='label', num_parallel_workers=num_workers)
+    data = data.batch(batch_size, drop_remainder=True, num_parallel_workers=num_workers)
+    if mixup:
+        data = data.map(operations=vision.MixUpBatch(mixup_alpha), input_columns=['image', 'label'],
+                        num_parallel_workers=num_workers)
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description='把 FER2013 转换为 MindRecord')
+    parser.add_argument('--data_csv', type=str, required=True, help='fer2013.csv 路径')
+    parser.add_argument('--output_dir', type=str, default=None, help='输出目录（默认放在 CSV 旁边）')
+    parser.add_argument('--num_shards', type=int, default=1, help='每个划分的分片文件数')
+    parser.add_argument('--rebuild', action='store_true', help='即使已有最新的 MindRecord 也重新转换')
+    args = parser.parse_args()
+
+    paths = ensure_mindrecord(args.data_csv, args.output_dir, rebuild=args.rebuild, num_shards=args.num_shards)
+    for usage, path in paths.items():
+        print(f"  {usage:<12} {path}")
+
+
+if __name__ == '__main__':
+    main()
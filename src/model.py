@@ -6,15 +6,123 @@ from mindspore import Tensor
 import mindspore.numpy as mnp
 
 
+# 注意力放置方式：每个残差块是否使用 ChannelAttention / SpatialAttention
+ATTENTION_PLACEMENTS = ('all', 'none', 'channel', 'spatial', 'last', 'deep')
+BASE_STAGE_WIDTHS = (64, 128, 256, 512)
+
+
+def scale_width(channels, multiplier, divisor=8):
+    """按宽度系数缩放通道数，取 divisor 的整数倍且不小于 divisor"""
+    return max(divisor, int(channels * multiplier + divisor / 2) // divisor * divisor)
+
+
+def attention_placement(attention, blocks):
+    """
+    解析注意力放置方式
+
+    Args:
+        attention: ATTENTION_PLACEMENTS 中的名称
+                       all      每个残差块都使用通道注意力和空间注意力
+                       none     都不使用
+                       channel  只使用通道注意力
+                       spatial  只使用空间注意力
+                       last     只在每个 stage 的最后一个块使用
+                       deep     只在最后两个 stage 使用
+                   或逐块代码（按 stage 顺序逗号分隔；cs 两者、c 通道、s 空间、- 都不用），
+                   例如 'cs,cs,cs,cs,c,c,-,-'
+        blocks: 每个 stage 的残差块数
+
+    Returns:
+        [[(use_channel, use_spatial), ...], ...]
+    """
+    num_stages = len(blocks)
+    if attention in ATTENTION_PLACEMENTS:
+        def flags(stage, block):
+            if attention == 'none':
+                return False, False
+            if attention == 'last' and block != blocks[stage] - 1:
+                return False, False
+            if attention == 'deep' and stage < num_stages - 2:
+                return False, False
+            return attention != 'spatial', attention != 'channel'
+        return [[flags(i, j) for j in range(n)] for i, n in enumerate(blocks)]
+
+    codes = [code.strip() for code in attention.split(',')]
+    if len(codes) != sum(blocks) or any(code not in ('cs', 'sc', 'c', 's', '-') for code in codes):
+        raise ValueError(f"Invalid attention placement '{attention}': expected one of "
+                         f"{', '.join(ATTENTION_PLACEMENTS)} or {sum(blocks)} comma-separated codes (cs/c/s/-)")
+    placement, start = [], 0
+    for n in blocks:
+        placement.append([('c' in code, 's' in code) for code in codes[start:start + n]])
+        start += n
+    return placement
+
+
+def default_channels(stage_widths=BASE_STAGE_WIDTHS, blocks=2, reduction=16, attention='all', spatial_kernel=7):
+    """
+    通道与结构配置（保存在检查点的 arch_config 中）
+
+    Args:
+        stage_widths: 每个 stage 的残差通道数
+        blocks: 每个 stage 的残差块数（整数或逐 stage 列表）
+        reduction: ChannelAttention 的压缩比
+        attention: 注意力放置方式（见 attention_placement）
+        spatial_kernel: SpatialAttention 的卷积核大小
+
+    Returns:
+        {'stages': 每个 stage 的残差通道数（stem 与第一个 stage 相同）,
+         'mid': 每个残差块内部 conv1 的输出通道数（长度即该 stage 的块数）,
+         'attention_hidden': 每个残差块 ChannelAttention 的隐层宽度（0 表示不使用）,
+         'spatial_kernel': 每个残差块 SpatialAttention 的卷积核大小（0 表示不使用）}
+    """
+    if spatial_kernel % 2 == 0:
+        raise ValueError(f"SpatialAttention kernel size must be odd, got {spatial_kernel}")
+    if isinstance(blocks, int):
+        blocks = [blocks] * len(stage_widths)
+    placement = attention_placement(attention, blocks)
+    return {
+        'stages': list(stage_widths),
+        'mid': [[w] * n for w, n in zip(stage_widths, blocks)],
+        'attention_hidden': [[max(1, w // reduction) if channel else 0 for channel, _ in flags]
+                             for w, flags in zip(stage_widths, placement)],
+        'spatial_kernel': [[spatial_kernel if spatial else 0 for _, spatial in flags] for flags in placement],
+    }
+
+
+def architecture_channels(width=1.0, depth=2, attention='all', reduction=16, spatial_kernel=7):
+    """
+    SimpleCNN 结构族：按宽度系数缩放 64/128/256/512，并指定每个 stage 的深度和注意力放置
+
+    Args:
+        width: 宽度系数（通道数取 8 的整数倍）
+        depth: 每个 stage 的残差块数（整数或 4 个元素的列表）
+    """
+    widths = [scale_width(w, width) for w in BASE_STAGE_WIDTHS]
+    return default_channels(widths, blocks=depth, reduction=reduction, attention=attention,
+                            spatial_kernel=spatial_kernel)
+
+
+def architecture_summary(channels):
+    """结构配置的简短描述，例如 '32/64/128/256 d2,2,2,2 channel-attn 8/8 spatial-attn 8/8'"""
+    depth = ','.join(str(len(m)) for m in channels['mid'])
+    num_blocks = sum(len(m) for m in channels['mid'])
+    num_channel = sum(1 for stage in channels['attention_hidden'] for h in stage if h)
+    kernels = channels.get('spatial_kernel')
+    num_spatial = sum(1 for stage in kernels for k in stage if k) if kernels else num_blocks
+    return (f"{'/'.join(str(w) for w in channels['stages'])} d{depth} "
+            f"channel-attn {num_channel}/{num_blocks} spatial-attn {num_spatial}/{num_blocks}")
+
+
 class ChannelAttention(nn.Cell):
     """通道注意力模块（SENet）"""
-    def __init__(self, channels, reduction=16):
+    def __init__(self, channels, reduction=16, hidden=None):
         super(ChannelAttention, self).__init__()
+        hidden = hidden or channels // reduction
         self.avg_pool = ops.AdaptiveAvgPool2D((1, 1))
         self.fc = nn.SequentialCell([
-            nn.Dense(channels, channels // reduction),
+            nn.Dense(channels, hidden),
             nn.ReLU(),
-            nn.Dense(channels // reduction, channels),
+            nn.Dense(hidden, channels),
             nn.Sigmoid()
         ])
         self.reshape = ops.Reshape()
@@ -50,22 +158,32 @@ class SpatialAttention(nn.Cell):
 
 
 class ResidualBlock(nn.Cell):
-    """增强的残差块，添加注意力机制"""
-    def __init__(self, in_channels, out_channels, stride=1, use_attention=True):
+    """
+    增强的残差块，添加注意力机制
+
+    mid_channels / attention_hidden 默认与 out_channels 对应，剪枝后的网络可单独指定；
+    attention_hidden=0 时不使用 ChannelAttention，spatial_kernel=0 时不使用 SpatialAttention
+    """
+    def __init__(self, in_channels, out_channels, stride=1, use_attention=True, mid_channels=None,
+                 attention_hidden=None, spatial_kernel=7):
         super(ResidualBlock, self).__init__()
-        self.conv1 = nn.Conv2d(in_channels, out_channels, kernel_size=3, stride=stride,
+        mid_channels = mid_channels or out_channels
+        self.conv1 = nn.Conv2d(in_channels, mid_channels, kernel_size=3, stride=stride,
                                pad_mode='pad', padding=1, has_bias=False)
-        self.bn1 = nn.BatchNorm2d(out_channels)
+        self.bn1 = nn.BatchNorm2d(mid_channels)
         self.relu = nn.ReLU()
-        self.conv2 = nn.Conv2d(out_channels, out_channels, kernel_size=3, stride=1,
+        self.conv2 = nn.Conv2d(mid_channels, out_channels, kernel_size=3, stride=1,
                                pad_mode='pad', padding=1, has_bias=False)
         self.bn2 = nn.BatchNorm2d(out_channels)
 
         # 注意力机制
-        self.use_attention = use_attention
-        if use_attention:
-            self.channel_attention = ChannelAttention(out_channels)
-            self.spatial_attention = SpatialAttention()
+        self.use_channel_attention = use_attention and attention_hidden != 0
+        self.use_spatial_attention = use_attention and bool(spatial_kernel)
+        self.use_attention = self.use_channel_attention or self.use_spatial_attention
+        if self.use_channel_attention:
+            self.channel_attention = ChannelAttention(out_channels, hidden=attention_hidden)
+        if self.use_spatial_attention:
+            self.spatial_attention = SpatialAttention(kernel_size=spatial_kernel)
 
         # 如果输入输出通道数不同或步长不为1，需要调整shortcut
         self.downsample = None
@@ -86,8 +204,9 @@ class ResidualBlock(nn.Cell):
         out = self.bn2(out)
 
         # 应用注意力机制
-        if self.use_attention:
+        if self.use_channel_attention:
             out = self.channel_attention(out)
+        if self.use_spatial_attention:
             out = self.spatial_attention(out)
 
         if self.downsample is not None:
@@ -100,20 +219,35 @@ class ResidualBlock(nn.Cell):
 
 
 class SimpleCNN(nn.Cell):
-    """优化后的CNN模型，添加残差连接和更深的网络"""
-    def __init__(self, num_classes=7):
+    """
+    优化后的CNN模型，添加残差连接和更深的网络
+
+    Args:
+        num_classes: 类别数
+        channels: 通道与结构配置（见 default_channels / architecture_channels），
+                  None 表示默认的 64/128/256/512、每 stage 2 个块、全部使用注意力
+    """
+    def __init__(self, num_classes=7, channels=None):
         super(SimpleCNN, self).__init__()
+        channels = channels or default_channels()
+        widths = channels['stages']
 
         # 初始卷积层
-        self.conv1 = nn.Conv2d(1, 64, kernel_size=3, stride=1, pad_mode='pad', padding=1, has_bias=False)
-        self.bn1 = nn.BatchNorm2d(64)
+        self.conv1 = nn.Conv2d(1, widths[0], kernel_size=3, stride=1, pad_mode='pad', padding=1, has_bias=False)
+        self.bn1 = nn.BatchNorm2d(widths[0])
         self.relu = nn.ReLU()
 
-        # 残差块层
-        self.layer1 = self._make_layer(64, 64, 2, stride=1)
-        self.layer2 = self._make_layer(64, 128, 2, stride=2)
-        self.layer3 = self._make_layer(128, 256, 2, stride=2)
-        self.layer4 = self._make_layer(256, 512, 2, stride=2)
+        # 残差块层（每个 stage 的块数由 mid 的长度决定；没有 spatial_kernel 的旧配置统一使用 7x7）
+        mids, hiddens = channels['mid'], channels['attention_hidden']
+        kernels = channels.get('spatial_kernel') or [[7] * len(m) for m in mids]
+        self.layer1 = self._make_layer(widths[0], widths[0], len(mids[0]), stride=1,
+                                       mids=mids[0], hiddens=hiddens[0], kernels=kernels[0])
+        self.layer2 = self._make_layer(widths[0], widths[1], len(mids[1]), stride=2,
+                                       mids=mids[1], hiddens=hiddens[1], kernels=kernels[1])
+        self.layer3 = self._make_layer(widths[1], widths[2], len(mids[2]), stride=2,
+                                       mids=mids[2], hiddens=hiddens[2], kernels=kernels[2])
+        self.layer4 = self._make_layer(widths[2], widths[3], len(mids[3]), stride=2,
+                                       mids=mids[3], hiddens=hiddens[3], kernels=kernels[3])
 
         # 全局平均池化
         self.global_pool = nn.AdaptiveAvgPool2d((1, 1))
@@ -121,7 +255,7 @@ class SimpleCNN(nn.Cell):
 
         # 分类器 - 添加更多正则化
         self.classifier = nn.SequentialCell([
-            nn.Dense(512, 256),
+            nn.Dense(widths[3], 256),
             nn.BatchNorm1d(256),
             nn.ReLU(),
             nn.Dropout(p=0.5),
@@ -135,11 +269,17 @@ class SimpleCNN(nn.Cell):
         # 权重初始化
         self._initialize_weights()
 
-    def _make_layer(self, in_channels, out_channels, blocks, stride, use_attention=True):
+    def _make_layer(self, in_channels, out_channels, blocks, stride, use_attention=True, mids=None, hiddens=None,
+                    kernels=None):
+        mids = mids or [None] * blocks
+        hiddens = hiddens or [None] * blocks
+        kernels = kernels or [7] * blocks
         layers = []
-        layers.append(ResidualBlock(in_channels, out_channels, stride, use_attention))
-        for _ in range(1, blocks):
-            layers.append(ResidualBlock(out_channels, out_channels, 1, use_attention))
+        layers.append(ResidualBlock(in_channels, out_channels, stride, use_attention, mids[0], hiddens[0],
+                                    kernels[0]))
+        for i in range(1, blocks):
+            layers.append(ResidualBlock(out_channels, out_channels, 1, use_attention, mids[i], hiddens[i],
+                                        kernels[i]))
         return nn.SequentialCell(layers)
 
     def _initialize_weights(self):
@@ -0,0 +1,250 @@
+# model_registry.py
+"""
+模型注册表
+根据检查点中的参数指纹识别网络结构，并缓存解析后的参数字典和构建好的网络，
+同一进程内重复加载同一个检查点时不再重复读取和构建（缓存只在进程内有效，不跨进程共享）。
+缓存按 (路径, 修改时间, 大小) 索引，首次加载只读一遍文件；内容 sha256 只在需要时（导出元数据等）计算
+"""
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+import numpy as np
+import mindspore as ms
+from mindspore.train.serialization import load_checkpoint, load_param_into_net
+
+from model import SimpleCNN
+from optimize import optimize_for_inference
+try:
+    from model_legacy import SimpleCNN_Legacy
+except ImportError:
+    SimpleCNN_Legacy = None
+
+
+# 已注册的模型结构：name -> {'match', 'build', 'description'}
+MODEL_REGISTRY = OrderedDict()
+DEFAULT_ARCHITECTURE = 'simple_cnn'
+
+# 检查点中保存结构配置（JSON，uint8 编码）的参数名
+ARCH_CONFIG_KEY = 'arch_config'
+
+# 最多缓存的参数字典个数
+PARAM_CACHE_SIZE = 4
+# 最多缓存的网络个数（同一检查点可能有多个变体，例如是否折叠 BatchNorm）
+NETWORK_CACHE_SIZE = PARAM_CACHE_SIZE
+
+_hash_cache = {}                 # (realpath, mtime_ns, size) -> sha256
+_param_cache = OrderedDict()     # (realpath, mtime_ns, size) -> param_dict（LRU）
+_network_cache = OrderedDict()   # ((realpath, mtime_ns, size), architecture, num_classes, optimize) -> net（LRU）
+
+
+def register_model(name, match, build, description=''):
+    """
+    注册一种模型结构
+
+    Args:
+        name: 结构名称
+        match: match(param_dict) -> bool，判断检查点是否属于该结构
+        build: build(param_dict, num_classes) -> nn.Cell，构建未加载参数的网络
+        description: 打印用的结构描述
+    """
+    MODEL_REGISTRY[name] = {'match': match, 'build': build, 'description': description}
+
+
+def _shape_matcher(key, shape):
+    def match(param_dict):
+        return key in param_dict and tuple(param_dict[key].shape) == shape
+    return match
+
+
+def encode_arch_config(config):
+    """结构配置 -> 可以存入检查点的 uint8 Tensor"""
+    data = json.dumps(config, sort_keys=True).encode('utf-8')
+    return ms.Tensor(np.frombuffer(data, dtype=np.uint8).copy())
+
+
+def decode_arch_config(param_dict):
+    """从检查点参数字典中读取结构配置，没有时返回 None"""
+    if ARCH_CONFIG_KEY not in param_dict:
+        return None
+    data = param_dict[ARCH_CONFIG_KEY].asnumpy().astype(np.uint8).tobytes()
+    return json.loads(data.decode('utf-8'))
+
+
+def save_checkpoint(net, ckpt_path, arch_config=None):
+    """
+    保存检查点，arch_config 不为 None 时一并写入结构配置，加载时据此构建网络
+
+    Args:
+        net: 网络
+        ckpt_path: 保存路径
+        arch_config: 结构配置字典，例如 {'type': 'simple_cnn', 'channels': {...}}
+    """
+    append_dict = {ARCH_CONFIG_KEY: encode_arch_config(arch_config)} if arch_config is not None else None
+    ms.save_checkpoint(net, ckpt_path, append_dict=append_dict)
+
+
+def _build_configured(param_dict, num_classes):
+    config = decode_arch_config(param_dict)
+    if config.get('type', 'simple_cnn') != 'simple_cnn':
+        raise ValueError(f"Unsupported architecture config type: {config.get('type')}")
+    return SimpleCNN(num_classes, channels=config.get('channels'))
+
+
+def _build_legacy(param_dict, num_classes):
+    if SimpleCNN_Legacy is None:
+        print("[ERROR] Legacy model detected but model_legacy.py not found")
+        raise ImportError("Please ensure model_legacy.py exists in src/")
+    return SimpleCNN_Legacy(num_classes)
+
+
+# 带结构配置的检查点（剪枝等）优先按配置构建
+register_model('simple_cnn_config', lambda param_dict: ARCH_CONFIG_KEY in param_dict,
+               _build_configured, 'configured SimpleCNN (architecture config in checkpoint)')
+
+# 分类器第一层形状区分新旧模型:
+# 新版本: classifier.0.weight shape = (256, 512)
+# 旧版本: classifier.0.weight shape = (128, 128)
+register_model('simple_cnn', _shape_matcher('classifier.0.weight', (256, 512)),
+               lambda param_dict, num_classes: SimpleCNN(num_classes),
+               'current model (512 -> 256 -> 128 -> 7)')
+register_model('simple_cnn_legacy', _shape_matcher('classifier.0.weight', (128, 128)),
+               _build_legacy, 'legacy model (128 -> 128 -> 7)')
+
+
+def identify_architecture(param_dict):
+    """
+    根据参数指纹识别模型结构
+
+    Args:
+        param_dict: 检查点参数字典
+
+    Returns:
+        结构名称；无法识别时返回 DEFAULT_ARCHITECTURE
+    """
+    for name, entry in MODEL_REGISTRY.items():
+        if entry['match'](param_dict):
+            return name
+
+    if 'classifier.0.weight' in param_dict:
+        print(f"[WARNING] Unknown classifier shape: {param_dict['classifier.0.weight'].shape}")
+    else:
+        print("[WARNING] Cannot determine model version")
+    print("[INFO] Attempting to load as current model...")
+    return DEFAULT_ARCHITECTURE
+
+
+def checkpoint_key(ckpt_path):
+    """检查点的缓存键 (realpath, mtime_ns, size)，文件被修改后自动失效"""
+    stat = os.stat(ckpt_path)
+    return os.path.realpath(ckpt_path), stat.st_mtime_ns, stat.st_size
+
+
+def checkpoint_hash(ckpt_path):
+    """
+    检查点内容的 sha256，按 (路径, 修改时间, 大小) 记忆，文件不变时不重复计算
+    """
+    stat_key = checkpoint_key(ckpt_path)
+    digest = _hash_cache.get(stat_key)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(ckpt_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        _hash_cache[stat_key] = digest
+    return digest
+
+
+def load_param_dict(ckpt_path):
+    """
+    读取检查点参数字典（带缓存，不计算内容哈希，需要时用 checkpoint_hash）
+
+    Returns:
+        (param_dict, cache_key)，cache_key 见 checkpoint_key
+    """
+    key = checkpoint_key(ckpt_path)
+    if key in _param_cache:
+        _param_cache.move_to_end(key)
+        return _param_cache[key], key
+
+    param_dict = load_checkpoint(ckpt_path)
+    _param_cache[key] = param_dict
+    while len(_param_cache) > PARAM_CACHE_SIZE:
+        evicted, _ = _param_cache.popitem(last=False)
+        # 参数字典被淘汰时一并释放由它构建的网络
+        for net_key in [k for k in _network_cache if k[0] == evicted]:
+            del _network_cache[net_key]
+    return param_dict, key
+
+
+def build_network(param_dict, num_classes=7, architecture=None):
+    """
+    根据参数字典构建网络并加载参数
+
+    Args:
+        param_dict: 检查点参数字典
+        num_classes: 类别数
+        architecture: 指定结构名称（None 表示自动识别）
+
+    Returns:
+        (net, architecture)
+    """
+    if architecture is None:
+        architecture = identify_architecture(param_dict)
+    if architecture not in MODEL_REGISTRY:
+        raise ValueError(f"Unknown architecture: {architecture}. "
+                         f"Available: {', '.join(MODEL_REGISTRY)}")
+
+    entry = MODEL_REGISTRY[architecture]
+    print(f"[INFO] Loading {entry['description'] or architecture}")
+    net = entry['build'](param_dict, num_classes)
+    load_param_into_net(net, param_dict)
+    net.set_train(False)
+    return net, architecture
+
+
+def load_network(ckpt_path, num_classes=7, architecture=None, cached=True, optimize=False):
+    """
+    加载检查点并返回可直接推理的网络（eval 模式）
+
+    Args:
+        ckpt_path: 检查点路径
+        num_classes: 类别数
+        architecture: 指定结构名称（None 表示根据指纹自动识别）
+        cached: 是否复用同一进程内已构建的网络。复用的网络在调用方之间共享，
+                需要修改网络（训练、量化等）时请传 False
+        optimize: 折叠 BatchNorm、移除 Dropout（见 optimize.py），只用于推理
+
+    Returns:
+        nn.Cell
+    """
+    param_dict, param_key = load_param_dict(ckpt_path)
+
+    if not cached:
+        net = build_network(param_dict, num_classes, architecture)[0]
+        return optimize_for_inference(net)[0] if optimize else net
+
+    if architecture is None:
+        architecture = identify_architecture(param_dict)
+    key = (param_key, architecture, num_classes, optimize)
+    net = _network_cache.get(key)
+    if net is None:
+        net, _ = build_network(param_dict, num_classes, architecture)
+        if optimize:
+            net, _ = optimize_for_inference(net)
+        _network_cache[key] = net
+        while len(_network_cache) > NETWORK_CACHE_SIZE:
+            _network_cache.popitem(last=False)
+    else:
+        _network_cache.move_to_end(key)
+        print(f"[INFO] Reusing cached network for {ckpt_path}")
+    return net
+
+
+def clear_cache():
+    """清空参数与网络缓存"""
+    _hash_cache.clear()
+    _param_cache.clear()
+    _network_cache.clear()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+推理图优化
+把 BatchNorm 折叠进前一个 Conv2d / Dense 的权重和偏置，并移除 Dropout，
+得到与原网络（eval 模式）数值等价、但少了逐元素归一化计算的精简网络。
+
+折叠规则:
+    - 同一个 Cell 中名为 convX / bnX 的属性对（SimpleCNN、ResidualBlock 的写法），
+      bnX 替换为 Identity
+    - SequentialCell 中相邻的 Conv2d/Dense + BatchNorm（downsample、classifier），
+      BatchNorm 和 Dropout 直接从序列中删除
+
+适用于 SimpleCNN 和 SimpleCNN_Legacy；命令行会在 PublicTest 上逐样本比较优化前后的输出。
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import mindspore.nn as nn
+from mindspore import Tensor
+
+
+def _bn_scale_shift(bn):
+    """BatchNorm（eval 模式）等价的逐通道仿射变换 y = x * scale + shift"""
+    gamma = bn.gamma.asnumpy().astype(np.float64)
+    beta = bn.beta.asnumpy().astype(np.float64)
+    mean = bn.moving_mean.asnumpy().astype(np.float64)
+    var = bn.moving_variance.asnumpy().astype(np.float64)
+    scale = gamma / np.sqrt(var + bn.eps)
+    return scale, beta - mean * scale
+
+
+def _is_batchnorm(cell):
+    return isinstance(cell, (nn.BatchNorm2d, nn.BatchNorm1d))
+
+
+def fold_batchnorm_into(layer, bn):
+    """
+    把 bn 折叠进 layer（Conv2d 或 Dense）
+
+    Returns:
+        折叠后的层；没有偏置的 Conv2d 会被替换为带偏置的新 Conv2d
+    """
+    scale, shift = _bn_scale_shift(bn)
+    weight = layer.weight.asnumpy().astype(np.float64)
+    bias = layer.bias.asnumpy().astype(np.float64) if layer.has_bias else np.zeros(weight.shape[0])
+
+    weight = weight * scale.reshape((-1,) + (1,) * (weight.ndim - 1))
+    bias = bias * scale + shift
+
+    if isinstance(layer, nn.Conv2d) and not layer.has_bias:
+        layer = nn.Conv2d(layer.in_channels, layer.out_channels, layer.kernel_size, stride=layer.stride,
+                          pad_mode=layer.pad_mode, padding=layer.padding, dilation=layer.dilation,
+                          group=layer.group, has_bias=True)
+    elif not layer.has_bias:
+        raise ValueError(f"Cannot fold BatchNorm into {type(layer).__name__} without bias")
+
+    dtype = layer.weight.dtype
+    layer.weight.set_data(Tensor(weight, dtype))
+    layer.bias.set_data(Tensor(bias, dtype))
+    return layer
+
+
+def _optimize_sequential(seq, stats):
+    """折叠 SequentialCell 中相邻的 层 + BatchNorm，删除 Dropout；返回新的 SequentialCell（无变化时为 None）"""
+    cells = list(seq.cell_list) if hasattr(seq, 'cell_list') else [seq[i] for i in range(len(seq))]
+    result = []
+    changed = False
+    for cell in cells:
+        if isinstance(cell, nn.Dropout):
+            stats['dropout'] += 1
+            changed = True
+            continue
+        if _is_batchnorm(cell) and result and isinstance(result[-1], (nn.Conv2d, nn.Dense)):
+            result[-1] = fold_batchnorm_into(result[-1], cell)
+            stats['batchnorm'] += 1
+            changed = True
+            continue
+        result.append(cell)
+    if not changed:
+        return None
+    return nn.SequentialCell(result)
+
+
+def _optimize_cell(cell, stats):
+    children = list(cell.name_cells().items())
+    names = dict(children)
+
+    for name, child in children:
+        if cell.name_cells().get(name) is not child:  # 已在折叠中被替换
+            continue
+
+        # convX + bnX 属性对
+        if isinstance(child, (nn.Conv2d, nn.Dense)):
+            suffix = name[len('conv'):] if name.startswith('conv') else None
+            bn = names.get(f'bn{suffix}') if suffix is not None else None
+            if bn is not None and _is_batchnorm(bn):
+                setattr(cell, name, fold_batchnorm_into(child, bn))
+                setattr(cell, f'bn{suffix}', nn.Identity())
+                stats['batchnorm'] += 1
+                continue
+
+        if isinstance(child, nn.SequentialCell):
+            replacement = _optimize_sequential(child, stats)
+            if replacement is not None:
+                setattr(cell, name, replacement)
+                child = replacement
+
+        if isinstance(child, nn.Dropout):
+            setattr(cell, name, nn.Identity())
+            stats['dropout'] += 1
+            continue
+
+        _optimize_cell(child, stats)
+
+
+def optimize_for_inference(net, verbose=True):
+    """
+    折叠 BatchNorm、移除 Dropout（原地修改）
+
+    Args:
+        net: eval 模式的网络（不要传入其他调用方共享的缓存网络）
+
+    Returns:
+        (net, stats)，stats 为 {'batchnorm': 折叠数, 'dropout': 移除数, 'unfolded': 未能折叠的 BatchNorm 数}
+    """
+    stats = {'batchnorm': 0, 'dropout': 0}
+    _optimize_cell(net, stats)
+
+    # 新建的层参数名没有层级前缀，统一按层级路径重新命名，避免图模式下参数重名
+    for name, param in net.parameters_and_names():
+        param.name = name
+
+    stats['unfolded'] = sum(1 for _, c in net.cells_and_names() if _is_batchnorm(c))
+    net.set_train(False)
+    if verbose:
+        print(f"[INFO] Inference optimization: folded {stats['batchnorm']} BatchNorm, "
+              f"removed {stats['dropout']} Dropout"
+              + (f", {stats['unfolded']} BatchNorm left unfolded" if stats['unfolded'] else ""))
+    return net, stats
+
+
+def forward_logits(net, images, batch_size):
+    """按固定批大小前向推理，返回 logits [N, num_classes]"""
+    outputs = []
+    buffer = np.zeros((batch_size, 1, 48, 48), dtype=np.float32)
+    for start in range(0, len(images), batch_size):
+        chunk = images[start:start + batch_size]
+        n = len(chunk)
+        buffer[:n, 0] = chunk
+        buffer[:n] /= 255.0
+        buffer[n:] = 0
+        outputs.append(net(Tensor(buffer)).asnumpy()[:n])
+    return np.concatenate(outputs)
+
+
+def main():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, script_dir)
+    from mindspore import context
+    from dataset import load_fer2013_split
+    from model_registry import load_param_dict, build_network
+
+    parser = argparse.ArgumentParser(description='推理图优化：折叠 BatchNorm、移除 Dropout 并验证数值等价')
+    parser.add_argument('--ckpt_path', type=str, required=True, help='训练检查点路径')
+    parser.add_argument('--data_csv', type=str, required=True, help='fer2013.csv 路径（用于验证）')
+    parser.add_argument('--usage', type=str, default='PublicTest',
+                        choices=['Training', 'PublicTest', 'PrivateTest'])
+    parser.add_argument('--batch_size', type=int, default=256)
+    parser.add_argument('--tolerance', type=float, default=1e-3, help='允许的最大 logits 绝对误差')
+    parser.add_argument('--architecture', type=str, default=None)
+    parser.add_argument('--device_target', type=str, default='CPU', choices=['CPU', 'GPU', 'Ascend'])
+    args = parser.parse_args()
+
+    context.set_context(mode=context.GRAPH_MODE, device_target=args.device_target)
+
+    param_dict, _ = load_param_dict(args.ckpt_path)
+    original, architecture = build_network(param_dict, architecture=args.architecture)
+    optimized, _ = build_network(param_dict, architecture=architecture)
+    optimized, stats = optimize_for_inference(optimized)
+
+    images, labels = load_fer2013_split(args.data_csv, args.usage)
+    print(f"[INFO] Verifying on {len(labels)} {args.usage} images ({architecture})")
+
+    timings = {}
+    logits = {}
+    for label, net in (('original', original), ('optimized', optimized)):
+        forward_logits(net, images[:args.batch_size], args.batch_size)  # 预热：图编译
+        start = time.perf_counter()
+        logits[label] = forward_logits(net, images, args.batch_size)
+        timings[label] = time.perf_counter() - start
+
+    max_diff = float(np.abs(logits['original'] - logits['optimized']).max())
+    pred_original = logits['original'].argmax(axis=1)
+    pred_optimized = logits['optimized'].argmax(axis=1)
+    agreement = float((pred_original == pred_optimized).mean())
+
+    print(f"\n{'Network':<12} {'Accuracy':<10} {'Time(s)':<10} {'Images/s':<10}")
+    print("-" * 44)
+    for label, preds in (('original', pred_original), ('optimized', pred_optimized)):
+        accuracy = float((preds == labels).mean())
+        print(f"{label:<12} {accuracy:<10.2%} {timings[label]:<10.2f} {len(labels) / timings[label]:<10.0f}")
+    print(f"\n[INFO] Max abs logit diff: {max_diff:.2e}, prediction agreement: {agreement:.2%}, "
+          f"speedup: {timings['original'] / timings['optimized']:.2f}x")
+
+    if max_diff > args.tolerance or stats['unfolded']:
+        print(f"[ERROR] Optimized network is not equivalent (tolerance {args.tolerance})")
+        sys.exit(1)
+    print("[INFO] Optimized network is numerically equivalent")
+
+
+if __name__ == '__main__':
+    main()
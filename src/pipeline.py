@@ -0,0 +1,359 @@
+# pipeline.py
+"""
+摄像头实时处理的多线程流水线
+采集 -> 检测 -> 推理 -> 渲染/显示 四个阶段由有界队列连接，
+队列满时丢弃最旧的帧而不是排队，保证显示的总是最新画面
+批量模式的有界并行 map 工具也在这里
+"""
+import collections
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+_STOP = object()
+
+
+class DropOldestQueue:
+    """
+    有界队列：满时丢弃最旧的元素，统计丢帧数
+
+    流结束用 close() 标记而不是放入哨兵，避免结束信号把最后一帧挤掉
+    """
+
+    def __init__(self, maxsize=1):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, item):
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        return self._queue.get(timeout=timeout)
+
+    def close(self):
+        """上游结束：消费者取完剩余元素后停止"""
+        self.closed = True
+
+
+class StageStats:
+    """各阶段耗时统计（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = {}
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self._samples.setdefault(stage, []).append(seconds)
+
+    def summary(self):
+        """
+        Returns:
+            {stage: {'count', 'mean_ms', 'p95_ms', 'max_ms'}}
+        """
+        with self._lock:
+            samples = {k: np.array(v) * 1000 for k, v in self._samples.items()}
+        return {
+            stage: {
+                'count': len(values),
+                'mean_ms': float(values.mean()),
+                'p95_ms': float(np.percentile(values, 95)),
+                'max_ms': float(values.max()),
+            }
+            for stage, values in samples.items() if len(values) > 0
+        }
+
+    def report(self):
+        """打印各阶段耗时表"""
+        print(f"\n{'Stage':<12} {'Count':<8} {'Mean(ms)':<10} {'P95(ms)':<10} {'Max(ms)':<10}")
+        print("-" * 52)
+        for stage, s in self.summary().items():
+            print(f"{stage:<12} {s['count']:<8} {s['mean_ms']:<10.2f} {s['p95_ms']:<10.2f} {s['max_ms']:<10.2f}")
+
+
+class SyntheticFrameSource:
+    """
+    合成帧源，接口与 cv2.VideoCapture 相同（read/isOpened/release）
+    用于在没有摄像头的环境中测试流水线
+
+    Args:
+        width, height: 帧尺寸
+        num_frames: 总帧数（None 表示无限）
+        num_faces: 每帧中类人脸图案的数量
+        face_size: 人脸图案边长（像素）
+        fps: 限制输出帧率（None 表示不限速）
+        seed: 随机种子
+    """
+
+    def __init__(self, width=640, height=480, num_frames=300, num_faces=1, face_size=120,
+                 fps=None, seed=0):
+        self.width = width
+        self.height = height
+        self.num_frames = num_frames
+        self.face_size = face_size
+        self.fps = fps
+        self.frame_index = 0
+        self._last_time = None
+        rng = np.random.default_rng(seed)
+        self._background = rng.integers(60, 120, (height, width, 3), dtype=np.uint8)
+        self._starts = rng.uniform(0, 1, (num_faces, 2))
+        self._velocity = rng.uniform(-0.004, 0.004, (num_faces, 2))
+
+    def isOpened(self):
+        return True
+
+    def face_boxes(self, index=None):
+        """返回第 index 帧中人脸图案的真实位置 [(x, y, w, h), ...]"""
+        index = self.frame_index if index is None else index
+        span = np.array([self.width - self.face_size, self.height - self.face_size])
+        pos = np.abs(((self._starts + self._velocity * index) % 2.0) - 1.0)  # 在边界间往返
+        return [(int(x), int(y), self.face_size, self.face_size) for x, y in pos * span]
+
+    def read(self):
+        if self.num_frames is not None and self.frame_index >= self.num_frames:
+            return False, None
+
+        if self.fps:
+            now = time.perf_counter()
+            if self._last_time is not None:
+                delay = 1.0 / self.fps - (now - self._last_time)
+                if delay > 0:
+                    time.sleep(delay)
+            self._last_time = time.perf_counter()
+
+        frame = self._background.copy()
+        for x, y, w, h in self.face_boxes():
+            draw_synthetic_face(frame, x, y, w, h)
+        self.frame_index += 1
+        return True, frame
+
+    def release(self):
+        pass
+
+
+def draw_synthetic_face(frame, x, y, w, h):
+    """在帧上画一个简单的类人脸图案（脸、眼睛、眉毛、嘴）"""
+    cx, cy = x + w // 2, y + h // 2
+    cv2.ellipse(frame, (cx, cy), (w * 2 // 5, h // 2), 0, 0, 360, (170, 180, 200), -1)
+    for ex in (cx - w // 6, cx + w // 6):
+        cv2.ellipse(frame, (ex, cy - h // 8), (w // 12, h // 20), 0, 0, 360, (40, 40, 40), -1)
+        cv2.line(frame, (ex - w // 10, cy - h // 4), (ex + w // 10, cy - h // 4), (50, 50, 50), max(1, h // 40))
+    cv2.ellipse(frame, (cx, cy + h // 5), (w // 6, h // 16), 0, 0, 360, (60, 60, 120), -1)
+
+
+def bounded_map(executor, fn, items, max_pending):
+    """
+    有界并行 map：items 惰性读取，最多 max_pending 个任务在途，按输入顺序产出结果
+    在途任务数固定，内存占用与输入总量无关
+
+    Args:
+        executor: concurrent.futures.Executor
+        fn: 任务函数 fn(item)
+        items: 可迭代对象（可以是生成器）
+        max_pending: 最多同时提交的任务数
+    """
+    pending = collections.deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def interleave(iterables):
+    """轮流从多个可迭代对象中取元素，产出 (来源序号, 元素)，直到全部耗尽"""
+    iterators = [(i, iter(it)) for i, it in enumerate(iterables)]
+    while iterators:
+        alive = []
+        for i, it in iterators:
+            try:
+                item = next(it)
+            except StopIteration:
+                continue
+            alive.append((i, it))
+            yield i, item
+        iterators = alive
+
+
+class WebcamPipeline:
+    """
+    采集/检测/推理/显示流水线
+
+    采集、检测、推理各占一个线程，显示在调用线程（cv2.imshow 需要在主线程）。
+    阶段之间是容量为 queue_size 的丢旧队列，慢阶段只会让上游丢帧，不会拖慢采集。
+
+    Args:
+        visualizer: FERVisualizer（提供 detect_faces / predict_emotions / draw_prediction）
+        source: 帧源（cv2.VideoCapture 或 SyntheticFrameSource）
+        queue_size: 每个阶段间队列容量
+        headless: 不创建窗口（用于测试/服务器）
+        max_frames: 最多显示的帧数（None 表示直到帧源结束或按 q）
+        on_frame: 每渲染完一帧的回调 on_frame(frame, item)
+        tracker: 可选的 FaceTracker，检测阶段用检测 + 跟踪代替逐帧检测
+        prediction_cache: 可选的 TemporalPredictionCache（需要 tracker），按轨迹复用并平滑预测
+    """
+
+    def __init__(self, visualizer, source, queue_size=1, headless=False, max_frames=None, on_frame=None,
+                 tracker=None, prediction_cache=None):
+        self.visualizer = visualizer
+        self.tracker = tracker
+        self.prediction_cache = prediction_cache
+        self.source = source
+        self.headless = headless
+        self.max_frames = max_frames
+        self.on_frame = on_frame
+        self.stats = StageStats()
+        self.detect_queue = DropOldestQueue(queue_size)
+        self.infer_queue = DropOldestQueue(queue_size)
+        self.display_queue = DropOldestQueue(queue_size)
+        self.stop_event = threading.Event()
+        self.frames_captured = 0
+        self.frames_displayed = 0
+
+    def _get(self, q):
+        """带超时地取元素，以便及时响应停止信号；上游已关闭且队列取空时返回 _STOP"""
+        while not self.stop_event.is_set():
+            # 先读关闭标记再取：关闭前放入的元素一定已经在队列中
+            closed = q.closed
+            try:
+                return q.get(timeout=0.05)
+            except queue.Empty:
+                if closed:
+                    return _STOP
+        return _STOP
+
+    def _capture_loop(self):
+        while not self.stop_event.is_set():
+            start = time.perf_counter()
+            ret, frame = self.source.read()
+            if not ret:
+                break
+            self.stats.record('capture', time.perf_counter() - start)
+            self.frames_captured += 1
+            self.detect_queue.put({'id': self.frames_captured, 't_capture': time.perf_counter(),
+                                   'frame': frame})
+        self.detect_queue.close()
+
+    def _detect_loop(self):
+        while True:
+            item = self._get(self.detect_queue)
+            if item is _STOP:
+                break
+            start = time.perf_counter()
+            item['faces'], item['face_ids'], item['tracks'] = self.visualizer.locate_faces(
+                item['frame'], self.tracker)
+            self.stats.record('detect', time.perf_counter() - start)
+            self.infer_queue.put(item)
+        self.infer_queue.close()
+
+    def _infer_loop(self):
+        while True:
+            item = self._get(self.infer_queue)
+            if item is _STOP:
+                break
+            start = time.perf_counter()
+            item['predictions'] = self.visualizer.predict_located(
+                item['frame'], item['faces'], item['tracks'], self.prediction_cache)
+            self.stats.record('infer', time.perf_counter() - start)
+            self.display_queue.put(item)
+        self.display_queue.close()
+
+    def render(self, item):
+        """在帧上绘制预测结果"""
+        frame = item['frame']
+        for (x, y, w, h), face_id, (emotion, probability, probs) in zip(
+                item['faces'], item['face_ids'], item['predictions']):
+            self.visualizer.draw_prediction(frame, x, y, w, h, emotion, probability, probs, face_id)
+        return frame
+
+    def run(self):
+        """
+        运行流水线直到帧源结束、达到 max_frames 或按 q
+
+        Returns:
+            统计信息字典
+        """
+        threads = [threading.Thread(target=fn, daemon=True)
+                   for fn in (self._capture_loop, self._detect_loop, self._infer_loop)]
+        for t in threads:
+            t.start()
+
+        run_start = time.perf_counter()
+        fps_time = run_start
+        fps = 0.0
+        try:
+            while True:
+                item = self._get(self.display_queue)
+                if item is _STOP:
+                    break
+
+                start = time.perf_counter()
+                frame = self.render(item)
+                self.frames_displayed += 1
+                if self.frames_displayed % 10 == 0:
+                    fps = 10 / (time.perf_counter() - fps_time)
+                    fps_time = time.perf_counter()
+                if fps > 0:
+                    cv2.putText(frame, f"FPS: {fps:.1f}", (10, 30),
+                                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+
+                if self.on_frame is not None:
+                    self.on_frame(frame, item)
+
+                key = 0xFF
+                if not self.headless:
+                    cv2.imshow('FER - Press q to quit, s to save', frame)
+                    key = cv2.waitKey(1) & 0xFF
+                self.stats.record('render', time.perf_counter() - start)
+                self.stats.record('end_to_end', time.perf_counter() - item['t_capture'])
+
+                if key == ord('q'):
+                    break
+                elif key == ord('s') and len(item['faces']) > 0:
+                    self.visualizer.save_frame(frame, prefix='webcam')
+
+                if self.max_frames is not None and self.frames_displayed >= self.max_frames:
+                    break
+        finally:
+            self.stop_event.set()
+            for t in threads:
+                t.join(timeout=1.0)
+            if not self.headless:
+                cv2.destroyAllWindows()
+
+        elapsed = time.perf_counter() - run_start
+        return {
+            'frames_captured': self.frames_captured,
+            'frames_displayed': self.frames_displayed,
+            'dropped': {
+                'detect': self.detect_queue.dropped,
+                'infer': self.infer_queue.dropped,
+                'display': self.display_queue.dropped,
+            },
+            'fps': self.frames_displayed / elapsed if elapsed > 0 else 0.0,
+            'stages': self.stats.summary(),
+        }
+
+    def report(self, result):
+        """打印运行结果与各阶段耗时"""
+        print(f"\n[INFO] Captured {result['frames_captured']} frames, "
+              f"displayed {result['frames_displayed']} ({result['fps']:.1f} FPS)")
+        dropped = result['dropped']
+        print(f"[INFO] Dropped stale frames - detect: {dropped['detect']}, "
+              f"infer: {dropped['infer']}, display: {dropped['display']}")
+        self.stats.report()
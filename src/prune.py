@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+SimpleCNN 结构化通道剪枝
+按 BatchNorm gamma 的幅值给通道排序，在 conv / BN / ChannelAttention / downsample / 分类器上
+一致地删除通道，短暂微调后在 PublicTest 上评估；在满足延迟目标的候选宽度中
+搜索满足准确率下限的最小网络，输出带结构配置的检查点（模型注册表可直接加载）
+
+通道分组:
+    stages            每个 stage 的残差通道（stem、bn2、downsample、下一 stage 的输入、分类器输入共用）
+    mid               每个残差块内部 conv1 -> bn1 -> conv2 的通道
+    attention_hidden  每个 ChannelAttention 的隐层
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import mindspore.nn as nn
+from mindspore import context, Tensor, Parameter
+from mindspore.train import Model
+from mindspore.train.callback import LossMonitor
+from mindspore.train.serialization import load_param_into_net
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, script_dir)
+
+from model import SimpleCNN, default_channels
+from model_registry import load_param_dict, build_network, decode_arch_config, save_checkpoint, checkpoint_hash
+from optimize import optimize_for_inference, forward_logits
+from dataset import load_fer2013_split
+from train import create_dataset, LabelSmoothingCrossEntropy
+
+BN_KEYS = ('gamma', 'beta', 'moving_mean', 'moving_variance')
+DEFAULT_RATIOS = (1.0, 0.875, 0.75, 0.625, 0.5, 0.375, 0.25)
+
+
+def round_channels(channels, ratio, divisor=8):
+    """按比例缩小通道数，取 divisor 的整数倍（便于 SIMD），不小于 divisor、不大于原通道数"""
+    if ratio >= 1.0:
+        return channels
+    kept = int(channels * ratio + divisor / 2) // divisor * divisor
+    return min(channels, max(divisor, kept))
+
+
+def pruned_channels(base, ratio):
+    """按统一保留比例生成剪枝后的通道配置"""
+    return {
+        'stages': [round_channels(c, ratio) for c in base['stages']],
+        'mid': [[round_channels(c, ratio) for c in stage] for stage in base['mid']],
+        'attention_hidden': [[max(1, int(round(h * ratio))) if h else 0 for h in stage]
+                             for stage in base['attention_hidden']],
+        'spatial_kernel': base.get('spatial_kernel') or [[7] * len(stage) for stage in base['mid']],
+    }
+
+
+def channel_importance(weights, channels):
+    """
+    通道重要性
+
+    残差通道由多个 BN 共同写入，把每个 BN 的 |gamma| 归一化后求和；
+    块内通道取 bn1 的 |gamma|；注意力隐层取两层 Dense 权重的 L1 范数之积
+
+    Returns:
+        与通道配置结构相同的分数数组
+    """
+    def normalized_gamma(prefix):
+        gamma = np.abs(weights[f'{prefix}.gamma'])
+        return gamma / (gamma.mean() + 1e-12)
+
+    scores = {'stages': [], 'mid': [], 'attention_hidden': []}
+    for i, blocks in enumerate(channels['mid']):
+        writers = [f'layer{i + 1}.{j}.bn2' for j in range(len(blocks))]
+        writers.append('bn1' if i == 0 else f'layer{i + 1}.0.downsample.1')
+        scores['stages'].append(sum(normalized_gamma(bn) for bn in writers))
+
+        scores['mid'].append([np.abs(weights[f'layer{i + 1}.{j}.bn1.gamma']) for j in range(len(blocks))])
+        hidden = []
+        for j in range(len(blocks)):
+            prefix = f'layer{i + 1}.{j}.channel_attention.fc'
+            if f'{prefix}.0.weight' not in weights:  # 该块没有通道注意力
+                hidden.append(np.zeros(0))
+                continue
+            hidden.append(np.abs(weights[f'{prefix}.0.weight']).sum(axis=1) *
+                          np.abs(weights[f'{prefix}.2.weight']).sum(axis=0))
+        scores['attention_hidden'].append(hidden)
+    return scores
+
+
+def select_channels(scores, target):
+    """按分数保留 target 指定数量的通道，返回排好序的索引"""
+    def keep(score, n):
+        return np.sort(np.argsort(-score, kind='stable')[:n])
+
+    return {
+        'stages': [keep(s, n) for s, n in zip(scores['stages'], target['stages'])],
+        'mid': [[keep(s, n) for s, n in zip(ss, ns)] for ss, ns in zip(scores['mid'], target['mid'])],
+        'attention_hidden': [[keep(s, n) for s, n in zip(ss, ns)]
+                             for ss, ns in zip(scores['attention_hidden'], target['attention_hidden'])],
+    }
+
+
+def prune_weights(weights, indices):
+    """
+    按通道索引裁剪所有参数
+
+    Args:
+        weights: {参数名: ndarray}
+        indices: select_channels 的结果
+
+    Returns:
+        裁剪后的 {参数名: ndarray}
+    """
+    pruned = {}
+
+    def take(name, *axes):
+        array = weights[name]
+        for axis, idx in enumerate(axes):
+            if idx is not None:
+                array = np.take(array, idx, axis=axis)
+        pruned[name] = array
+
+    def take_bn(prefix, idx):
+        for key in BN_KEYS:
+            take(f'{prefix}.{key}', idx)
+
+    stages = indices['stages']
+    take('conv1.weight', stages[0])
+    take_bn('bn1', stages[0])
+
+    for i, mids in enumerate(indices['mid']):
+        for j, mid in enumerate(mids):
+            prefix = f'layer{i + 1}.{j}'
+            in_idx = stages[i - 1] if (j == 0 and i > 0) else stages[i]
+            hidden = indices['attention_hidden'][i][j]
+
+            take(f'{prefix}.conv1.weight', mid, in_idx)
+            take_bn(f'{prefix}.bn1', mid)
+            take(f'{prefix}.conv2.weight', stages[i], mid)
+            take_bn(f'{prefix}.bn2', stages[i])
+            if f'{prefix}.channel_attention.fc.0.weight' in weights:
+                take(f'{prefix}.channel_attention.fc.0.weight', hidden, stages[i])
+                take(f'{prefix}.channel_attention.fc.0.bias', hidden)
+                take(f'{prefix}.channel_attention.fc.2.weight', stages[i], hidden)
+                take(f'{prefix}.channel_attention.fc.2.bias', stages[i])
+            if f'{prefix}.spatial_attention.conv.weight' in weights:
+                take(f'{prefix}.spatial_attention.conv.weight')
+            if f'{prefix}.downsample.0.weight' in weights:
+                take(f'{prefix}.downsample.0.weight', stages[i], in_idx)
+                take_bn(f'{prefix}.downsample.1', stages[i])
+
+    take('classifier.0.weight', None, stages[-1])
+    for name, array in weights.items():
+        if name.startswith('classifier.') and name not in pruned:
+            pruned[name] = array
+    return pruned
+
+
+def build_pruned(weights, scores, channels, num_classes=7):
+    """构建剪枝后的网络并加载裁剪后的参数"""
+    indices = select_channels(scores, channels)
+    pruned = prune_weights(weights, indices)
+    net = SimpleCNN(num_classes, channels=channels)
+    params = {name: Parameter(Tensor(array), name=name) for name, array in pruned.items()}
+    not_loaded, _ = load_param_into_net(net, params)
+    if not_loaded:
+        raise RuntimeError(f"Pruned parameters missing for: {not_loaded}")
+    return net
+
+
+def count_params(net):
+    return int(sum(np.prod(p.shape) for p in net.trainable_params()))
+
+
+def measure_latency(channels, batch_size=1, runs=50, num_classes=7):
+    """
+    剪枝结构的推理延迟（折叠 BatchNorm 后，随机权重；延迟与权重取值无关）
+
+    Returns:
+        延迟中位数（毫秒）
+    """
+    net = SimpleCNN(num_classes, channels=channels)
+    net.set_train(False)
+    net, _ = optimize_for_inference(net, verbose=False)
+    x = Tensor(np.random.rand(batch_size, 1, 48, 48).astype(np.float32))
+    for _ in range(5):  # 预热：图编译
+        net(x).asnumpy()
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        net(x).asnumpy()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times) * 1000)
+
+
+def finetune(net, args):
+    """短暂微调剪枝后的网络"""
+    if args.finetune_epochs <= 0:
+        return
+    ds = create_dataset(args.data_csv, 'Training', args.batch_size, shuffle=True, augment=True,
+                        seed=args.seed, num_workers=args.num_workers)
+    if args.finetune_steps:
+        ds = ds.take(args.finetune_steps)
+    loss = LabelSmoothingCrossEntropy(num_classes=7)
+    optimizer = nn.AdamWeightDecay(net.trainable_params(), learning_rate=args.lr, weight_decay=3e-5)
+    net.set_train(True)
+    model = Model(net, loss_fn=loss, optimizer=optimizer)
+    model.train(args.finetune_epochs, ds, callbacks=[LossMonitor(100)], dataset_sink_mode=False)
+    net.set_train(False)
+
+
+def evaluate(net, images, labels, batch_size):
+    net.set_train(False)
+    preds = forward_logits(net, images, batch_size).argmax(axis=1)
+    return float((preds == labels).mean())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SimpleCNN 结构化通道剪枝（延迟目标 + 准确率下限搜索）')
+    parser.add_argument('--ckpt_path', type=str, required=True, help='训练好的检查点')
+    parser.add_argument('--data_csv', type=str, required=True, help='fer2013.csv 路径')
+    parser.add_argument('--output_dir', type=str, default='checkpoints/pruned', help='输出目录')
+    parser.add_argument('--latency_target', type=float, required=True, help='延迟目标（毫秒，单次前向）')
+    parser.add_argument('--latency_batch', type=int, default=1, help='测量延迟的批大小')
+    parser.add_argument('--min_accuracy', type=float, default=None,
+                        help='PublicTest 准确率下限（默认: 原模型准确率 - max_drop）')
+    parser.add_argument('--max_drop', type=float, default=0.01, help='未指定 min_accuracy 时允许的准确率下降')
+    parser.add_argument('--ratios', type=float, nargs='+', default=list(DEFAULT_RATIOS),
+                        help='候选通道保留比例')
+    parser.add_argument('--finetune_epochs', type=int, default=1, help='每个候选的微调轮数')
+    parser.add_argument('--finetune_steps', type=int, default=0, help='每轮最多微调的步数（0 表示整轮）')
+    parser.add_argument('--lr', type=float, default=1e-4, help='微调学习率')
+    parser.add_argument('--batch_size', type=int, default=96)
+    parser.add_argument('--num_workers', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--device_target', type=str, default='CPU', choices=['CPU', 'GPU', 'Ascend'])
+    args = parser.parse_args()
+
+    context.set_context(mode=context.GRAPH_MODE, device_target=args.device_target)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    param_dict, _ = load_param_dict(args.ckpt_path)
+    source, architecture = build_network(param_dict)
+    if architecture not in ('simple_cnn', 'simple_cnn_config'):
+        raise ValueError(f"Channel pruning supports SimpleCNN checkpoints only, got {architecture}")
+    base = (decode_arch_config(param_dict) or {}).get('channels') or default_channels()
+    weights = {p.name: p.asnumpy() for p in source.get_parameters()}
+    scores = channel_importance(weights, base)
+
+    images, labels = load_fer2013_split(args.data_csv, 'PublicTest')
+    baseline_acc = evaluate(source, images, labels, 256)
+    min_accuracy = args.min_accuracy if args.min_accuracy is not None else baseline_acc - args.max_drop
+    print(f"[INFO] Source accuracy (PublicTest): {baseline_acc:.2%}, accuracy floor: {min_accuracy:.2%}")
+
+    # 1. 延迟只取决于结构：先测所有候选，筛掉不满足延迟目标的
+    candidates = []
+    print(f"\n{'Ratio':<8} {'Stages':<24} {'Params':<10} {'Latency(ms)':<12}")
+    print("-" * 56)
+    for ratio in sorted(set(args.ratios), reverse=True):
+        channels = pruned_channels(base, ratio)
+        latency = measure_latency(channels, args.latency_batch)
+        params = count_params(SimpleCNN(7, channels=channels))
+        candidates.append({'ratio': ratio, 'channels': channels, 'latency_ms': latency, 'params': params})
+        print(f"{ratio:<8.3f} {str(channels['stages']):<24} {params:<10} {latency:<12.2f}")
+
+    feasible = [c for c in candidates if c['latency_ms'] <= args.latency_target]
+    if not feasible:
+        print(f"[ERROR] No candidate meets the latency target of {args.latency_target} ms; "
+              f"try smaller --ratios")
+        sys.exit(1)
+
+    # 2. 在满足延迟的候选中二分搜索满足准确率下限的最小网络（假设准确率随宽度单调）
+    nets = {}
+
+    def accuracy_of(candidate):
+        if 'accuracy' not in candidate:
+            print(f"\n[INFO] Pruning to ratio {candidate['ratio']} -> {candidate['channels']['stages']}")
+            net = build_pruned(weights, scores, candidate['channels'])
+            candidate['accuracy_before_finetune'] = evaluate(net, images, labels, 256)
+            finetune(net, args)
+            candidate['accuracy'] = evaluate(net, images, labels, 256)
+            nets[candidate['ratio']] = net
+            print(f"[INFO] Accuracy: {candidate['accuracy_before_finetune']:.2%} -> "
+                  f"{candidate['accuracy']:.2%} after fine-tuning")
+        return candidate['accuracy']
+
+    lo, hi, best = 0, len(feasible) - 1, None
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        if accuracy_of(feasible[mid]) >= min_accuracy:
+            best = feasible[mid]
+            lo = mid + 1
+        else:
+            hi = mid - 1
+
+    report = {
+        'source': os.path.abspath(args.ckpt_path),
+        'source_accuracy': baseline_acc,
+        'latency_target_ms': args.latency_target,
+        'min_accuracy': min_accuracy,
+        'candidates': candidates,
+        'selected': None,
+    }
+
+    if best is None:
+        print(f"\n[ERROR] No candidate within {args.latency_target} ms reaches {min_accuracy:.2%}")
+    else:
+        arch_config = {
+            'type': 'simple_cnn',
+            'channels': best['channels'],
+            'pruned_from': checkpoint_hash(args.ckpt_path),
+            'keep_ratio': best['ratio'],
+        }
+        name = os.path.splitext(os.path.basename(args.ckpt_path))[0]
+        output_path = os.path.join(args.output_dir, f"{name}_pruned_{int(best['ratio'] * 1000):04d}.ckpt")
+        save_checkpoint(nets[best['ratio']], output_path, arch_config)
+        config_path = os.path.splitext(output_path)[0] + '.arch.json'
+        with open(config_path, 'w', encoding='utf-8') as f:
+            json.dump(arch_config, f, indent=2)
+        report['selected'] = {'ratio': best['ratio'], 'checkpoint': output_path, 'config': config_path}
+        print(f"\n[INFO] Selected ratio {best['ratio']}: {best['params']} params "
+              f"({best['params'] / candidates[0]['params']:.1%} of source at ratio {candidates[0]['ratio']}), "
+              f"{best['latency_ms']:.2f} ms, accuracy {best['accuracy']:.2%}")
+        print(f"[SAVE] Pruned checkpoint saved to {output_path}")
+        print(f"[SAVE] Architecture config saved to {config_path}")
+
+    report_path = os.path.join(args.output_dir, 'pruning_report.json')
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"[SAVE] Report saved to {report_path}")
+    if best is None:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+训练后 INT8 量化
+在 FER2013 Training 划分的一个样本上校准激活范围，把导出的 ONNX 模型静态量化为 INT8
+（ResidualBlock 的卷积、ChannelAttention 的 Dense、分类器 Dense 都被量化），
+然后在 CSV 上分别评估 FP32 与 INT8 模型，报告逐类别准确率变化并检查是否超出允许的下降幅度
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, script_dir)
+
+from dataset import load_fer2013_split
+from backends import artifact_meta_path, read_artifact_meta
+from batch_eval_csv import CSVBatchEvaluator, EMOTIONS
+
+# 量化的算子类型：卷积 (Conv) 和全连接 (MatMul / Gemm)
+QUANTIZED_OP_TYPES = ['Conv', 'MatMul', 'Gemm']
+CALIBRATION_METHODS = ('MinMax', 'Entropy', 'Percentile')
+
+
+def sample_calibration_set(csv_path, num_samples, seed=0):
+    """
+    从 Training 划分中按类别分层抽取校准样本
+
+    Returns:
+        float32 数组 [N, 1, 48, 48]，范围 0-1
+    """
+    images, labels = load_fer2013_split(csv_path, 'Training')
+    rng = np.random.default_rng(seed)
+
+    indices = []
+    for label in np.unique(labels):
+        members = np.flatnonzero(labels == label)
+        count = max(1, int(round(num_samples * len(members) / len(labels))))
+        indices.append(rng.choice(members, size=min(count, len(members)), replace=False))
+    indices = np.sort(np.concatenate(indices))
+
+    return (images[indices].astype(np.float32) / 255.0)[:, None]
+
+
+class FER2013CalibrationReader:
+    """ONNX Runtime 校准数据读取器：按模型的固定批大小逐批提供校准样本"""
+
+    def __init__(self, samples, input_name, batch_size):
+        self.input_name = input_name
+        usable = len(samples) // batch_size * batch_size
+        if usable == 0:
+            raise ValueError(f"Need at least {batch_size} calibration samples, got {len(samples)}")
+        self.batches = [samples[i:i + batch_size] for i in range(0, usable, batch_size)]
+        self.index = 0
+
+    def get_next(self):
+        if self.index >= len(self.batches):
+            return None
+        batch = self.batches[self.index]
+        self.index += 1
+        return {self.input_name: np.ascontiguousarray(batch)}
+
+    def rewind(self):
+        self.index = 0
+
+
+def quantize_onnx(fp32_path, int8_path, calibration, method='MinMax', per_channel=True):
+    """
+    静态量化 ONNX 模型（权重和激活均为 INT8，QDQ 格式）
+
+    Args:
+        fp32_path: FP32 ONNX 模型
+        int8_path: 输出路径
+        calibration: 校准样本 float32 [N, 1, 48, 48]
+        method: 校准方法（见 CALIBRATION_METHODS）
+        per_channel: 卷积权重按输出通道量化
+    """
+    try:
+        import onnxruntime as ort
+        from onnxruntime import quantization as q
+    except ImportError as e:
+        raise ImportError("onnxruntime is required for quantization. Install it with: pip install onnxruntime") from e
+
+    # 量化前做形状推断和图优化（失败时直接量化原模型）
+    prepared_path = fp32_path
+    try:
+        from onnxruntime.quantization.shape_inference import quant_pre_process
+        prepared_path = os.path.splitext(int8_path)[0] + '_prep.onnx'
+        quant_pre_process(fp32_path, prepared_path)
+    except Exception as e:
+        print(f"[WARNING] Pre-processing skipped: {e}")
+        prepared_path = fp32_path
+
+    session = ort.InferenceSession(prepared_path, providers=['CPUExecutionProvider'])
+    model_input = session.get_inputs()[0]
+    batch_size = model_input.shape[0] if isinstance(model_input.shape[0], int) else 1
+    reader = FER2013CalibrationReader(calibration, model_input.name, batch_size)
+    del session
+
+    start = time.time()
+    q.quantize_static(
+        prepared_path, int8_path, reader,
+        quant_format=q.QuantFormat.QDQ,
+        op_types_to_quantize=QUANTIZED_OP_TYPES,
+        per_channel=per_channel,
+        activation_type=q.QuantType.QInt8,
+        weight_type=q.QuantType.QInt8,
+        calibrate_method=getattr(q.CalibrationMethod, method),
+    )
+    if prepared_path != fp32_path:
+        os.remove(prepared_path)
+    print(f"[SAVE] INT8 model saved to {int8_path} ({time.time() - start:.1f}s, "
+          f"{len(reader.batches) * batch_size} calibration samples)")
+
+
+def compare_accuracy(fp32_path, int8_path, csv_path, usage, batch_size, output_dir):
+    """
+    在 CSV 划分上评估两个模型，返回逐类别准确率对比
+
+    Returns:
+        报告字典
+    """
+    report = {'usage': usage, 'classes': {}}
+    confusions = {}
+    for label, path in (('fp32', fp32_path), ('int8', int8_path)):
+        evaluator = CSVBatchEvaluator(path, output_dir=os.path.join(output_dir, label))
+        confusion, throughput = evaluator.evaluate_split(csv_path, usage, batch_size)
+        evaluator.save_confusion_matrix(confusion)
+        confusions[label] = confusion
+        report[f'{label}_throughput'] = throughput
+        report[f'{label}_accuracy'] = float(np.trace(confusion) / confusion.sum()) if confusion.sum() else 0.0
+        evaluator.backend.close()
+
+    for i, emotion in enumerate(EMOTIONS):
+        total = int(confusions['fp32'][i].sum())
+        if total == 0:
+            continue
+        fp32_acc = confusions['fp32'][i, i] / total
+        int8_acc = confusions['int8'][i, i] / total
+        report['classes'][emotion] = {
+            'total': total,
+            'fp32': float(fp32_acc),
+            'int8': float(int8_acc),
+            'delta': float(int8_acc - fp32_acc),
+        }
+
+    report['delta'] = report['int8_accuracy'] - report['fp32_accuracy']
+    report['speedup'] = report['int8_throughput'] / report['fp32_throughput'] if report['fp32_throughput'] else 0.0
+    return report
+
+
+def print_report(report, max_drop, max_class_drop):
+    print(f"\n{'Class':<10} {'Samples':<9} {'FP32':<9} {'INT8':<9} {'Delta':<9}")
+    print("-" * 48)
+    for emotion, r in report['classes'].items():
+        flag = " !" if -r['delta'] > max_class_drop else ""
+        print(f"{emotion:<10} {r['total']:<9} {r['fp32']:<9.2%} {r['int8']:<9.2%} {r['delta'] * 100:+.2f}pp{flag}")
+    print("-" * 48)
+    print(f"{'overall':<10} {'':<9} {report['fp32_accuracy']:<9.2%} {report['int8_accuracy']:<9.2%} "
+          f"{report['delta'] * 100:+.2f}pp")
+    print(f"\n[INFO] Throughput: FP32 {report['fp32_throughput']:.0f} images/s, "
+          f"INT8 {report['int8_throughput']:.0f} images/s ({report['speedup']:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='训练后 INT8 量化（带准确率检查）')
+    parser.add_argument('--model', type=str, required=True,
+                        help='训练检查点 (.ckpt，会先导出 ONNX) 或导出的 FP32 ONNX 模型')
+    parser.add_argument('--data_csv', type=str, required=True, help='fer2013.csv 路径')
+    parser.add_argument('--output_dir', type=str, default='exported', help='输出目录')
+    parser.add_argument('--calib_samples', type=int, default=1024, help='校准样本数（从 Training 分层抽取）')
+    parser.add_argument('--calib_method', type=str, default='MinMax', choices=CALIBRATION_METHODS)
+    parser.add_argument('--per_tensor', action='store_true', help='权重按张量量化（默认按通道）')
+    parser.add_argument('--export_batch_size', type=int, default=32, help='从检查点导出时的固定批大小')
+    parser.add_argument('--eval_usage', type=str, default='PublicTest',
+                        choices=['Training', 'PublicTest', 'PrivateTest'], help='评估使用的划分')
+    parser.add_argument('--batch_size', type=int, default=256, help='评估批大小')
+    parser.add_argument('--max_drop', type=float, default=0.01, help='允许的总体准确率下降（比例）')
+    parser.add_argument('--max_class_drop', type=float, default=0.03, help='允许的单类别准确率下降（比例）')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    fp32_path = args.model
+    if not fp32_path.endswith('.onnx'):
+        from mindspore import context
+        from export import export_model
+        context.set_context(mode=context.GRAPH_MODE, device_target='CPU')
+        fp32_path = export_model(args.model, args.output_dir, formats=['ONNX'],
+                                 batch_size=args.export_batch_size)[0]
+
+    name = os.path.splitext(os.path.basename(fp32_path))[0]
+    int8_path = os.path.join(args.output_dir, f'{name}_int8.onnx')
+
+    calibration = sample_calibration_set(args.data_csv, args.calib_samples, args.seed)
+    quantize_onnx(fp32_path, int8_path, calibration, method=args.calib_method,
+                  per_channel=not args.per_tensor)
+
+    report = compare_accuracy(fp32_path, int8_path, args.data_csv, args.eval_usage, args.batch_size,
+                              os.path.join(args.output_dir, 'quantization_eval'))
+    if not report['classes']:
+        print(f"[ERROR] No samples with Usage={args.eval_usage} in {args.data_csv}; "
+              f"cannot check the accuracy of {int8_path}")
+        sys.exit(1)
+    print_report(report, args.max_drop, args.max_class_drop)
+
+    worst_class = min(report['classes'].items(), key=lambda kv: kv[1]['delta'])
+    passed = -report['delta'] <= args.max_drop and -worst_class[1]['delta'] <= args.max_class_drop
+    report.update({
+        'fp32_model': fp32_path,
+        'int8_model': int8_path,
+        'calibration': {'samples': len(calibration), 'method': args.calib_method,
+                        'per_channel': not args.per_tensor, 'seed': args.seed},
+        'max_drop': args.max_drop,
+        'max_class_drop': args.max_class_drop,
+        'passed': passed,
+    })
+
+    # INT8 模型的描述文件：沿用 FP32 的描述并记录量化信息
+    meta = read_artifact_meta(fp32_path)
+    meta.update({'files': [os.path.basename(int8_path)], 'quantization': report['calibration'],
+                 'source_model': os.path.basename(fp32_path)})
+    with open(artifact_meta_path(int8_path), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+    report_path = os.path.join(args.output_dir, 'quantization_report.json')
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"[SAVE] Report saved to {report_path}")
+
+    if passed:
+        print(f"[INFO] Accuracy guardrail passed (overall {report['delta'] * 100:+.2f}pp, "
+              f"worst class {worst_class[0]} {worst_class[1]['delta'] * 100:+.2f}pp)")
+    else:
+        print(f"[ERROR] Accuracy guardrail failed (overall {report['delta'] * 100:+.2f}pp, "
+              f"worst class {worst_class[0]} {worst_class[1]['delta'] * 100:+.2f}pp); "
+              f"do not deploy {int8_path}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""
+本地推理服务
+常驻进程只加载一次模型，用 asyncio 处理 HTTP 请求；并发请求在最大延迟预算内合并成批次统一推理，
+结果以 JSON 概率返回。只依赖标准库、NumPy、OpenCV 和所选推理后端。
+
+接口:
+    GET  /health          服务状态、后端和队列长度
+    GET  /stats           请求数、端到端/排队/推理延迟分位数、批大小分布
+    POST /predict         JSON 请求体，三选一:
+                              {"image": "<base64 编码的人脸图片>"}
+                              {"pixels": 48x48 或 [N, 48, 48] 的 0-255 数组}
+                              {"frame": "<base64 编码的整帧>"}（先检测人脸）
+    POST /predict/image   请求体为编码后的人脸图片（JPEG/PNG 等）
+    POST /predict/frame   请求体为编码后的整帧，先检测人脸
+
+示例:
+    python src/server.py --ckpt_path checkpoints/best_model.ckpt --port 8000
+    curl -s --data-binary @face.jpg http://127.0.0.1:8000/predict/image
+    python tools/load_test_server.py --url http://127.0.0.1:8000 --concurrency 32 --duration 20
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque, Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import cv2
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, script_dir)
+
+from backends import load_backend, BACKENDS
+from detection import FaceDetector, DETECT_POLICIES, load_face_cascade
+
+EMOTIONS = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
+
+# 动态批次补零到这些大小，避免图模式为每种批大小重新编译
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+MAX_BODY_BYTES = 16 * 1024 * 1024
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+class RequestError(Exception):
+    """客户端请求错误（返回 4xx）"""
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class LatencyStats:
+    """最近 window 个请求的延迟统计"""
+
+    def __init__(self, window=10000):
+        self.started = time.time()
+        self.requests = 0
+        self.faces = 0
+        self.errors = 0
+        self.total_ms = deque(maxlen=window)
+        self.queue_ms = deque(maxlen=window)
+        self.infer_ms = deque(maxlen=window)
+        self.batch_sizes = Counter()
+        self.completed = deque(maxlen=window)
+
+    def record_request(self, total_ms, num_faces):
+        self.requests += 1
+        self.faces += num_faces
+        self.total_ms.append(total_ms)
+        self.completed.append(time.time())
+
+    def record_batch(self, size, queue_ms, infer_ms):
+        self.batch_sizes[size] += 1
+        self.queue_ms.extend(queue_ms)
+        self.infer_ms.append(infer_ms)
+
+    @staticmethod
+    def _percentiles(values):
+        if not values:
+            return None
+        array = np.fromiter(values, dtype=np.float64)
+        return {'p50': float(np.percentile(array, 50)), 'p95': float(np.percentile(array, 95)),
+                'p99': float(np.percentile(array, 99)), 'mean': float(array.mean())}
+
+    def summary(self):
+        batches = sum(self.batch_sizes.values())
+        now = time.time()
+        recent = [t for t in self.completed if now - t <= 10]
+        return {
+            'uptime_s': now - self.started,
+            'requests': self.requests,
+            'faces': self.faces,
+            'errors': self.errors,
+            'requests_per_s_10s': len(recent) / 10.0,
+            'latency_ms': self._percentiles(self.total_ms),
+            'queue_ms': self._percentiles(self.queue_ms),
+            'inference_ms': self._percentiles(self.infer_ms),
+            'batches': batches,
+            'mean_batch_size': (sum(size * count for size, count in self.batch_sizes.items()) / batches
+                                if batches else 0.0),
+            'batch_size_histogram': {str(size): count for size, count in sorted(self.batch_sizes.items())},
+        }
+
+
+class DynamicBatcher:
+    """
+    动态批处理：把并发请求的人脸合并成一个批次推理
+
+    第一个请求到达后最多等待 max_latency_ms 收集更多请求，或凑满 max_batch_size 个人脸立即推理；
+    推理在单独的线程中串行执行，推理期间到达的请求在下一批中处理。
+
+    Args:
+        backend: 推理后端（backends.load_backend）
+        max_batch_size: 每批最多的人脸数
+        max_latency_ms: 为凑批次最多额外等待的时间
+        stats: LatencyStats
+    """
+
+    def __init__(self, backend, max_batch_size=32, max_latency_ms=5.0, stats=None):
+        self.backend = backend
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency_ms / 1000.0
+        self.stats = stats or LatencyStats()
+        self.queue = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='infer')
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        return asyncio.ensure_future(self._run())
+
+    async def submit(self, faces):
+        """
+        Args:
+            faces: float32 [N, 1, 48, 48]
+
+        Returns:
+            概率数组 [N, num_classes]
+        """
+        if len(faces) == 0:
+            return np.empty((0, len(EMOTIONS)), dtype=np.float32)
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((faces, future, time.perf_counter()))
+        return await future
+
+    def _bucket_size(self, n):
+        for size in BATCH_BUCKETS:
+            if n <= size:
+                return size
+        return n
+
+    def predict(self, inputs):
+        """同步推理；动态批大小的后端补零到固定的桶大小"""
+        if self.backend.batch_size is not None:
+            return self.backend.predict(inputs)
+        n = len(inputs)
+        size = self._bucket_size(n)
+        if size != n:
+            padded = np.zeros((size,) + inputs.shape[1:], dtype=np.float32)
+            padded[:n] = inputs
+            inputs = padded
+        return self.backend.predict(inputs)[:n]
+
+    def warmup(self):
+        """预先编译每种桶大小的计算图，避免首批请求变慢"""
+        sizes = [self.backend.batch_size] if self.backend.batch_size is not None else BATCH_BUCKETS
+        for size in sizes:
+            self.predict(np.zeros((size, 1, 48, 48), dtype=np.float32))
+            if size >= self.max_batch_size:
+                break
+
+    async def _collect(self):
+        first = await self.queue.get()
+        batch, count = [first], len(first[0])
+        deadline = first[2] + self.max_latency
+        while count < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                item = self.queue.get_nowait() if timeout <= 0 else \
+                    await asyncio.wait_for(self.queue.get(), timeout)
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                break
+            batch.append(item)
+            count += len(item[0])
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            inputs = np.concatenate([faces for faces, _, _ in batch])
+            start = time.perf_counter()
+            try:
+                probs = await loop.run_in_executor(self.executor, self.predict, inputs)
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            infer_ms = (time.perf_counter() - start) * 1000
+            self.stats.record_batch(len(inputs), [(start - t) * 1000 for _, _, t in batch], infer_ms)
+
+            offset = 0
+            for faces, future, _ in batch:
+                if not future.done():
+                    future.set_result(probs[offset:offset + len(faces)])
+                offset += len(faces)
+
+
+class InferenceService:
+    """请求解码、人脸检测与预处理（在线程池中运行，OpenCV 调用期间释放 GIL），推理交给 DynamicBatcher"""
+
+    def __init__(self, backend, batcher, detect_workers=None, detect_max_side=None, detect_policy='single'):
+        self.backend = backend
+        self.batcher = batcher
+        self.stats = batcher.stats
+        self.detect_max_side = detect_max_side
+        self.detect_policy = detect_policy
+        self.pool = ThreadPoolExecutor(max_workers=detect_workers or os.cpu_count() or 4,
+                                       thread_name_prefix='decode')
+        self._thread_local = threading.local()
+
+    def _detector(self):
+        """当前线程专用的 FaceDetector（CascadeClassifier 不保证多线程共享安全）"""
+        detector = getattr(self._thread_local, 'detector', None)
+        if detector is None:
+            detector = FaceDetector(load_face_cascade(), max_side=self.detect_max_side, policy=self.detect_policy)
+            self._thread_local.detector = detector
+        return detector
+
+    @staticmethod
+    def decode_image(data):
+        img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            raise RequestError("Cannot decode image")
+        return img
+
+    @staticmethod
+    def preprocess(gray_faces):
+        out = np.empty((len(gray_faces), 1, 48, 48), dtype=np.float32)
+        for i, face in enumerate(gray_faces):
+            out[i, 0] = cv2.resize(face, (48, 48)).astype('float32') / 255.0
+        return out
+
+    def prepare_face_image(self, data):
+        """整张图片就是一张人脸"""
+        img = self.decode_image(data)
+        h, w = img.shape
+        return self.preprocess([img]), [[0, 0, int(w), int(h)]]
+
+    def prepare_frame(self, data):
+        """整帧：检测人脸后逐个预处理"""
+        img = self.decode_image(data)
+        boxes = self._detector().detect(img)
+        crops = [img[y:y + h, x:x + w] for x, y, w, h in boxes]
+        return self.preprocess(crops), [[int(v) for v in box] for box in boxes]
+
+    @staticmethod
+    def prepare_pixels(pixels):
+        """48x48 原始像素（0-255）"""
+        try:
+            array = np.asarray(pixels, dtype=np.float32)
+        except (TypeError, ValueError):
+            raise RequestError("'pixels' must be a numeric array")
+        if array.shape[-2:] != (48, 48) or array.ndim not in (2, 3, 4):
+            raise RequestError(f"'pixels' must have shape [48, 48] or [N, 48, 48], got {list(array.shape)}")
+        array = array.reshape(-1, 1, 48, 48) / 255.0
+        return array.astype(np.float32), None
+
+    async def predict(self, kind, payload):
+        """
+        Args:
+            kind: 'image' / 'frame' / 'pixels'
+            payload: 图片字节或像素数组
+
+        Returns:
+            响应字典
+        """
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        if kind == 'pixels':
+            faces, boxes = self.prepare_pixels(payload)
+        else:
+            prepare = self.prepare_frame if kind == 'frame' else self.prepare_face_image
+            faces, boxes = await loop.run_in_executor(self.pool, prepare, payload)
+
+        probs = await self.batcher.submit(faces)
+        results = []
+        for i, p in enumerate(probs):
+            idx = int(np.argmax(p))
+            entry = {'emotion': EMOTIONS[idx], 'confidence': float(p[idx]),
+                     'probabilities': {e: float(v) for e, v in zip(EMOTIONS, p)}}
+            if boxes is not None:
+                entry['box'] = boxes[i]
+            results.append(entry)
+
+        latency_ms = (time.perf_counter() - start) * 1000
+        self.stats.record_request(latency_ms, len(results))
+        return {'faces': results, 'latency_ms': latency_ms}
+
+    def health(self):
+        return {'status': 'ok', 'backend': self.backend.describe(),
+                'queue_depth': self.batcher.queue.qsize() if self.batcher.queue else 0,
+                'max_batch_size': self.batcher.max_batch_size,
+                'max_latency_ms': self.batcher.max_latency * 1000}
+
+
+def parse_json_request(body):
+    try:
+        request = json.loads(body.decode('utf-8'))
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        raise RequestError("Request body is not valid JSON")
+    if not isinstance(request, dict):
+        raise RequestError("Request body must be a JSON object")
+
+    for kind in ('image', 'frame'):
+        if kind in request:
+            try:
+                return kind, base64.b64decode(request[kind], validate=True)
+            except (TypeError, ValueError):
+                raise RequestError(f"'{kind}' must be base64-encoded image data")
+    if 'pixels' in request:
+        return 'pixels', request['pixels']
+    raise RequestError("Request must contain one of 'image', 'pixels' or 'frame'")
+
+
+class HTTPServer:
+    """基于 asyncio streams 的最小 HTTP/1.1 服务（支持 keep-alive）"""
+
+    def __init__(self, service):
+        self.service = service
+
+    async def route(self, method, path, body):
+        if path == '/health':
+            return 200, self.service.health()
+        if path == '/stats':
+            return 200, self.service.stats.summary()
+        if path in ('/predict', '/predict/image', '/predict/frame'):
+            if method != 'POST':
+                raise RequestError("Use POST", 405)
+            if path == '/predict':
+                kind, payload = parse_json_request(body)
+            else:
+                kind, payload = path.rsplit('/', 1)[1], body
+            return 200, await self.service.predict(kind, payload)
+        raise RequestError(f"Unknown path: {path}", 404)
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', 0) or 0)
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                if length > MAX_BODY_BYTES:
+                    await self.respond(writer, 413, {'error': f'Body larger than {MAX_BODY_BYTES} bytes'}, False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                try:
+                    status, payload = await self.route(method.upper(), urlsplit(target).path, body)
+                except RequestError as e:
+                    self.service.stats.errors += 1
+                    status, payload = e.status, {'error': str(e)}
+                except Exception as e:
+                    self.service.stats.errors += 1
+                    status, payload = 500, {'error': f'{type(e).__name__}: {e}'}
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def respond(writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode('utf-8')
+        head = (f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+
+async def serve(args):
+    backend = load_backend(args.ckpt_path, backend=args.backend, device_target=args.device_target,
+                           num_threads=args.num_threads)
+    stats = LatencyStats()
+    batcher = DynamicBatcher(backend, args.max_batch_size, args.max_latency_ms, stats)
+    print("[INFO] Warming up...")
+    batcher.warmup()
+    service = InferenceService(backend, batcher, args.detect_workers, args.detect_max_side, args.detect_policy)
+
+    batch_task = batcher.start()
+    server = await asyncio.start_server(HTTPServer(service).handle, args.host, args.port)
+    print(f"[INFO] Serving on http://{args.host}:{args.port} "
+          f"(max batch {args.max_batch_size}, max latency {args.max_latency_ms} ms)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        batch_task.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地推理服务（动态批处理）')
+    parser.add_argument('--ckpt_path', type=str, required=True, help='模型检查点或导出的推理模型路径')
+    parser.add_argument('--backend', type=str, default='auto', choices=['auto'] + list(BACKENDS),
+                        help='推理后端 (默认按文件扩展名选择)')
+    parser.add_argument('--device_target', type=str, default='CPU', choices=['CPU', 'GPU', 'Ascend'])
+    parser.add_argument('--num_threads', type=int, default=None, help='推理线程数')
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--max_batch_size', type=int, default=32, help='每批最多的人脸数')
+    parser.add_argument('--max_latency_ms', type=float, default=5.0, help='为凑批次最多额外等待的毫秒数')
+    parser.add_argument('--detect_workers', type=int, default=None, help='解码/检测线程数（默认 CPU 核数）')
+    parser.add_argument('--detect_max_side', type=int, default=None, help='检测时图像长边的最大像素数')
+    parser.add_argument('--detect_policy', type=str, default='single', choices=DETECT_POLICIES)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        print("\n[INFO] Server stopped")
+
+
+if __name__ == '__main__':
+    main()
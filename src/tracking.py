@@ -0,0 +1,257 @@
+# tracking.py
+"""
+检测 + 跟踪：用廉价的模板匹配跟踪代替逐帧 Haar 检测
+完整检测每 K 帧运行一次，或在跟踪置信度下降时立即运行；
+两次检测之间，人脸框在上一帧位置附近的搜索区域内做模板匹配传播。
+每条轨迹有稳定的人脸 ID，并可按轨迹缓存和平滑表情预测。
+"""
+import cv2
+import numpy as np
+
+
+class FaceTrack:
+    """单个人脸轨迹"""
+
+    def __init__(self, track_id, box):
+        self.id = track_id
+        self.box = tuple(int(v) for v in box)  # (x, y, w, h)
+        self.template = None   # 缩放后的灰度模板
+        self.scale = 1.0       # 模板相对原图的缩放比例
+        self.confidence = 1.0  # 最近一次跟踪/检测的置信度
+        self.age = 0           # 存活帧数
+        self.misses = 0        # 连续未被检测器确认的检测轮数
+        self.cached_input = None    # 上次推理时的 48x48 输入（TemporalPredictionCache 使用）
+        self.probs = None           # 上次推理的概率
+        self.smoothed_probs = None  # EMA 平滑后的概率
+
+
+def box_iou(a, b):
+    """两个 (x, y, w, h) 框的 IoU"""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    ih = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = iw * ih
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+
+class FaceTracker:
+    """
+    检测 + 模板匹配跟踪
+
+    Args:
+        detect_fn: 检测函数 detect_fn(gray) -> [(x, y, w, h), ...]
+        detect_interval: 每隔多少帧做一次完整检测
+        min_confidence: 跟踪置信度（归一化相关系数）低于该值时立即重新检测
+        search_margin: 搜索区域在每个方向上扩展的比例（相对人脸尺寸）
+        template_size: 模板缩放后的边长（像素），越小越快
+        iou_threshold: 检测框与轨迹关联的最小 IoU
+        max_misses: 轨迹连续多少轮检测未被确认后删除
+    """
+
+    def __init__(self, detect_fn, detect_interval=5, min_confidence=0.6, search_margin=0.5,
+                 template_size=32, iou_threshold=0.3, max_misses=1):
+        self.detect_fn = detect_fn
+        self.detect_interval = max(1, detect_interval)
+        self.min_confidence = min_confidence
+        self.search_margin = search_margin
+        self.template_size = template_size
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+
+        self.tracks = []
+        self.next_id = 1
+        self.frame_index = 0
+        self.last_detect_frame = None
+        self.num_detections = 0
+
+    def update(self, frame):
+        """
+        处理一帧
+
+        Args:
+            frame: BGR 或灰度图像
+
+        Returns:
+            当前活跃轨迹列表 [FaceTrack, ...]
+        """
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if len(frame.shape) == 3 else frame
+
+        # 先用模板匹配传播已有轨迹
+        low_confidence = False
+        for track in self.tracks:
+            self._propagate(track, gray)
+            track.age += 1
+            if track.confidence < self.min_confidence:
+                low_confidence = True
+
+        due = (self.last_detect_frame is None or
+               self.frame_index - self.last_detect_frame >= self.detect_interval)
+        if due or low_confidence:
+            self._detect(gray)
+
+        self.frame_index += 1
+        return list(self.tracks)
+
+    def _detect(self, gray):
+        """运行完整检测并与已有轨迹关联"""
+        boxes = [tuple(int(v) for v in b) for b in self.detect_fn(gray)]
+        self.last_detect_frame = self.frame_index
+        self.num_detections += 1
+
+        # 贪心 IoU 关联
+        pairs = []
+        for ti, track in enumerate(self.tracks):
+            for di, box in enumerate(boxes):
+                iou = box_iou(track.box, box)
+                if iou >= self.iou_threshold:
+                    pairs.append((iou, ti, di))
+        pairs.sort(reverse=True)
+
+        matched_tracks, matched_boxes = set(), set()
+        for _, ti, di in pairs:
+            if ti in matched_tracks or di in matched_boxes:
+                continue
+            matched_tracks.add(ti)
+            matched_boxes.add(di)
+            track = self.tracks[ti]
+            track.box = boxes[di]
+            track.confidence = 1.0
+            track.misses = 0
+            self._set_template(track, gray)
+
+        # 未被确认的轨迹：跟踪仍可靠时保留若干轮
+        survivors = []
+        for ti, track in enumerate(self.tracks):
+            if ti not in matched_tracks:
+                track.misses += 1
+                if track.misses > self.max_misses or track.confidence < self.min_confidence:
+                    continue
+            survivors.append(track)
+
+        # 新出现的人脸
+        for di, box in enumerate(boxes):
+            if di not in matched_boxes:
+                track = FaceTrack(self.next_id, box)
+                self.next_id += 1
+                self._set_template(track, gray)
+                survivors.append(track)
+
+        self.tracks = survivors
+
+    def _set_template(self, track, gray):
+        x, y, w, h = track.box
+        patch = gray[max(0, y):y+h, max(0, x):x+w]
+        if patch.size == 0:
+            track.template = None
+            return
+        track.scale = self.template_size / max(w, h)
+        size = (max(1, int(round(patch.shape[1] * track.scale))),
+                max(1, int(round(patch.shape[0] * track.scale))))
+        track.template = cv2.resize(patch, size, interpolation=cv2.INTER_AREA)
+
+    def _propagate(self, track, gray):
+        """在上一位置附近的缩放搜索区域内做模板匹配"""
+        if track.template is None:
+            track.confidence = 0.0
+            return
+
+        x, y, w, h = track.box
+        img_h, img_w = gray.shape[:2]
+        mx, my = int(w * self.search_margin), int(h * self.search_margin)
+        x0, y0 = max(0, x - mx), max(0, y - my)
+        x1, y1 = min(img_w, x + w + mx), min(img_h, y + h + my)
+        region = gray[y0:y1, x0:x1]
+
+        size = (int(round((x1 - x0) * track.scale)), int(round((y1 - y0) * track.scale)))
+        th, tw = track.template.shape[:2]
+        if size[0] < tw or size[1] < th:
+            track.confidence = 0.0
+            return
+        region = cv2.resize(region, size, interpolation=cv2.INTER_AREA)
+
+        result = cv2.matchTemplate(region, track.template, cv2.TM_CCOEFF_NORMED)
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+
+        nx = x0 + int(round(max_loc[0] / track.scale))
+        ny = y0 + int(round(max_loc[1] / track.scale))
+        track.box = (nx, ny, w, h)
+        track.confidence = float(max_val)
+
+    @property
+    def detection_ratio(self):
+        """做了完整检测的帧所占比例"""
+        return self.num_detections / self.frame_index if self.frame_index > 0 else 0.0
+
+
+class TemporalPredictionCache:
+    """
+    按轨迹缓存预测结果并做指数滑动平均（EMA）
+
+    每条轨迹记住上次推理时的 48x48 输入；当前裁剪与之差异（平均绝对差，0-1 范围）
+    小于 change_threshold 时直接复用上次的概率，否则重新推理。
+    新的推理结果以 ema_alpha 的权重并入平滑后的概率，抑制标签闪烁。
+
+    Args:
+        preprocess_fn: preprocess_fn(face_imgs) -> float32 [N, 1, 48, 48]
+        predict_fn: predict_fn(inputs) -> 概率 [N, num_classes]
+        change_threshold: 复用缓存的最大平均像素差
+        ema_alpha: 新结果在 EMA 中的权重（1.0 表示不平滑）
+    """
+
+    def __init__(self, preprocess_fn, predict_fn, change_threshold=0.02, ema_alpha=0.5):
+        self.preprocess_fn = preprocess_fn
+        self.predict_fn = predict_fn
+        self.change_threshold = change_threshold
+        self.ema_alpha = ema_alpha
+        self.hits = 0
+        self.misses = 0
+
+    def predict(self, frame, tracks, boxes=None):
+        """
+        预测所有轨迹当前的平滑概率
+
+        Args:
+            frame: 当前帧
+            tracks: FaceTrack 列表
+            boxes: 与 frame 对应的人脸框快照（默认取 track.box；流水线中跟踪器可能已前进到下一帧）
+
+        Returns:
+            概率数组 [N, num_classes]
+        """
+        if len(tracks) == 0:
+            return np.empty((0, 0), dtype=np.float32)
+
+        boxes = boxes if boxes is not None else [t.box for t in tracks]
+        crops = [frame[max(0, y):y+h, max(0, x):x+w] for (x, y, w, h) in boxes]
+        inputs = self.preprocess_fn(crops)
+
+        stale = []
+        for i, track in enumerate(tracks):
+            cached = track.cached_input
+            if cached is None or np.abs(inputs[i, 0] - cached).mean() >= self.change_threshold:
+                stale.append(i)
+
+        self.misses += len(stale)
+        self.hits += len(tracks) - len(stale)
+
+        if stale:
+            fresh = self.predict_fn(inputs[stale])
+            for j, i in enumerate(stale):
+                track = tracks[i]
+                track.cached_input = inputs[i, 0].copy()
+                track.probs = fresh[j]
+                if track.smoothed_probs is None:
+                    track.smoothed_probs = fresh[j].copy()
+                else:
+                    track.smoothed_probs = (self.ema_alpha * fresh[j] +
+                                            (1 - self.ema_alpha) * track.smoothed_probs)
+
+        return np.stack([t.smoothed_probs for t in tracks])
+
+    @property
+    def hit_rate(self):
+        """复用缓存的比例"""
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
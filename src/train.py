@@ -1,6 +1,10 @@
 # train.py
 import argparse
 import os
+import socket
+import subprocess
+import sys
+import time
 import numpy as np
 
 from mindspore.train import Model
@@ -9,11 +13,18 @@ from mindspore.train.serialization import save_checkpoint
 from mindspore import nn
 from mindspore import context
 from mindspore.dataset import GeneratorDataset
-from mindspore import ops, Tensor
+from mindspore.dataset import config as ds_config
+from mindspore import ops, Tensor, set_seed
+from mindspore.communication import init, get_rank, get_group_size
+from mindspore.common import dtype as mstype
 import mindspore.numpy as mnp
 
-from dataset import FER2013Dataset
-from model import SimpleCNN
+from dataset import FER2013Dataset, FER2013BatchTransform, load_fer2013_split
+from model import SimpleCNN, default_channels, architecture_channels, architecture_summary, ATTENTION_PLACEMENTS
+from model_registry import load_network, save_checkpoint as save_configured_checkpoint, checkpoint_hash, \
+    encode_arch_config, ARCH_CONFIG_KEY
+from optimize import forward_logits
+from mindrecord_dataset import ensure_mindrecord, create_mindrecord_dataset
 
 
 class LabelSmoothingCrossEntropy(nn.Cell):
@@ -74,64 +85,194 @@ class MixupLoss(nn.Cell):
         return lam_mean * loss_a + (1 - lam_mean) * loss_b
 
 
-class EvalCallback(Callback):
-    """验证集评估回调函数"""
-    def __init__(self, model, val_dataset, save_dir='checkpoints', eval_per_epoch=1):
-        super(EvalCallback, self).__init__()
+class DistillationLoss(nn.Cell):
+    """
+    知识蒸馏损失：alpha * T^2 * CE(teacher_T, student_T) + (1 - alpha) * base_loss(student, labels)
+
+    teacher_T / student_T 为温度 T 下的 softmax；与 KL 散度只差教师熵这一常数项，梯度相同。
+    base_loss 为真实标签上的损失（LabelSmoothingCrossEntropy 或 Mixup 时的 SoftTargetCrossEntropy）。
+    """
+    def __init__(self, base_loss, alpha=0.7, temperature=4.0):
+        super(DistillationLoss, self).__init__()
+        self.base_loss = base_loss
+        self.alpha = alpha
+        self.temperature = temperature
+        self.softmax = nn.Softmax(axis=1)
+        self.log_softmax = nn.LogSoftmax(axis=1)
+
+    def construct(self, logits, teacher_logits, labels):
+        t = self.temperature
+        soft_targets = self.softmax(teacher_logits / t)
+        log_probs = self.log_softmax(logits / t)
+        soft_loss = -ops.reduce_mean(ops.reduce_sum(soft_targets * log_probs, 1)) * (t * t)
+        hard_loss = self.base_loss(logits, labels)
+        return self.alpha * soft_loss + (1 - self.alpha) * hard_loss
+
+
+class DistillWithLossCell(nn.Cell):
+    """
+    学生网络 + 蒸馏损失
+
+    teacher 为 None 时教师 logits 由数据集预先计算（第三列 teacher_logits）；
+    否则在同一训练步内对增强后的批次做一次教师前向（不求梯度）。
+    auto_prefix=False 保证学生参数名与单独保存时一致，教师参数需预先加 'teacher.' 前缀避免重名。
+    """
+    def __init__(self, student, loss_fn, teacher=None):
+        super(DistillWithLossCell, self).__init__(auto_prefix=False)
+        self.student = student
+        self.loss_fn = loss_fn
+        self.teacher = teacher
+
+    def construct(self, images, labels, *cached):
+        logits = self.student(images)
+        if self.teacher is None:
+            teacher_logits = cached[0]
+        else:
+            teacher_logits = ops.stop_gradient(self.teacher(images))
+        return self.loss_fn(logits, teacher_logits, labels)
+
+
+class ValidationCallback(Callback):
+    """验证集评估回调：每个评估周期只跑一次验证，并把指标发布给所有订阅者
+
+    Args:
+        model: Model 对象
+        val_dataset: 完整验证集
+        eval_per_epoch: 每隔多少个 epoch 做一次完整验证
+        subsample_dataset: 可选的验证子集，在两次完整验证之间做廉价的中间检查
+        subscribers: 订阅者列表（ValidationSubscriber）
+        total_epochs: 训练总 epoch 数，最后一个 epoch 总是做完整验证（即使不是 eval_per_epoch 的倍数）
+    """
+    def __init__(self, model, val_dataset, eval_per_epoch=1, subsample_dataset=None, subscribers=None,
+                 total_epochs=None):
+        super(ValidationCallback, self).__init__()
         self.model = model
         self.val_dataset = val_dataset
         self.eval_per_epoch = eval_per_epoch
-        self.save_dir = save_dir
-        self.best_acc = 0.0
-        self.best_epoch = 0
+        self.subsample_dataset = subsample_dataset
+        self.subscribers = list(subscribers or [])
+        self.total_epochs = total_epochs
+
+    def subscribe(self, subscriber):
+        self.subscribers.append(subscriber)
+        return subscriber
 
     def on_train_epoch_end(self, run_context):
         cb_params = run_context.original_args()
         cur_epoch = cb_params.cur_epoch_num
 
-        if cur_epoch % self.eval_per_epoch == 0:
-            result = self.model.eval(self.val_dataset, dataset_sink_mode=False)
-            acc = result['accuracy']
-            print(f"\nEpoch {cur_epoch} - Validation Accuracy: {acc:.4f}")
+        if cur_epoch % self.eval_per_epoch == 0 or cur_epoch == self.total_epochs:
+            dataset, full = self.val_dataset, True
+        elif self.subsample_dataset is not None:
+            dataset, full = self.subsample_dataset, False
+        else:
+            return
+
+        metrics = self.model.eval(dataset, dataset_sink_mode=False)
+        for subscriber in self.subscribers:
+            subscriber.on_validation(run_context, cur_epoch, metrics, full)
 
-            if acc > self.best_acc:
-                self.best_acc = acc
-                self.best_epoch = cur_epoch
-                print(f"New best accuracy: {self.best_acc:.4f} at epoch {cur_epoch}")
 
-                # 保存最佳模型
-                best_model_path = os.path.join(self.save_dir, 'best_model.ckpt')
+class ValidationSubscriber:
+    """验证指标订阅者基类"""
+    def on_validation(self, run_context, epoch, metrics, full):
+        """
+        Args:
+            run_context: 训练回调上下文
+            epoch: 当前 epoch
+            metrics: model.eval 返回的指标字典
+            full: True 表示完整验证集，False 表示验证子集
+        """
+        raise NotImplementedError
+
+
+class ValidationLogger(ValidationSubscriber):
+    """打印并记录每次验证的指标"""
+    def __init__(self):
+        self.history = []
+
+    def on_validation(self, run_context, epoch, metrics, full):
+        self.history.append({'epoch': epoch, 'full': full, **metrics})
+        scope = "Validation" if full else "Validation (subset)"
+        print(f"\nEpoch {epoch} - {scope} Accuracy: {metrics['accuracy']:.4f}")
+
+
+class EvalCallback(ValidationSubscriber):
+    """
+    保存最佳模型（只根据完整验证集的结果）
+
+    Args:
+        network: 要保存的网络（None 表示训练网络；蒸馏时只保存学生）
+        arch_config: 写入检查点的结构配置（非默认结构时模型注册表据此构建网络）
+    """
+    def __init__(self, save_dir='checkpoints', network=None, arch_config=None):
+        self.save_dir = save_dir
+        self.network = network
+        self.arch_config = arch_config
+        self.best_acc = 0.0
+        self.best_epoch = 0
+
+    def on_validation(self, run_context, epoch, metrics, full):
+        if not full:
+            return
+
+        acc = metrics['accuracy']
+        if acc > self.best_acc:
+            self.best_acc = acc
+            self.best_epoch = epoch
+            print(f"New best accuracy: {self.best_acc:.4f} at epoch {epoch}")
+
+            # 保存最佳模型
+            best_model_path = os.path.join(self.save_dir, 'best_model.ckpt')
+            if self.network is None:
+                cb_params = run_context.original_args()
                 save_checkpoint(cb_params.train_network, best_model_path)
-                print(f"Saved best model to: {best_model_path}")
+            else:
+                save_configured_checkpoint(self.network, best_model_path, self.arch_config)
+            print(f"Saved best model to: {best_model_path}")
 
 
-class EarlyStoppingCallback(Callback):
-    """早停回调函数"""
-    def __init__(self, model, val_dataset, patience=10, min_delta=0.001):
-        super(EarlyStoppingCallback, self).__init__()
-        self.model = model
-        self.val_dataset = val_dataset
+class EarlyStoppingCallback(ValidationSubscriber):
+    """早停：完整验证集准确率连续 patience 个 epoch 没有提升时停止训练"""
+    def __init__(self, patience=10, min_delta=0.001):
         self.patience = patience
         self.min_delta = min_delta
         self.best_acc = 0.0
-        self.counter = 0
+        self.best_epoch = 0
 
-    def on_train_epoch_end(self, run_context):
-        result = self.model.eval(self.val_dataset, dataset_sink_mode=False)
-        acc = result['accuracy']
+    def on_validation(self, run_context, epoch, metrics, full):
+        if not full:
+            return
 
+        acc = metrics['accuracy']
         if acc > self.best_acc + self.min_delta:
             self.best_acc = acc
-            self.counter = 0
+            self.best_epoch = epoch
         else:
-            self.counter += 1
-            print(f"EarlyStopping counter: {self.counter}/{self.patience}")
+            # 按 epoch 计数，验证间隔大于 1 时语义不变
+            counter = epoch - self.best_epoch
+            print(f"EarlyStopping counter: {counter}/{self.patience}")
 
-            if self.counter >= self.patience:
+            if counter >= self.patience:
                 print(f"\nEarly stopping triggered! Best accuracy: {self.best_acc:.4f}")
                 run_context.request_stop()
 
 
+class StopSyncCallback(Callback):
+    """
+    数据并行时同步停止请求：只有 rank 0 运行早停，其他进程必须在同一个 epoch 结束，
+    否则会卡在下一次梯度 AllReduce 上。需放在所有回调之后，每个进程都要添加。
+    """
+    def __init__(self):
+        super(StopSyncCallback, self).__init__()
+        self.allreduce = ops.AllReduce(ops.ReduceOp.MAX)
+
+    def on_train_epoch_end(self, run_context):
+        flag = Tensor([1.0 if run_context.get_stop_requested() else 0.0], mstype.float32)
+        if float(self.allreduce(flag).asnumpy()[0]) > 0:
+            run_context.request_stop()
+
+
 
 
 
@@ -155,37 +296,235 @@ def mixup_batch(images, labels, alpha=0.2):
     return mixed_images, labels_a, labels_b, lam
 
 
-def create_dataset(csv_path, usage, batch_size, shuffle=True, augment=False, mixup=False, mixup_alpha=0.2, use_soft_labels=False):
+def configure_data_pipeline(prefetch_size=None, shared_mem=True):
+    """
+    设置 MindSpore 数据管道的全局参数
+
+    Args:
+        prefetch_size: 每个算子的预取队列深度（None 表示使用默认值）
+        shared_mem: 多进程 worker 之间通过共享内存传输批数据
+    """
+    if prefetch_size is not None:
+        ds_config.set_prefetch_size(prefetch_size)
+    ds_config.set_enable_shared_mem(shared_mem)
+
+
+class DistillationSource:
+    """在 raw 模式数据源的每个样本后附加预先计算的教师 logits"""
+    def __init__(self, source, teacher_logits):
+        if len(source) != len(teacher_logits):
+            raise ValueError(f"Teacher logits cover {len(teacher_logits)} samples, dataset has {len(source)}")
+        self.source = source
+        self.teacher_logits = teacher_logits
+
+    def __getitem__(self, index):
+        image, label = self.source[index]
+        return image, label, self.teacher_logits[index]
+
+    def __len__(self):
+        return len(self.source)
+
+
+class DistillBatchTransform:
+    """FER2013BatchTransform 的包装：图像和标签照常处理，教师 logits 原样透传"""
+    def __init__(self, batch_transform):
+        self.batch_transform = batch_transform
+
+    def __call__(self, images, labels, teacher_logits, batch_info=None):
+        pixels, out_labels = self.batch_transform(images, labels, batch_info)
+        return pixels, out_labels, [np.asarray(t, dtype=np.float32) for t in teacher_logits]
+
+
+def load_teacher(ckpt_path):
+    """
+    加载教师网络：折叠 BatchNorm、移除 Dropout 以减少前向开销，冻结参数并加 'teacher.' 前缀
+
+    Returns:
+        eval 模式的教师网络
+    """
+    teacher = load_network(ckpt_path, cached=False, optimize=True)
+    for param in teacher.get_parameters():
+        param.requires_grad = False
+        param.name = 'teacher.' + param.name
+    return teacher
+
+
+def precompute_teacher_logits(teacher, teacher_ckpt, csv_path, usage='Training', batch_size=256, cache_dir='.'):
+    """
+    对不做增强的数据一次性计算教师 logits，按教师检查点哈希缓存到 .npy，重复训练时直接读取
+
+    Returns:
+        float32 数组 [N, num_classes]，顺序与 FER2013Dataset(usage) 一致
+    """
+    digest = checkpoint_hash(teacher_ckpt)[:12]
+    cache_path = os.path.join(cache_dir, f'teacher_logits_{usage}_{digest}.npy')
+    if os.path.exists(cache_path):
+        print(f"[INFO] Using cached teacher logits: {cache_path}")
+        return np.load(cache_path, mmap_mode='r')
+
+    images, _ = load_fer2013_split(csv_path, usage)
+    print(f"[INFO] Computing teacher logits for {len(images)} {usage} images...")
+    logits = forward_logits(teacher, images, batch_size).astype(np.float32)
+    # 写临时文件再原子替换：数据并行时多个进程可能同时计算并读取同一个缓存
+    tmp_path = f'{cache_path}.tmp{os.getpid()}'
+    with open(tmp_path, 'wb') as f:
+        np.save(f, logits)
+    os.replace(tmp_path, cache_path)
+    print(f"[SAVE] Teacher logits cached to {cache_path}")
+    return logits
+
+
+def create_dataset(csv_path, usage, batch_size, shuffle=True, augment=False, mixup=False, mixup_alpha=0.2, use_soft_labels=False,
+                   seed=None, num_workers=1, teacher_logits=None, num_shards=None, shard_id=None):
     """创建数据集，支持数据增强和Mixup
 
+    数据源只产生 uint8 图像，增强、Mixup 和 one-hot 转换由 FER2013BatchTransform
+    在 batch 阶段对整批向量化完成。
+
     Args:
         use_soft_labels: 如果为True，验证集也返回one-hot标签（用于兼容SoftTargetCrossEntropy）
+        seed: 随机种子，固定后每个批次的增强结果可复现（与 worker 数量无关）
+        num_workers: 批处理 worker 进程数，大于 1 时在多个进程中并行执行增强
+        teacher_logits: 预先计算的教师 logits [N, num_classes]，给出时数据集多一列 teacher_logits
+            （只适用于不做增强和 Mixup 的数据，否则 logits 与实际输入不对应）
+        num_shards, shard_id: 数据并行时把数据集分成 num_shards 份，只读取第 shard_id 份
+            （各进程每个 epoch 的洗牌顺序相同，分片互不重叠）
     """
+    # Mixup 只在训练集上使用
+    mixup = mixup and usage == 'Training'
+    ds_generator = FER2013Dataset(csv_path, usage=usage, raw=True)
+    # 各分片的批次编号相同，按分片偏移种子，避免所有进程使用同一串增强参数
+    if seed is not None and shard_id is not None:
+        seed = seed + 1000003 * shard_id
     # 如果使用Mixup训练，验证集也需要返回软标签以兼容loss函数
-    if use_soft_labels and not mixup and usage != 'Training':
-        # 验证集：不使用mixup，但返回one-hot标签
-        ds_generator = FER2013Dataset(csv_path, usage=usage, augment=False,
-                                      mixup=False, mixup_alpha=0.0)
-
-        def to_onehot(image, label):
-            """将硬标签转换为one-hot软标签"""
-            onehot = np.zeros(7, dtype=np.float32)
-            onehot[label] = 1.0
-            return image, onehot
-
-        ds = GeneratorDataset(ds_generator, column_names=['image', 'label'], shuffle=shuffle)
-        ds = ds.map(operations=to_onehot, input_columns=['image', 'label'],
-                   output_columns=['image', 'label'])
-    else:
-        # 正常模式（训练集使用mixup或不使用）
-        ds_generator = FER2013Dataset(csv_path, usage=usage, augment=augment,
-                                      mixup=mixup, mixup_alpha=mixup_alpha)
-        ds = GeneratorDataset(ds_generator, column_names=['image', 'label'], shuffle=shuffle)
-
-    ds = ds.batch(batch_size, drop_remainder=True)
+    batch_transform = FER2013BatchTransform(augment=augment, mixup=mixup, mixup_alpha=mixup_alpha,
+                                            onehot=use_soft_labels, seed=seed)
+
+    columns = ['image', 'label']
+    if teacher_logits is not None:
+        if augment or mixup:
+            raise ValueError("Precomputed teacher logits cannot be used with augmentation or Mixup")
+        ds_generator = DistillationSource(ds_generator, teacher_logits)
+        batch_transform = DistillBatchTransform(batch_transform)
+        columns.append('teacher_logits')
+
+    # 数据源只是内存映射索引，用线程即可；耗时的批处理放到多进程中
+    parallel = num_workers > 1
+    ds = GeneratorDataset(ds_generator, column_names=columns, shuffle=shuffle,
+                          num_parallel_workers=num_workers, python_multiprocessing=False,
+                          num_shards=num_shards, shard_id=shard_id)
+    ds = ds.batch(batch_size, drop_remainder=True, input_columns=columns,
+                  per_batch_map=batch_transform, num_parallel_workers=num_workers,
+                  python_multiprocessing=parallel)
     return ds
 
 
+def build_arch_config(args):
+    """
+    根据命令行参数生成网络结构配置
+
+    Returns:
+        (channels, arch_config)；默认结构且不是蒸馏时 arch_config 为 None（检查点与原来相同）
+    """
+    width = args.width if args.width is not None else (0.5 if args.teacher_ckpt else 1.0)
+    depth = [int(d) for d in args.depth.split(',')]
+    if len(depth) == 1:
+        depth = depth * 4
+    if len(depth) != 4:
+        raise ValueError(f"--depth expects 1 or 4 values, got {args.depth}")
+    channels = architecture_channels(width=width, depth=depth, attention=args.attention,
+                                     reduction=args.reduction, spatial_kernel=args.spatial_kernel)
+    if channels == default_channels() and not args.teacher_ckpt:
+        return channels, None
+
+    arch_config = {'type': 'simple_cnn', 'channels': channels, 'width': width, 'depth': depth,
+                   'attention': args.attention, 'reduction': args.reduction,
+                   'spatial_kernel': args.spatial_kernel}
+    if args.teacher_ckpt:
+        arch_config['distilled_from'] = os.path.basename(args.teacher_ckpt)
+    return channels, arch_config
+
+
+def launch_data_parallel(num_procs, save_dir, threads_per_proc=None, port=None):
+    """
+    在本机启动数据并行训练：一个 scheduler 进程和 num_procs 个 worker 进程（MindSpore 动态组网，
+    CPU 上通过 MS_* 环境变量组网，不需要 mpirun 或 GPU），各进程用相同的命令行参数重新运行本脚本
+
+    rank 0 的输出直接打印，其他进程写入 save_dir/dp_logs/worker_<rank>.log
+
+    Returns:
+        退出码（任一进程失败时终止其余进程并返回非零值）
+    """
+    if port is None:
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            port = s.getsockname()[1]
+    threads = threads_per_proc or max(1, (os.cpu_count() or 1) // num_procs)
+    log_dir = os.path.join(save_dir, 'dp_logs')
+    os.makedirs(log_dir, exist_ok=True)
+
+    base_env = dict(os.environ, MS_WORKER_NUM=str(num_procs), MS_SCHED_HOST='127.0.0.1',
+                    MS_SCHED_PORT=str(port), OMP_NUM_THREADS=str(threads))
+    command = [sys.executable] + sys.argv
+    print(f"[INFO] Launching {num_procs} data-parallel workers ({threads} threads each), logs in {log_dir}")
+
+    logs, procs = [], []
+    for role, node_id in [('MS_SCHED', 'sched')] + [('MS_WORKER', str(rank)) for rank in range(num_procs)]:
+        env = dict(base_env, MS_ROLE=role)
+        if role == 'MS_WORKER':
+            env['MS_NODE_ID'] = node_id
+        if node_id == '0':
+            procs.append(subprocess.Popen(command, env=env))
+            continue
+        log = open(os.path.join(log_dir, f'worker_{node_id}.log' if role == 'MS_WORKER' else 'scheduler.log'), 'w')
+        logs.append(log)
+        procs.append(subprocess.Popen(command, env=env, stdout=log, stderr=subprocess.STDOUT))
+
+    exit_code = 0
+    try:
+        # 轮询而不是逐个 wait：某个进程失败时其余进程会卡在 AllReduce 上，需要主动终止
+        while exit_code == 0 and any(proc.poll() is None for proc in procs):
+            for proc in procs:
+                if proc.poll() not in (None, 0):
+                    exit_code = proc.returncode
+                    print(f"[ERROR] Process {proc.pid} exited with code {exit_code}, stopping the others")
+                    break
+            time.sleep(1)
+        exit_code = exit_code or next((proc.returncode for proc in procs if proc.returncode), 0)
+    except KeyboardInterrupt:
+        exit_code = 1
+    finally:
+        for proc in procs:
+            if proc.poll() is None:
+                proc.terminate()
+        for log in logs:
+            log.close()
+    return exit_code
+
+
+def init_data_parallel():
+    """
+    在 launch_data_parallel 启动的进程中初始化通信并开启数据并行（梯度求平均后 AllReduce，
+    训练开始前把 rank 0 的初始参数广播给其他进程）
+
+    Returns:
+        (rank, group_size)
+    """
+    init()
+    if os.environ.get('MS_ROLE') == 'MS_SCHED':
+        # scheduler 只负责组网，所有 worker 结束后退出
+        sys.exit(0)
+    rank, group_size = get_rank(), get_group_size()
+    context.set_auto_parallel_context(parallel_mode=context.ParallelMode.DATA_PARALLEL, gradients_mean=True,
+                                      parameter_broadcast=True, device_num=group_size)
+    return rank, group_size
+
+
+def sync_processes():
+    """数据并行时等待所有进程到达这里（用一次 AllReduce 实现）"""
+    ops.AllReduce()(Tensor([0.0], mstype.float32)).asnumpy()
+
+
 def parse_args():
     parser = argparse.ArgumentParser(description='Train FER2013 emotion recognition model')
     parser.add_argument('--data_csv', type=str, required=True, help='Path to fer2013.csv')
@@ -200,6 +539,37 @@ def parse_args():
     parser.add_argument('--label_smoothing', type=float, default=0.12, help='Label smoothing factor')
     parser.add_argument('--mixup', action='store_true', help='Enable Mixup augmentation')
     parser.add_argument('--mixup_alpha', type=float, default=0.4, help='Mixup alpha (default=0.4)')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for data augmentation')
+    parser.add_argument('--num_workers', type=int, default=1, help='Number of data loading worker processes')
+    parser.add_argument('--prefetch_size', type=int, default=None, help='Prefetch queue depth of the data pipeline')
+    parser.add_argument('--data_format', type=str, default='generator', choices=['generator', 'mindrecord'],
+                        help='generator: Python GeneratorDataset; mindrecord: MindRecord with native vision transforms')
+    parser.add_argument('--mindrecord_dir', type=str, default=None,
+                        help='MindRecord directory (default: next to the CSV, converted on first use)')
+    parser.add_argument('--dataset_sink_mode', action='store_true',
+                        help='Feed training batches through dataset sink mode')
+    parser.add_argument('--num_procs', type=int, default=1,
+                        help='Number of local data-parallel training processes (each trains on its own shard)')
+    parser.add_argument('--threads_per_proc', type=int, default=None,
+                        help='Compute threads per training process (default: CPU cores / num_procs)')
+    parser.add_argument('--no_lr_scaling', action='store_true',
+                        help='Do not scale the learning rate with the global batch size in data-parallel mode')
+    parser.add_argument('--eval_interval', type=int, default=1, help='Run full validation every N epochs')
+    parser.add_argument('--teacher_ckpt', type=str, default=None,
+                        help='Teacher checkpoint; enables knowledge distillation into a smaller student')
+    parser.add_argument('--distill_alpha', type=float, default=0.7,
+                        help='Weight of the teacher soft-label loss (1 - alpha goes to ground truth)')
+    parser.add_argument('--distill_temperature', type=float, default=4.0, help='Distillation softmax temperature')
+    parser.add_argument('--width', type=float, default=None,
+                        help='Channel width multiplier of 64/128/256/512 (default 1.0, or 0.5 for a distilled student)')
+    parser.add_argument('--depth', type=str, default='2',
+                        help='Residual blocks per stage: one value or four comma-separated values')
+    parser.add_argument('--attention', type=str, default='all',
+                        help=f"Attention placement: {'/'.join(ATTENTION_PLACEMENTS)} or per-block codes (cs/c/s/-)")
+    parser.add_argument('--reduction', type=int, default=16, help='ChannelAttention reduction ratio')
+    parser.add_argument('--spatial_kernel', type=int, default=7, help='SpatialAttention kernel size')
+    parser.add_argument('--val_subsample', type=float, default=0.0,
+                        help='Fraction of the validation set used for cheap checks between full validations (0 disables)')
     return parser.parse_args()
 
 
@@ -208,30 +578,90 @@ def parse_args():
 def main():
     args = parse_args()
 
+    # 数据并行：启动进程本身不训练，只负责拉起 scheduler 和 worker 并等待
+    if args.num_procs > 1 and 'MS_ROLE' not in os.environ:
+        sys.exit(launch_data_parallel(args.num_procs, args.save_dir, args.threads_per_proc))
+
     # 设置运行环境
     context.set_context(mode=context.GRAPH_MODE, device_target=args.device_target)
+    if args.seed is not None:
+        set_seed(args.seed)
+
+    rank, group_size = 0, 1
+    if 'MS_ROLE' in os.environ:
+        rank, group_size = init_data_parallel()
+    is_main = rank == 0
+    # 训练集分片参数：单进程时为空（不分片）；批大小是每个进程的批大小，学习率按全局批大小线性放大
+    shard = {'num_shards': group_size, 'shard_id': rank} if group_size > 1 else {}
+    lr = args.lr if group_size == 1 or args.no_lr_scaling else args.lr * group_size
 
     print("=" * 60)
     print("Training Configuration:")
     print(f"  Device: {args.device_target}")
     print(f"  Batch size: {args.batch_size}")
+    if group_size > 1:
+        print(f"  Data parallel: {group_size} processes, global batch size {args.batch_size * group_size}")
     print(f"  Epochs: {args.epochs}")
-    print(f"  Learning rate: {args.lr}")
+    print(f"  Learning rate: {lr}" + (f" ({args.lr} x {group_size} processes)" if lr != args.lr else ""))
     print(f"  Data augmentation: {args.augment}")
     print(f"  Early stopping patience: {args.patience}")
+    print(f"  Validation interval: {args.eval_interval}")
+    print(f"  Data workers: {args.num_workers}")
+    print(f"  Data format: {args.data_format}, sink mode: {args.dataset_sink_mode}")
+    if args.teacher_ckpt:
+        print(f"  Distillation: teacher={args.teacher_ckpt}, "
+              f"alpha={args.distill_alpha}, T={args.distill_temperature}")
     print("=" * 60)
 
     # 创建保存目录
     os.makedirs(args.save_dir, exist_ok=True)
 
     # 创建数据集
+    # 蒸馏：不做增强时教师 logits 一次性预先计算，否则每个增强批次在训练步内算一次
+    teacher = None
+    teacher_logits = None
+    if args.teacher_ckpt:
+        print("\nLoading teacher...")
+        teacher = load_teacher(args.teacher_ckpt)
+        # MindRecord 管道没有 teacher_logits 列，教师在训练步内计算
+        if not (args.augment or args.mixup) and args.data_format == 'generator':
+            # 数据并行时只由 rank 0 计算并写缓存，其他进程等待后直接读取
+            if is_main:
+                teacher_logits = precompute_teacher_logits(teacher, args.teacher_ckpt, args.data_csv,
+                                                           cache_dir=args.save_dir)
+            if group_size > 1:
+                sync_processes()
+            if not is_main:
+                teacher_logits = precompute_teacher_logits(teacher, args.teacher_ckpt, args.data_csv,
+                                                           cache_dir=args.save_dir)
+            teacher = None
+
     print("\nLoading datasets...")
-    train_ds = create_dataset(args.data_csv, usage='Training', batch_size=args.batch_size,
-                             shuffle=True, augment=args.augment,
-                             mixup=args.mixup, mixup_alpha=args.mixup_alpha)
-    # 如果训练使用Mixup（软标签），验证集也需要返回one-hot标签以兼容loss函数
-    val_ds = create_dataset(args.data_csv, usage='PublicTest', batch_size=args.batch_size,
-                           shuffle=False, augment=False, mixup=False, use_soft_labels=args.mixup)
+    configure_data_pipeline(prefetch_size=args.prefetch_size)
+    if args.data_format == 'mindrecord':
+        # 数据并行时由 rank 0 转换，其他进程等转换完成后直接读取
+        if is_main:
+            mindrecord_files = ensure_mindrecord(args.data_csv, args.mindrecord_dir)
+        if group_size > 1:
+            sync_processes()
+        if not is_main:
+            mindrecord_files = ensure_mindrecord(args.data_csv, args.mindrecord_dir)
+        train_ds = create_mindrecord_dataset(mindrecord_files['Training'], batch_size=args.batch_size,
+                                             shuffle=True, augment=args.augment, mixup=args.mixup,
+                                             mixup_alpha=args.mixup_alpha, seed=args.seed,
+                                             num_workers=args.num_workers, **shard)
+        val_ds = create_mindrecord_dataset(mindrecord_files['PublicTest'], batch_size=args.batch_size,
+                                           shuffle=False, use_soft_labels=args.mixup,
+                                           num_workers=args.num_workers)
+    else:
+        train_ds = create_dataset(args.data_csv, usage='Training', batch_size=args.batch_size,
+                                 shuffle=True, augment=args.augment,
+                                 mixup=args.mixup, mixup_alpha=args.mixup_alpha, seed=args.seed,
+                                 num_workers=args.num_workers, teacher_logits=teacher_logits, **shard)
+        # 如果训练使用Mixup（软标签），验证集也需要返回one-hot标签以兼容loss函数
+        val_ds = create_dataset(args.data_csv, usage='PublicTest', batch_size=args.batch_size,
+                               shuffle=False, augment=False, mixup=False, use_soft_labels=args.mixup,
+                               num_workers=args.num_workers)
 
     train_size = train_ds.get_dataset_size()
     val_size = val_ds.get_dataset_size()
@@ -240,7 +670,13 @@ def main():
 
     # 创建模型
     print("\nBuilding model...")
-    net = SimpleCNN(num_classes=7)
+    channels, arch_config = build_arch_config(args)
+    net = SimpleCNN(num_classes=7, channels=channels)
+    print(f"Architecture: {architecture_summary(channels)}")
+    if args.teacher_ckpt:
+        from prune import measure_latency, count_params
+        print(f"Student: {count_params(net):,} parameters, "
+              f"{measure_latency(channels, batch_size=4):.2f} ms per 4 faces (CPU, BatchNorm folded)")
 
     # 定义损失函数：Mixup模式使用软标签交叉熵
     if args.mixup:
@@ -258,11 +694,11 @@ def main():
     if args.epochs > warmup_epochs:
         warmup_steps = train_size * warmup_epochs
         # Warmup阶段：线性增加学习率
-        warmup_lr = [args.lr * (i + 1) / warmup_steps for i in range(warmup_steps)]
+        warmup_lr = [lr * (i + 1) / warmup_steps for i in range(warmup_steps)]
 
         # Cosine decay阶段
         decay_steps = total_steps - warmup_steps
-        cosine_lr = nn.cosine_decay_lr(min_lr=1e-6, max_lr=args.lr,
+        cosine_lr = nn.cosine_decay_lr(min_lr=1e-6, max_lr=lr,
                                        total_step=decay_steps,
                                        step_per_epoch=train_size,
                                        decay_epoch=args.epochs - warmup_epochs)
@@ -271,7 +707,7 @@ def main():
         lr_schedule = warmup_lr + cosine_lr
     else:
         # 训练轮数较少，直接使用cosine decay
-        lr_schedule = nn.cosine_decay_lr(min_lr=1e-6, max_lr=args.lr,
+        lr_schedule = nn.cosine_decay_lr(min_lr=1e-6, max_lr=lr,
                                          total_step=total_steps,
                                          step_per_epoch=train_size,
                                          decay_epoch=args.epochs)
@@ -282,7 +718,14 @@ def main():
                              weight_decay=args.weight_decay)
 
     # 创建模型
-    model = Model(net, loss_fn=loss, optimizer=opt, metrics={'accuracy'})
+    if args.teacher_ckpt:
+        distill_loss = DistillationLoss(loss, alpha=args.distill_alpha, temperature=args.distill_temperature)
+        model = Model(DistillWithLossCell(net, distill_loss, teacher), optimizer=opt)
+        # 验证只跑学生网络
+        eval_model = Model(net, loss_fn=loss, metrics={'accuracy'})
+    else:
+        model = Model(net, loss_fn=loss, optimizer=opt, metrics={'accuracy'})
+        eval_model = model
 
     # 配置回调函数
     callbacks = [
@@ -291,28 +734,58 @@ def main():
     ]
 
     # Checkpoint回调
-    config_ck = CheckpointConfig(save_checkpoint_steps=train_size, keep_checkpoint_max=5)
+    if arch_config is not None:
+        # 只保存学生网络（不含教师参数），并写入结构配置
+        config_ck = CheckpointConfig(save_checkpoint_steps=train_size, keep_checkpoint_max=5, saved_network=net,
+                                     append_info=[{ARCH_CONFIG_KEY: encode_arch_config(arch_config)}])
+    else:
+        config_ck = CheckpointConfig(save_checkpoint_steps=train_size, keep_checkpoint_max=5)
     ckpoint_cb = ModelCheckpoint(prefix='fer', directory=args.save_dir, config=config_ck)
-    callbacks.append(ckpoint_cb)
-
-    # 验证集评估回调（会自动保存最佳模型）
-    eval_cb = EvalCallback(model, val_ds, save_dir=args.save_dir, eval_per_epoch=1)
-    callbacks.append(eval_cb)
-
-    # 早停回调
-    early_stop_cb = EarlyStoppingCallback(model, val_ds, patience=args.patience)
-    callbacks.append(early_stop_cb)
+    # 数据并行时各进程参数相同，检查点和验证只在 rank 0 上运行
+    if is_main:
+        callbacks.append(ckpoint_cb)
+
+    # 验证集评估：每个评估周期只跑一次验证，结果共享给最佳模型保存、早停和日志
+    subsample_ds = None
+    if args.val_subsample > 0 and args.eval_interval > 1:
+        subsample_batches = max(1, int(val_size * args.val_subsample))
+        if args.data_format == 'mindrecord':
+            subsample_ds = create_mindrecord_dataset(mindrecord_files['PublicTest'], batch_size=args.batch_size,
+                                                     shuffle=False, use_soft_labels=args.mixup,
+                                                     num_workers=args.num_workers)
+        else:
+            subsample_ds = create_dataset(args.data_csv, usage='PublicTest', batch_size=args.batch_size,
+                                          shuffle=False, augment=False, mixup=False,
+                                          use_soft_labels=args.mixup)
+        subsample_ds = subsample_ds.take(subsample_batches)
+        print(f"Validation subset: {subsample_batches} batches between full validations")
+
+    eval_cb = EvalCallback(save_dir=args.save_dir, network=net if arch_config is not None else None,
+                           arch_config=arch_config)
+    early_stop_cb = EarlyStoppingCallback(patience=args.patience)
+    val_cb = ValidationCallback(eval_model, val_ds, eval_per_epoch=args.eval_interval,
+                                subsample_dataset=subsample_ds,
+                                subscribers=[ValidationLogger(), eval_cb, early_stop_cb],
+                                total_epochs=args.epochs)
+    if is_main:
+        callbacks.append(val_cb)
+    if group_size > 1:
+        callbacks.append(StopSyncCallback())
 
     # 开始训练
     print("\nStarting training...")
     print("=" * 60)
 
+    # 下沉模式下每个 epoch 整体下发，回调的 step_end 每个 epoch 触发一次
     model.train(epoch=args.epochs, train_dataset=train_ds, callbacks=callbacks,
-                dataset_sink_mode=False)
+                dataset_sink_mode=args.dataset_sink_mode)
+
+    if not is_main:
+        return
 
     # 保存最终模型
     final_path = os.path.join(args.save_dir, 'final_model.ckpt')
-    save_checkpoint(net, final_path)
+    save_configured_checkpoint(net, final_path, arch_config)
 
     print("\n" + "=" * 60)
     print("Training finished!")
@@ -7,18 +7,18 @@ FER2013 面部表情识别可视化工具
 import argparse
 import cv2
 import numpy as np
-import mindspore as ms
-from mindspore import context
-from mindspore.train.serialization import load_checkpoint, load_param_into_net
-from model import SimpleCNN
-try:
-    from model_legacy import SimpleCNN_Legacy
-except ImportError:
-    SimpleCNN_Legacy = None
+from backends import load_backend, BACKENDS
+from pipeline import WebcamPipeline, SyntheticFrameSource, bounded_map, interleave
+from tracking import FaceTracker, TemporalPredictionCache
+from detection import FaceDetector, DETECT_POLICIES, load_face_cascade
 import matplotlib
 matplotlib.use('Agg')  # 无GUI环境使用
 import matplotlib.pyplot as plt
 import os
+import json
+import multiprocessing
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import time
 
@@ -45,119 +45,114 @@ EMOTION_CN = {
     'neutral': '中性'
 }
 
+# 批量推理的固定批大小：补零到这些大小，避免图模式为每种人脸数重新编译
+BATCH_BUCKETS = (1, 4, 8, 16, 32)
+
 
 class FERVisualizer:
     """面部表情识别可视化器"""
 
-    def __init__(self, ckpt_path, device_target='CPU', output_dir='output'):
+    def __init__(self, ckpt_path, device_target='CPU', output_dir='output', detect_max_side=None,
+                 detect_policy='single', backend=None):
         """
         初始化可视化器
 
         Args:
-            ckpt_path: 模型检查点路径
+            ckpt_path: 模型检查点或导出的推理模型路径（.ckpt / .mindir / .onnx）
             device_target: 设备类型 ('CPU' 或 'GPU')
             output_dir: 输出目录
+            detect_max_side: 人脸检测时图像长边的最大像素数（None 表示原始分辨率）
+            detect_policy: 检测策略 ('single' 或 'pyramid'，见 detection.DETECT_POLICIES)
+            backend: 推理后端名称（None 表示按文件扩展名选择，见 backends.BACKENDS）
         """
-        # 设置设备
-        context.set_context(mode=context.GRAPH_MODE, device_target=device_target)
-
-        # 加载模型 - 自动检测模型版本
+        # 加载模型 - 检查点由模型注册表根据指纹自动识别版本（同一进程内复用），
+        # 导出的 MindIR / ONNX 由 MindSpore Lite / ONNX Runtime 运行，不加载训练框架
         print(f"[INFO] Loading model from {ckpt_path}")
-        self.net = self._load_model_with_auto_detection(ckpt_path)
-        self.net.set_train(False)
+        self.backend = load_backend(ckpt_path, backend=backend, device_target=device_target)
+        self.net = getattr(self.backend, 'net', None)
 
         # 创建输出目录
         self.output_dir = output_dir
         os.makedirs(output_dir, exist_ok=True)
 
-        # 人脸检测器
-        # 尝试多种方式加载 Haar Cascade 文件
-        cascade_path = None
-        try:
-            # 方法 1：使用 cv2.data（OpenCV 4.x）
-            cascade_path = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-        except AttributeError:
-            # 方法 2：使用 OpenCV 安装路径
-            cv2_base = os.path.dirname(cv2.__file__)
-            cascade_path = os.path.join(cv2_base, 'data', 'haarcascade_frontalface_default.xml')
-
-            # 方法 3：如果上面的路径不存在，尝试其他常见位置
-            if not os.path.exists(cascade_path):
-                # Windows conda 环境的常见路径
-                import sys
-                possible_paths = [
-                    os.path.join(sys.prefix, 'Library', 'etc', 'haarcascades', 'haarcascade_frontalface_default.xml'),
-                    os.path.join(sys.prefix, 'share', 'opencv4', 'haarcascades', 'haarcascade_frontalface_default.xml'),
-                    os.path.join(cv2_base, '..', 'data', 'haarcascade_frontalface_default.xml'),
-                ]
-                for path in possible_paths:
-                    if os.path.exists(path):
-                        cascade_path = path
-                        break
-
-        self.face_cascade = cv2.CascadeClassifier(cascade_path)
-
-        # 验证是否加载成功
-        if self.face_cascade.empty():
-            raise RuntimeError(f"Failed to load face cascade from {cascade_path}")
+        # 人脸检测器（检测分辨率可与输入分辨率解耦）
+        self.detector = FaceDetector(max_side=detect_max_side, policy=detect_policy)
+        self.face_cascade = self.detector.cascade
+        self._thread_local = threading.local()
+        if self.detector.max_side:
+            print(f"[INFO] Face detection at max side {self.detector.max_side}px ({detect_policy})")
 
         print(f"[INFO] Visualizer initialized. Output: {output_dir}")
 
-    def _load_model_with_auto_detection(self, ckpt_path):
+    def detect_faces(self, frame):
         """
-        自动检测并加载正确版本的模型
+        检测人脸 - 使用更宽松的参数以提高检测率
+
+        在缩小后的图像上检测（见 detect_max_side），人脸框已映射回原图坐标，
+        调用方直接从原始帧裁剪人脸
 
         Args:
-            ckpt_path: 检查点路径
+            frame: BGR 或灰度图像
 
         Returns:
-            加载好的模型
-        """
-        # 加载检查点
-        param_dict = load_checkpoint(ckpt_path)
-
-        # 检查分类器第一层的形状来判断模型版本
-        # 新版本: classifier.0.weight shape = (256, 512)
-        # 旧版本: classifier.0.weight shape = (128, 128)
-        classifier_key = 'classifier.0.weight'
-
-        if classifier_key in param_dict:
-            classifier_shape = param_dict[classifier_key].shape
-            print(f"[INFO] Detected classifier shape: {classifier_shape}")
-
-            # 判断是旧版本模型 (128, 128)
-            if classifier_shape == (128, 128):
-                if SimpleCNN_Legacy is None:
-                    print("[ERROR] Legacy model detected but model_legacy.py not found")
-                    raise ImportError("Please ensure model_legacy.py exists in src/")
-
-                print("[INFO] Loading legacy model (128 -> 128 -> 7)")
-                net = SimpleCNN_Legacy(7)
-                load_param_into_net(net, param_dict)
-                return net
-
-            # 新版本模型 (256, 512)
-            elif classifier_shape == (256, 512):
-                print("[INFO] Loading current model (512 -> 256 -> 128 -> 7)")
-                net = SimpleCNN(7)
-                load_param_into_net(net, param_dict)
-                return net
+            人脸框数组 [N, 4]，每行 (x, y, w, h)
+        """
+        return self.detector.detect(frame)
 
-            else:
-                print(f"[WARNING] Unknown classifier shape: {classifier_shape}")
-                print("[INFO] Attempting to load as current model...")
-                net = SimpleCNN(7)
-                try:
-                    load_param_into_net(net, param_dict)
-                    return net
-                except Exception as e:
-                    print(f"[ERROR] Failed to load: {e}")
-                    raise
-        else:
-            print("[WARNING] Cannot determine model version, using current model")
-            net = SimpleCNN(7)
-            load_param_into_net(net, param_dict)
-            return net
+    def make_tracker(self, detect_interval=5):
+        """
+        创建检测 + 跟踪器：每 detect_interval 帧做一次完整检测，其余帧模板匹配跟踪
+
+        Returns:
+            FaceTracker
+        """
+        return FaceTracker(self.detect_faces, detect_interval=detect_interval)
+
+    def make_prediction_cache(self, change_threshold=0.02, ema_alpha=0.5):
+        """
+        创建按轨迹的预测缓存：人脸变化很小时复用上次结果，并对概率做 EMA 平滑
+
+        Returns:
+            TemporalPredictionCache
+        """
+        return TemporalPredictionCache(self.preprocess_faces, self.predict_probs,
+                                       change_threshold=change_threshold, ema_alpha=ema_alpha)
+
+    def locate_faces(self, frame, tracker=None):
+        """
+        获取当前帧的人脸框及 ID
+
+        Args:
+            frame: 视频帧
+            tracker: FaceTracker（None 表示逐帧检测）
+
+        Returns:
+            (faces, face_ids, tracks)，逐帧检测时 face_ids 全为 None、tracks 为 None
+        """
+        if tracker is None:
+            faces = self.detect_faces(frame)
+            return list(faces), [None] * len(faces), None
+        tracks = tracker.update(frame)
+        return [t.box for t in tracks], [t.id for t in tracks], tracks
+
+    def predict_located(self, frame, faces, tracks=None, prediction_cache=None):
+        """
+        预测已定位人脸的表情
+
+        Args:
+            frame: 视频帧
+            faces: 人脸框列表
+            tracks: 对应的 FaceTrack 列表（跟踪模式）
+            prediction_cache: TemporalPredictionCache（需要 tracks）
+
+        Returns:
+            [(emotion, probability, all_probs), ...]
+        """
+        if prediction_cache is not None and tracks is not None:
+            return [self._to_prediction(p) for p in prediction_cache.predict(frame, tracks, faces)]
+
+        face_imgs = [frame[y:y+h, x:x+w] for (x, y, w, h) in faces]
+        return self.predict_emotions(face_imgs)
 
     def preprocess_face(self, face_img):
         """
@@ -169,48 +164,111 @@ class FERVisualizer:
         Returns:
             预处理后的张量
         """
-        # 转灰度
-        if len(face_img.shape) == 3:
-            gray = cv2.cvtColor(face_img, cv2.COLOR_BGR2GRAY)
-        else:
-            gray = face_img
+        return self.preprocess_faces([face_img])
 
-        # 调整大小
-        resized = cv2.resize(gray, (48, 48))
+    def preprocess_faces(self, face_imgs, out=None):
+        """
+        将多张人脸预处理到一个连续的 [N, 1, 48, 48] 缓冲区
 
-        # 归一化
-        normalized = resized.astype('float32') / 255.0
+        Args:
+            face_imgs: 人脸图像列表 (BGR 或灰度)
+            out: 可选的预分配缓冲区，至少 N 行
 
-        # 扩展维度 [1, 1, 48, 48]
-        tensor = np.expand_dims(normalized, (0, 1))
+        Returns:
+            float32 数组 [N, 1, 48, 48]
+        """
+        n = len(face_imgs)
+        if out is None:
+            out = np.empty((n, 1, 48, 48), dtype=np.float32)
+
+        for i, face_img in enumerate(face_imgs):
+            # 转灰度
+            if len(face_img.shape) == 3:
+                gray = cv2.cvtColor(face_img, cv2.COLOR_BGR2GRAY)
+            else:
+                gray = face_img
 
-        return tensor
+            # 调整大小并归一化
+            resized = cv2.resize(gray, (48, 48))
+            out[i, 0] = resized.astype('float32') / 255.0
 
-    def predict_emotion(self, face_img):
+        return out[:n]
+
+    def _bucket_size(self, n):
+        """返回不小于 n 的最小固定批大小，避免图模式因输入形状变化而重新编译"""
+        for size in BATCH_BUCKETS:
+            if n <= size:
+                return size
+        return BATCH_BUCKETS[-1]
+
+    def predict_probs(self, tensor):
         """
-        预测人脸表情
+        对已预处理的批量输入做前向推理
+
+        输入按 BATCH_BUCKETS 分块并补零到固定大小，整块只做一次前向计算。
+        导出模型的输入批大小固定时由后端自行分块补零。
 
         Args:
-            face_img: 人脸图像
+            tensor: float32 数组 [N, 1, 48, 48]
 
         Returns:
-            (emotion, probability, all_probs)
+            概率数组 [N, 7]
+        """
+        if self.backend.batch_size is not None:
+            return self.backend.predict(tensor)
+
+        n = len(tensor)
+        probs = np.empty((n, len(EMOTIONS)), dtype=np.float32)
+        max_bucket = BATCH_BUCKETS[-1]
+
+        for start in range(0, n, max_bucket):
+            chunk = tensor[start:start + max_bucket]
+            size = self._bucket_size(len(chunk))
+            if size != len(chunk):
+                padded = np.zeros((size, 1, 48, 48), dtype=np.float32)
+                padded[:len(chunk)] = chunk
+                chunk_input = padded
+            else:
+                chunk_input = np.ascontiguousarray(chunk)
+
+            probs[start:start + len(chunk)] = self.backend.predict(chunk_input)[:len(chunk)]
+
+        return probs
+
+    def predict_emotions(self, face_imgs):
+        """
+        批量预测多张人脸的表情（一次前向推理）
+
+        Args:
+            face_imgs: 人脸图像列表
+
+        Returns:
+            [(emotion, probability, all_probs), ...]，与输入顺序一致
         """
-        # 预处理
-        tensor = self.preprocess_face(face_img)
+        if len(face_imgs) == 0:
+            return []
 
-        # 推理
-        output = self.net(ms.Tensor(tensor))
-        probs = ms.ops.softmax(output)[0].asnumpy()
+        probs = self.predict_probs(self.preprocess_faces(face_imgs))
+        return [self._to_prediction(p) for p in probs]
 
-        # 获取最高概率的表情
+    def _to_prediction(self, probs):
+        """概率向量 -> (emotion, probability, all_probs)"""
         idx = int(np.argmax(probs))
-        emotion = EMOTIONS[idx]
-        probability = float(probs[idx])
+        return EMOTIONS[idx], float(probs[idx]), probs
 
-        return emotion, probability, probs
+    def predict_emotion(self, face_img):
+        """
+        预测人脸表情
 
-    def draw_prediction(self, frame, x, y, w, h, emotion, probability, probs):
+        Args:
+            face_img: 人脸图像
+
+        Returns:
+            (emotion, probability, all_probs)
+        """
+        return self.predict_emotions([face_img])[0]
+
+    def draw_prediction(self, frame, x, y, w, h, emotion, probability, probs, face_id=None):
         """
         在帧上绘制预测结果
 
@@ -220,6 +278,7 @@ class FERVisualizer:
             emotion: 预测的表情
             probability: 概率
             probs: 所有类别的概率
+            face_id: 跟踪模式下的人脸 ID（可选）
         """
         # 绘制人脸框
         color = EMOTION_COLORS.get(emotion, (255, 255, 255))
@@ -227,6 +286,8 @@ class FERVisualizer:
 
         # 绘制标签
         label = f"{emotion}: {probability:.2%}"
+        if face_id is not None:
+            label = f"#{face_id} {label}"
         label_size, _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
 
         # 绘制标签背景
@@ -323,47 +384,74 @@ class FERVisualizer:
 
         print(f"[SAVE] Result saved to {output_path}")
 
-    def process_webcam(self, camera_id=0, save_frames=False):
+    def save_frame(self, frame, prefix='frame'):
+        """保存当前帧到输出目录"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        frame_path = os.path.join(self.output_dir, f'{prefix}_{timestamp}.jpg')
+        cv2.imwrite(frame_path, frame)
+        print(f"[SAVE] Frame saved to {frame_path}")
+        return frame_path
+
+    def process_webcam(self, camera_id=0, save_frames=False, pipelined=False, source=None,
+                       headless=False, max_frames=None, detect_interval=1, smooth=False):
         """
         处理摄像头实时视频
 
         Args:
             camera_id: 摄像头ID
             save_frames: 是否保存帧
+            pipelined: 使用多线程流水线（采集/检测/推理/显示并行，丢弃过期帧）
+            source: 可选的帧源（例如 SyntheticFrameSource），代替真实摄像头
+            headless: 不显示窗口
+            max_frames: 最多处理的帧数（None 表示直到帧源结束或按 q）
+            detect_interval: 大于 1 时每隔该帧数做一次完整检测，其余帧跟踪人脸
+            smooth: 按人脸轨迹缓存预测（画面变化小则不重新推理）并对概率做 EMA 平滑
+
+        Returns:
+            流水线模式下返回统计信息字典
         """
         print(f"[INFO] Starting webcam {camera_id}. Press 'q' to quit, 's' to save frame")
 
-        cap = cv2.VideoCapture(camera_id)
+        cap = source if source is not None else cv2.VideoCapture(camera_id)
         if not cap.isOpened():
             print("[ERROR] Cannot open webcam")
             return
 
+        # 平滑模式需要稳定的人脸 ID，因此即使逐帧检测也使用跟踪器
+        tracker = self.make_tracker(detect_interval) if detect_interval > 1 or smooth else None
+        prediction_cache = self.make_prediction_cache() if smooth else None
+
+        if pipelined:
+            pipeline = WebcamPipeline(self, cap, headless=headless, max_frames=max_frames,
+                                      tracker=tracker, prediction_cache=prediction_cache)
+            try:
+                result = pipeline.run()
+            finally:
+                cap.release()
+            pipeline.report(result)
+            print("[INFO] Webcam closed")
+            return result
+
         frame_count = 0
         fps_time = time.time()
+        run_start = time.time()
 
-        while True:
+        while max_frames is None or frame_count < max_frames:
             ret, frame = cap.read()
             if not ret:
-                print("[ERROR] Cannot read frame")
+                if source is None:
+                    print("[ERROR] Cannot read frame")
                 break
 
-            # 检测人脸 - 使用更宽松的参数以提高检测率
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            faces = self.face_cascade.detectMultiScale(
-                gray, scaleFactor=1.05, minNeighbors=3, minSize=(20, 20),
-                flags=cv2.CASCADE_SCALE_IMAGE
-            )
-
-            # 处理每个人脸
-            for (x, y, w, h) in faces:
-                # 提取人脸
-                face_img = frame[y:y+h, x:x+w]
+            # 检测（或跟踪）人脸
+            faces, face_ids, tracks = self.locate_faces(frame, tracker)
 
-                # 预测表情
-                emotion, probability, probs = self.predict_emotion(face_img)
+            # 所有人脸一次批量推理（平滑模式下只推理变化明显的人脸）
+            predictions = self.predict_located(frame, faces, tracks, prediction_cache)
 
-                # 绘制结果
-                self.draw_prediction(frame, x, y, w, h, emotion, probability, probs)
+            # 绘制结果
+            for (x, y, w, h), face_id, (emotion, probability, probs) in zip(faces, face_ids, predictions):
+                self.draw_prediction(frame, x, y, w, h, emotion, probability, probs, face_id)
 
             # 计算FPS
             frame_count += 1
@@ -373,6 +461,9 @@ class FERVisualizer:
                 cv2.putText(frame, f"FPS: {fps:.1f}", (10, 30),
                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
 
+            if headless:
+                continue
+
             # 显示帧
             cv2.imshow('FER - Press q to quit, s to save', frame)
 
@@ -382,16 +473,17 @@ class FERVisualizer:
                 break
             elif key == ord('s') and len(faces) > 0:
                 # 保存当前帧
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                frame_path = os.path.join(self.output_dir, f'webcam_{timestamp}.jpg')
-                cv2.imwrite(frame_path, frame)
-                print(f"[SAVE] Frame saved to {frame_path}")
+                self.save_frame(frame, prefix='webcam')
 
         cap.release()
-        cv2.destroyAllWindows()
+        if not headless:
+            cv2.destroyAllWindows()
+        elapsed = time.time() - run_start
+        print(f"\n[INFO] Processed {frame_count} frames ({frame_count / elapsed if elapsed > 0 else 0.0:.1f} FPS)")
         print("[INFO] Webcam closed")
 
-    def process_video(self, video_path, save_video=True, save_frames=False):
+    def process_video(self, video_path, save_video=True, save_frames=False, detect_interval=1,
+                      smooth=False, output_path=None, show_progress=True):
         """
         处理视频文件
 
@@ -399,13 +491,20 @@ class FERVisualizer:
             video_path: 视频文件路径
             save_video: 是否保存处理后的视频
             save_frames: 是否保存关键帧
+            detect_interval: 大于 1 时每隔该帧数做一次完整检测，其余帧跟踪人脸
+            smooth: 按人脸轨迹缓存预测（画面变化小则不重新推理）并对概率做 EMA 平滑
+            output_path: 处理后视频的保存路径（默认按时间戳命名）
+            show_progress: 是否打印逐帧进度
+
+        Returns:
+            结果字典（帧数、人脸数、表情统计、耗时等）；无法打开视频时返回 None
         """
         print(f"[INFO] Processing video: {video_path}")
 
         cap = cv2.VideoCapture(video_path)
         if not cap.isOpened():
             print(f"[ERROR] Cannot open video: {video_path}")
-            return
+            return None
 
         # 获取视频信息
         fps = int(cap.get(cv2.CAP_PROP_FPS))
@@ -417,12 +516,19 @@ class FERVisualizer:
 
         # 创建视频写入器
         if save_video:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_path = os.path.join(self.output_dir, f'processed_{timestamp}.mp4')
+            if output_path is None:
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                output_path = os.path.join(self.output_dir, f'processed_{timestamp}.mp4')
             fourcc = cv2.VideoWriter_fourcc(*'mp4v')
             out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
 
+        # 平滑模式需要稳定的人脸 ID，因此即使逐帧检测也使用跟踪器
+        tracker = self.make_tracker(detect_interval) if detect_interval > 1 or smooth else None
+        prediction_cache = self.make_prediction_cache() if smooth else None
+
         frame_count = 0
+        face_count = 0
+        emotion_counts = {emotion: 0 for emotion in EMOTIONS}
         start_time = time.time()
 
         while True:
@@ -432,25 +538,22 @@ class FERVisualizer:
 
             frame_count += 1
 
-            # 检测人脸 - 使用更宽松的参数以提高检测率
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            faces = self.face_cascade.detectMultiScale(
-                gray, scaleFactor=1.05, minNeighbors=3, minSize=(20, 20),
-                flags=cv2.CASCADE_SCALE_IMAGE
-            )
+            # 检测（或跟踪）人脸
+            faces, face_ids, tracks = self.locate_faces(frame, tracker)
 
-            # 处理每个人脸
-            for (x, y, w, h) in faces:
-                face_img = frame[y:y+h, x:x+w]
-                emotion, probability, probs = self.predict_emotion(face_img)
-                self.draw_prediction(frame, x, y, w, h, emotion, probability, probs)
+            # 所有人脸一次批量推理（平滑模式下只推理变化明显的人脸）
+            predictions = self.predict_located(frame, faces, tracks, prediction_cache)
+            for (x, y, w, h), face_id, (emotion, probability, probs) in zip(faces, face_ids, predictions):
+                self.draw_prediction(frame, x, y, w, h, emotion, probability, probs, face_id)
+                emotion_counts[emotion] += 1
+            face_count += len(faces)
 
             # 写入视频
             if save_video:
                 out.write(frame)
 
             # 显示进度
-            if frame_count % 30 == 0:
+            if show_progress and frame_count % 30 == 0:
                 progress = frame_count / total_frames * 100
                 elapsed = time.time() - start_time
                 fps_avg = frame_count / elapsed
@@ -463,7 +566,25 @@ class FERVisualizer:
             out.release()
             print(f"[SAVE] Video saved to {output_path}")
 
-        print(f"[INFO] Video processing completed in {time.time() - start_time:.1f}s")
+        if tracker is not None:
+            print(f"[INFO] Full detection ran on {tracker.detection_ratio:.1%} of frames, "
+                  f"{tracker.next_id - 1} face track(s)")
+        if prediction_cache is not None:
+            print(f"[INFO] Prediction cache hit rate: {prediction_cache.hit_rate:.1%}")
+        elapsed = time.time() - start_time
+        print(f"[INFO] Video processing completed in {elapsed:.1f}s")
+
+        return {
+            'video': video_path,
+            'output': output_path if save_video else None,
+            'resolution': [width, height],
+            'fps': fps,
+            'frames': frame_count,
+            'faces': face_count,
+            'distribution': emotion_counts,
+            'elapsed': elapsed,
+            'processing_fps': frame_count / elapsed if elapsed > 0 else 0.0,
+        }
 
     def process_image(self, image_path, save_result=True):
         """
@@ -482,11 +603,7 @@ class FERVisualizer:
             return
 
         # 检测人脸 - 使用更宽松的参数以提高检测率
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        faces = self.face_cascade.detectMultiScale(
-            gray, scaleFactor=1.05, minNeighbors=3, minSize=(20, 20),
-            flags=cv2.CASCADE_SCALE_IMAGE
-        )
+        faces = self.detect_faces(img)
 
         if len(faces) == 0:
             print("[WARNING] No faces detected in image")
@@ -494,10 +611,12 @@ class FERVisualizer:
 
         print(f"[INFO] Detected {len(faces)} face(s)")
 
-        # 处理每个人脸
-        for i, (x, y, w, h) in enumerate(faces):
-            face_img = img[y:y+h, x:x+w]
-            emotion, probability, probs = self.predict_emotion(face_img)
+        # 所有人脸一次批量推理
+        face_imgs = [img[y:y+h, x:x+w] for (x, y, w, h) in faces]
+        predictions = self.predict_emotions(face_imgs)
+
+        for i, ((x, y, w, h), face_img, (emotion, probability, probs)) in enumerate(
+                zip(faces, face_imgs, predictions)):
 
             print(f"  Face {i+1}: {emotion} ({probability:.2%})")
 
@@ -517,103 +636,186 @@ class FERVisualizer:
 
         print(f"[INFO] Image processing completed")
 
-    def process_batch(self, image_dir, pattern='*.jpg', save_images=False):
+    def _thread_detector(self):
+        """当前线程专用的 FaceDetector（CascadeClassifier 不保证多线程共享安全）"""
+        detector = getattr(self._thread_local, 'detector', None)
+        if detector is None:
+            detector = FaceDetector(load_face_cascade(), max_side=self.detector.max_side,
+                                    policy=self.detector.policy)
+            self._thread_local.detector = detector
+        return detector
+
+    def _load_batch_face(self, image_path, keep_image=False):
         """
-        批量处理单个类别的图片
+        解码图片、检测并预处理第一个人脸（在线程池中运行，OpenCV 调用期间释放 GIL）
 
         Args:
-            image_dir: 图片目录（单个类别）
-            pattern: 文件匹配模式
-            save_images: 是否保存标注后的图片（默认False，只保存统计图）
+            image_path: 图片路径
+            keep_image: 是否保留彩色原图（保存标注图片时需要）；否则直接按灰度解码
 
         Returns:
-            包含统计信息的字典
+            (image_path, img, box, face_input)，face_input 为 48x48 float32；
+            无法读取或没有人脸时返回 None
         """
-        import glob
-
-        image_paths = glob.glob(os.path.join(image_dir, pattern))
-        print(f"[INFO] Found {len(image_paths)} images in {image_dir}")
-
-        if len(image_paths) == 0:
-            print("[WARNING] No images found")
+        img = cv2.imread(image_path, cv2.IMREAD_COLOR if keep_image else cv2.IMREAD_GRAYSCALE)
+        if img is None:
             return None
 
-        # 从输入目录名提取类别名称（如 sad, happy 等）
-        category_name = os.path.basename(os.path.normpath(image_dir))
-
-        # 统计结果
-        emotion_counts = {emotion: 0 for emotion in EMOTIONS}
-        total_images = 0
-        correct_predictions = 0
+        faces = self._thread_detector().detect(img)
+        if len(faces) == 0:
+            return None
 
-        for i, image_path in enumerate(image_paths, 1):
-            if i % 50 == 0 or i == 1:  # 减少打印频率
-                print(f"[{i}/{len(image_paths)}] Processing...")
+        # 处理第一个人脸
+        x, y, w, h = (int(v) for v in faces[0])
+        face_input = self.preprocess_faces([img[y:y+h, x:x+w]])[0, 0]
+        return image_path, img if keep_image else None, (x, y, w, h), face_input
 
-            # 读取图片
-            img = cv2.imread(image_path)
-            if img is None:
-                continue
-
-            # 检测人脸
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            faces = self.face_cascade.detectMultiScale(
-                gray, scaleFactor=1.05, minNeighbors=3, minSize=(20, 20),
-                flags=cv2.CASCADE_SCALE_IMAGE
-            )
+    def classify_image_folders(self, image_dirs, pattern='*.jpg', save_images=False, num_workers=None,
+                               max_pending=None):
+        """
+        并行处理多个类别目录的图片（真实标签是目录名）
 
-            if len(faces) == 0:
-                continue
+        各目录的文件轮流送入解码/检测线程池，结果在调用线程中攒成批次统一推理，
+        推理与后续图片的解码检测重叠进行。文件列表惰性读取，同时在途的图片不超过
+        max_pending 张，内存占用与目录大小无关。
 
-            # 处理第一个人脸
-            x, y, w, h = faces[0]
-            face_img = img[y:y+h, x:x+w]
-            emotion, probability, probs = self.predict_emotion(face_img)
+        Args:
+            image_dirs: 类别目录列表
+            pattern: 文件匹配模式
+            save_images: 是否保存标注后的图片
+            num_workers: 解码/检测线程数（默认 CPU 核数）
+            max_pending: 最多同时在途的图片数（默认 num_workers * 4 + 一个推理批次）
 
-            emotion_counts[emotion] += 1
-            total_images += 1
+        Returns:
+            与 image_dirs 一一对应的统计结果列表（没有找到图片的目录为 None）
+        """
+        import glob
 
-            # 计算准确率（真实标签是目录名）
-            if emotion == category_name:
-                correct_predictions += 1
+        num_workers = num_workers or os.cpu_count() or 1
+        max_pending = max_pending or num_workers * 4 + BATCH_BUCKETS[-1]
 
-            # 只在需要时保存图片
-            if save_images:
-                self.draw_prediction(img, x, y, w, h, emotion, probability, probs)
-                basename = os.path.splitext(os.path.basename(image_path))[0]
-                output_path = os.path.join(self.output_dir, f'{basename}_result.jpg')
-                cv2.imwrite(output_path, img)
+        # 从输入目录名提取类别名称（如 sad, happy 等）
+        categories = [os.path.basename(os.path.normpath(d)) for d in image_dirs]
+        stats = [{'found': 0, 'total': 0, 'correct': 0,
+                  'distribution': {emotion: 0 for emotion in EMOTIONS}} for _ in image_dirs]
+
+        def tasks():
+            sources = [glob.iglob(os.path.join(d, pattern)) for d in image_dirs]
+            for index, image_path in interleave(sources):
+                stats[index]['found'] += 1
+                yield index, image_path
+
+        def load(task):
+            index, image_path = task
+            return index, self._load_batch_face(image_path, keep_image=save_images)
+
+        # 待推理的人脸，攒满一个批次后统一推理
+        pending = []
+
+        def flush():
+            probs = self.predict_probs(np.stack([item[4] for item in pending])[:, None])
+            for (index, image_path, img, box, _), p in zip(pending, probs):
+                emotion, probability, p = self._to_prediction(p)
+                stat = stats[index]
+                stat['distribution'][emotion] += 1
+                stat['total'] += 1
+
+                # 计算准确率（真实标签是目录名）
+                if emotion == categories[index]:
+                    stat['correct'] += 1
+
+                # 只在需要时保存图片
+                if save_images:
+                    x, y, w, h = box
+                    self.draw_prediction(img, x, y, w, h, emotion, probability, p)
+                    basename = os.path.splitext(os.path.basename(image_path))[0]
+                    output_path = os.path.join(self.output_dir, f'{basename}_result.jpg')
+                    cv2.imwrite(output_path, img)
+            pending.clear()
+
+        print(f"[INFO] Decoding and detecting with {num_workers} threads")
+        processed = 0
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            for index, item in bounded_map(executor, load, tasks(), max_pending):
+                processed += 1
+                if processed % 500 == 0 or processed == 1:  # 减少打印频率
+                    elapsed = time.time() - start
+                    rate = processed / elapsed if elapsed > 0 else 0.0
+                    print(f"[{processed}] Processing... ({rate:.0f} images/s)")
+                if item is None:
+                    continue
+                pending.append((index,) + item)
+                if len(pending) >= BATCH_BUCKETS[-1]:
+                    flush()
+            if pending:
+                flush()
+
+        elapsed = time.time() - start
+        if processed > 0:
+            print(f"[INFO] Processed {processed} images in {elapsed:.1f}s "
+                  f"({processed / elapsed if elapsed > 0 else 0.0:.0f} images/s)")
+
+        results = []
+        for image_dir, category_name, stat in zip(image_dirs, categories, stats):
+            print(f"[INFO] Found {stat['found']} images in {image_dir}")
+            if stat['found'] == 0:
+                print("[WARNING] No images found")
+                results.append(None)
+                continue
 
-        # 计算准确率
-        accuracy = correct_predictions / total_images if total_images > 0 else 0
+            total_images = stat['total']
+            accuracy = stat['correct'] / total_images if total_images > 0 else 0
+            result = {
+                'category': category_name,
+                'total': total_images,
+                'correct': stat['correct'],
+                'accuracy': accuracy,
+                'distribution': stat['distribution']
+            }
+            self.print_category_result(result)
+            results.append(result)
+        return results
+
+    def print_category_result(self, result):
+        """打印单个类别的统计结果"""
+        category_name = result['category']
+        total_images = result['total']
 
         print(f"\n[INFO] Category: {category_name.upper()}")
         print(f"[INFO] Total images processed: {total_images}")
-        print(f"[INFO] Correct predictions: {correct_predictions}")
-        print(f"[INFO] Accuracy: {accuracy:.2%}")
+        print(f"[INFO] Correct predictions: {result['correct']}")
+        print(f"[INFO] Accuracy: {result['accuracy']:.2%}")
         print("\n[STATISTICS] Prediction distribution:")
-        for emotion, count in emotion_counts.items():
+        for emotion, count in result['distribution'].items():
             percentage = count / total_images * 100 if total_images > 0 else 0
             marker = " ← TRUE LABEL" if emotion == category_name else ""
             print(f"  {emotion}: {count} ({percentage:.1f}%){marker}")
 
-        # 返回统计结果
-        return {
-            'category': category_name,
-            'total': total_images,
-            'correct': correct_predictions,
-            'accuracy': accuracy,
-            'distribution': emotion_counts
-        }
+    def process_batch(self, image_dir, pattern='*.jpg', save_images=False, num_workers=None):
+        """
+        批量处理单个类别的图片
+
+        Args:
+            image_dir: 图片目录（单个类别）
+            pattern: 文件匹配模式
+            save_images: 是否保存标注后的图片（默认False，只保存统计图）
+            num_workers: 解码/检测线程数（默认 CPU 核数）
 
-    def process_batch_multi_category(self, parent_dir, pattern='*.jpg', save_images=False):
+        Returns:
+            包含统计信息的字典
+        """
+        return self.classify_image_folders([image_dir], pattern, save_images, num_workers)[0]
+
+    def process_batch_multi_category(self, parent_dir, pattern='*.jpg', save_images=False, num_workers=None):
         """
-        批量处理多个类别的图片
+        批量处理多个类别的图片（所有类别共享一个解码/检测线程池并行处理）
 
         Args:
             parent_dir: 父目录（包含多个类别子目录）
             pattern: 文件匹配模式
             save_images: 是否保存标注后的图片
+            num_workers: 解码/检测线程数（默认 CPU 核数）
         """
         print("\n" + "="*70)
         print("BATCH PROCESSING - MULTI-CATEGORY MODE")
@@ -635,16 +837,12 @@ class FERVisualizer:
         print(f"[INFO] Save images: {save_images}")
         print()
 
-        # 处理每个类别
-        all_results = []
-        for i, category in enumerate(categories, 1):
-            print(f"\n{'='*70}")
-            print(f"[{i}/{len(categories)}] Processing category: {category.upper()}")
-            print(f"{'='*70}")
-
-            category_path = os.path.join(parent_dir, category)
-            result = self.process_batch(category_path, pattern, save_images)
+        # 所有类别同时处理
+        category_paths = [os.path.join(parent_dir, category) for category in categories]
+        results = self.classify_image_folders(category_paths, pattern, save_images, num_workers)
 
+        all_results = []
+        for result in results:
             if result:
                 all_results.append(result)
                 # 生成该类别的统计图
@@ -850,12 +1048,201 @@ class FERVisualizer:
         print(f"[SAVE] Accuracy comparison saved to {output_path}")
 
 
+# ---------------------------------------------------------------------------
+# 视频目录并行处理：每个 worker 进程加载一次模型并处理多个视频
+# ---------------------------------------------------------------------------
+
+_worker_visualizer = None
+_worker_options = None
+
+
+def _init_video_worker(ckpt_path, device_target, output_dir, options):
+    """worker 进程初始化：限制单进程线程数，加载模型（之后所有任务复用）"""
+    global _worker_visualizer, _worker_options
+    cv2.setNumThreads(1)
+    _worker_visualizer = FERVisualizer(ckpt_path, device_target=device_target, output_dir=output_dir,
+                                       detect_max_side=options['detect_max_side'],
+                                       detect_policy=options['detect_policy'],
+                                       backend=options['backend'])
+    _worker_options = options
+
+
+def _video_task_name(video_path, input_dir):
+    """由相对路径生成唯一的文件名前缀（不同子目录下的同名文件不会冲突）"""
+    rel = os.path.relpath(video_path, input_dir)
+    return os.path.splitext(rel)[0].replace(os.sep, '__')
+
+
+def _read_manifest(path):
+    """读取结果清单，不存在或损坏时返回 None"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _process_video_task(video_path):
+    """处理单个视频并写出结果清单，返回结果字典（失败时带 error 字段）"""
+    options = _worker_options
+    name = _video_task_name(video_path, options['input_dir'])
+    manifest_path = os.path.join(options['manifest_dir'], f'{name}.json')
+    output_path = os.path.join(options['video_dir'], f'{name}_processed.mp4')
+
+    start = time.time()
+    try:
+        result = _worker_visualizer.process_video(
+            video_path, save_video=options['save_video'], save_frames=options['save_frames'],
+            detect_interval=options['detect_interval'], smooth=options['smooth'],
+            output_path=output_path, show_progress=False)
+        if result is None:
+            result = {'video': video_path, 'error': 'cannot open video'}
+    except Exception as e:  # 单个文件失败不影响整批任务
+        result = {'video': video_path, 'error': f'{type(e).__name__}: {e}'}
+    result['worker'] = os.getpid()
+    result['wall_time'] = time.time() - start
+
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2)
+    result['manifest'] = manifest_path
+    return result
+
+
+def process_video_directory(input_dir, ckpt_path, device_target='CPU', output_dir='output',
+                            pattern='*.mp4', workers=None, save_video=False, save_frames=False,
+                            detect_interval=1, smooth=False, skip_existing=False,
+                            detect_max_side=None, detect_policy='single', backend=None):
+    """
+    用进程池并行处理目录中的所有视频
+
+    每个 worker 进程只加载一次模型；每个视频写一份结果清单到 output_dir/manifests/，
+    全部完成后由 manifests/ 中的所有清单汇总写出 output_dir/video_summary.json（续跑时包含之前的结果）。
+
+    Args:
+        input_dir: 视频目录
+        ckpt_path: 模型检查点路径
+        device_target: 设备类型
+        output_dir: 输出目录
+        pattern: 文件匹配模式（支持 '**/*.mp4' 递归匹配）
+        workers: worker 进程数（默认 CPU 核数）
+        save_video: 是否保存处理后的视频（保存到 output_dir/videos/）
+        save_frames: 是否保存关键帧
+        detect_interval: 每隔 K 帧做一次完整人脸检测
+        smooth: 按人脸轨迹缓存并平滑预测
+        skip_existing: 跳过已成功处理的视频（用于中断后续跑；失败的视频会重试）
+        detect_max_side, detect_policy: 人脸检测分辨率与策略（见 FERVisualizer）
+        backend: 推理后端名称（见 FERVisualizer）
+
+    Returns:
+        汇总结果字典
+    """
+    import glob
+
+    video_paths = sorted(glob.glob(os.path.join(input_dir, pattern), recursive=True))
+    print(f"[INFO] Found {len(video_paths)} videos in {input_dir}")
+    if len(video_paths) == 0:
+        print("[WARNING] No videos found")
+        return None
+
+    manifest_dir = os.path.join(output_dir, 'manifests')
+    video_dir = os.path.join(output_dir, 'videos')
+    os.makedirs(manifest_dir, exist_ok=True)
+    if save_video:
+        os.makedirs(video_dir, exist_ok=True)
+
+    if skip_existing:
+        pending = []
+        for p in video_paths:
+            manifest = _read_manifest(os.path.join(manifest_dir, f'{_video_task_name(p, input_dir)}.json'))
+            if manifest is None or 'error' in manifest:
+                pending.append(p)
+        print(f"[INFO] Skipping {len(video_paths) - len(pending)} videos already processed")
+        video_paths = pending
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(video_paths) or 1))
+    options = {
+        'input_dir': input_dir,
+        'manifest_dir': manifest_dir,
+        'video_dir': video_dir,
+        'save_video': save_video,
+        'save_frames': save_frames,
+        'detect_interval': detect_interval,
+        'smooth': smooth,
+        'detect_max_side': detect_max_side,
+        'detect_policy': detect_policy,
+        'backend': backend,
+    }
+
+    # 每个进程一个计算线程，避免 32 个进程 x N 个线程互相争抢
+    os.environ.setdefault('OMP_NUM_THREADS', '1')
+
+    print(f"[INFO] Processing {len(video_paths)} videos with {workers} worker processes")
+    total = len(video_paths)
+    start = time.time()
+    frames = 0
+    # spawn：每个 worker 是干净的进程，不继承父进程中 MindSpore / OpenCV 的线程状态
+    ctx = multiprocessing.get_context('spawn')
+    if video_paths:
+        with ctx.Pool(workers, initializer=_init_video_worker,
+                      initargs=(ckpt_path, device_target, output_dir, options)) as pool:
+            for done, result in enumerate(pool.imap_unordered(_process_video_task, video_paths), 1):
+                frames += result.get('frames', 0)
+                elapsed = time.time() - start
+                eta = elapsed / done * (total - done)
+                status = 'FAILED: ' + result['error'] if 'error' in result else f"{result['frames']} frames"
+                print(f"[PROGRESS] {done}/{total} ({done / total * 100:.1f}%) "
+                      f"{frames / elapsed:.1f} frames/s, ETA {eta:.0f}s - "
+                      f"{os.path.basename(result['video'])}: {status}")
+
+    elapsed = time.time() - start
+
+    # 汇总所有清单（包括之前运行的结果），续跑不会覆盖掉已完成视频的统计
+    manifests = [m for m in (_read_manifest(path) for path in
+                             sorted(glob.glob(os.path.join(manifest_dir, '*.json')))) if m is not None]
+    failed = [m for m in manifests if 'error' in m]
+    succeeded = [m for m in manifests if 'error' not in m]
+    distribution = {emotion: 0 for emotion in EMOTIONS}
+    for m in succeeded:
+        for emotion, count in m.get('distribution', {}).items():
+            distribution[emotion] += count
+
+    summary = {
+        'input_dir': input_dir,
+        'videos': len(manifests),
+        'succeeded': len(succeeded),
+        'failed': [{'video': m['video'], 'error': m['error']} for m in failed],
+        'frames': sum(m.get('frames', 0) for m in succeeded),
+        'faces': sum(m.get('faces', 0) for m in succeeded),
+        'distribution': distribution,
+        'workers': workers,
+        # 本次运行的处理量与速度
+        'processed_this_run': total,
+        'frames_this_run': frames,
+        'elapsed': elapsed,
+        'frames_per_sec': frames / elapsed if elapsed > 0 else 0.0,
+        'manifest_dir': manifest_dir,
+    }
+    summary_path = os.path.join(output_dir, 'video_summary.json')
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"\n[INFO] Processed {total} videos, {frames} frames in {elapsed:.1f}s "
+          f"({summary['frames_per_sec']:.1f} frames/s); "
+          f"{summary['succeeded']}/{summary['videos']} videos done in total")
+    if failed:
+        print(f"[WARNING] {len(failed)} videos failed, see {summary_path}")
+    print(f"[SAVE] Summary saved to {summary_path}")
+    return summary
+
+
 def main():
     parser = argparse.ArgumentParser(description='FER2013 面部表情识别可视化工具')
 
     # 模型参数
     parser.add_argument('--ckpt_path', type=str, required=True,
-                       help='模型检查点路径')
+                       help='模型检查点或导出的推理模型路径 (.ckpt / .mindir / .onnx)')
+    parser.add_argument('--backend', type=str, default='auto', choices=['auto'] + list(BACKENDS),
+                       help='推理后端 (默认: auto，按文件扩展名选择)')
     parser.add_argument('--device_target', type=str, default='CPU',
                        choices=['CPU', 'GPU'], help='设备类型')
     parser.add_argument('--output_dir', type=str, default='output',
@@ -863,14 +1250,16 @@ def main():
 
     # 输入源
     parser.add_argument('--mode', type=str, required=True,
-                       choices=['webcam', 'video', 'image', 'batch'],
+                       choices=['webcam', 'video', 'video_dir', 'image', 'batch'],
                        help='处理模式')
     parser.add_argument('--input', type=str,
-                       help='输入文件/目录路径 (video/image/batch 模式需要)')
+                       help='输入文件/目录路径 (video/video_dir/image/batch 模式需要)')
     parser.add_argument('--camera_id', type=int, default=0,
                        help='摄像头ID (webcam 模式使用)')
     parser.add_argument('--pattern', type=str, default='*.jpg',
                        help='文件匹配模式 (batch 模式使用)')
+    parser.add_argument('--video_pattern', type=str, default='*.mp4',
+                       help='视频匹配模式 (video_dir 模式使用，支持 **/*.mp4 递归)')
 
     # 输出选项
     parser.add_argument('--save_video', action='store_true',
@@ -878,25 +1267,66 @@ def main():
     parser.add_argument('--save_frames', action='store_true',
                        help='保存关键帧')
 
+    # 性能选项
+    parser.add_argument('--pipeline', action='store_true',
+                       help='webcam 模式使用多线程流水线（采集/检测/推理/显示并行）')
+    parser.add_argument('--detect_interval', type=int, default=1,
+                       help='video/webcam 模式每隔 K 帧做一次完整人脸检测，其余帧跟踪 (默认: 1，逐帧检测)')
+    parser.add_argument('--smooth', action='store_true',
+                       help='video/webcam 模式按人脸轨迹缓存预测并做 EMA 平滑，减少重复推理和标签闪烁')
+    parser.add_argument('--detect_max_side', type=int, default=0,
+                       help='人脸检测时把图像长边缩小到该像素数，人脸框映射回原图 (默认: 0，原始分辨率)')
+    parser.add_argument('--detect_policy', type=str, default='single', choices=DETECT_POLICIES,
+                       help='检测策略: single 只在缩小分辨率上检测; pyramid 未找到人脸时逐级放大重试')
+    parser.add_argument('--synthetic', type=int, default=0, metavar='N',
+                       help='webcam 模式使用 N 帧合成画面（30 FPS，与摄像头同速）代替摄像头（无窗口，用于测试）')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='video_dir 模式的 worker 进程数 / batch 模式的解码检测线程数 (默认: CPU 核数)')
+    parser.add_argument('--skip_existing', action='store_true',
+                       help='video_dir 模式跳过已有结果清单的视频')
+
     args = parser.parse_args()
 
+    # 视频目录模式由 worker 进程各自加载模型，主进程不需要
+    if args.mode == 'video_dir':
+        if not args.input:
+            print("[ERROR] --input required for video_dir mode")
+            return
+        process_video_directory(args.input, args.ckpt_path, device_target=args.device_target,
+                                output_dir=args.output_dir, pattern=args.video_pattern,
+                                workers=args.workers, save_video=args.save_video,
+                                save_frames=args.save_frames, detect_interval=args.detect_interval,
+                                smooth=args.smooth, skip_existing=args.skip_existing,
+                                detect_max_side=args.detect_max_side, detect_policy=args.detect_policy,
+                                backend=args.backend)
+        return
+
     # 创建可视化器
     visualizer = FERVisualizer(
         ckpt_path=args.ckpt_path,
         device_target=args.device_target,
-        output_dir=args.output_dir
+        output_dir=args.output_dir,
+        detect_max_side=args.detect_max_side,
+        detect_policy=args.detect_policy,
+        backend=args.backend
     )
 
     # 根据模式处理
     if args.mode == 'webcam':
-        visualizer.process_webcam(camera_id=args.camera_id, save_frames=args.save_frames)
+        # 合成帧源按摄像头帧率输出，测得的是真实的实时吞吐量和丢帧情况
+        source = SyntheticFrameSource(num_frames=args.synthetic, fps=30) if args.synthetic > 0 else None
+        visualizer.process_webcam(camera_id=args.camera_id, save_frames=args.save_frames,
+                                  pipelined=args.pipeline, source=source,
+                                  headless=source is not None,
+                                  detect_interval=args.detect_interval, smooth=args.smooth)
 
     elif args.mode == 'video':
         if not args.input:
             print("[ERROR] --input required for video mode")
             return
         visualizer.process_video(args.input, save_video=args.save_video,
-                                save_frames=args.save_frames)
+                                save_frames=args.save_frames,
+                                detect_interval=args.detect_interval, smooth=args.smooth)
 
     elif args.mode == 'image':
         if not args.input:
@@ -908,7 +1338,7 @@ def main():
         if not args.input:
             print("[ERROR] --input required for batch mode")
             return
-        visualizer.process_batch(args.input, pattern=args.pattern)
+        visualizer.process_batch(args.input, pattern=args.pattern, num_workers=args.workers)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+推理后端基准测试
+比较训练检查点（MindSpore 训练框架）与导出模型（MindSpore Lite / ONNX Runtime）的
+启动时间、单张延迟和批量吞吐量。每个模型在独立的子进程中测量，启动时间包含框架导入。
+
+示例:
+    python src/export.py --ckpt_path best_model.ckpt --output_dir exported --batch_size 32
+    python tools/benchmark_backends.py --models best_model.ckpt exported/best_model.onnx exported/best_model.mindir
+"""
+
+import time
+_PROCESS_START = time.perf_counter()
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+# 添加 src 目录到路径
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+
+def measure(path, backend_name, num_threads, batch_size, iterations):
+    """在当前进程中测量一个模型（由子进程调用）"""
+    import numpy as np
+    from backends import load_backend
+
+    import_start = time.perf_counter()
+    backend = load_backend(path, backend=backend_name, num_threads=num_threads)
+    load_time = time.perf_counter() - import_start
+
+    rng = np.random.default_rng(0)
+    single = rng.random((1, 1, 48, 48), dtype=np.float32)
+    batch = rng.random((batch_size, 1, 48, 48), dtype=np.float32)
+
+    first_start = time.perf_counter()
+    backend.predict(single)
+    first_call = time.perf_counter() - first_start
+    startup = time.perf_counter() - _PROCESS_START
+
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        backend.predict(single)
+        latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies) * 1000
+
+    backend.predict(batch)  # 预热
+    start = time.perf_counter()
+    for _ in range(max(1, iterations // 10)):
+        backend.predict(batch)
+    batch_time = (time.perf_counter() - start) / max(1, iterations // 10)
+
+    return {
+        'model': path,
+        'backend': backend.name,
+        'startup_s': startup,
+        'load_s': load_time,
+        'first_call_ms': first_call * 1000,
+        'latency_p50_ms': float(np.percentile(latencies, 50)),
+        'latency_p95_ms': float(np.percentile(latencies, 95)),
+        'throughput': batch_size / batch_time,
+    }
+
+
+def run_isolated(path, args):
+    """在新进程中测量，避免框架导入与图编译缓存互相影响"""
+    cmd = [sys.executable, os.path.abspath(__file__), '--single', path,
+           '--backend', args.backend, '--batch_size', str(args.batch_size),
+           '--iterations', str(args.iterations)]
+    if args.num_threads:
+        cmd += ['--num_threads', str(args.num_threads)]
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith('{'):
+            return json.loads(line)
+    print(f"[ERROR] Benchmark failed for {path}:\n{proc.stderr.strip()[-2000:]}")
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='推理后端基准测试')
+    parser.add_argument('--models', type=str, nargs='+', help='检查点或导出的模型 (.ckpt / .mindir / .onnx)')
+    parser.add_argument('--backend', type=str, default='auto', help='推理后端 (默认按扩展名选择)')
+    parser.add_argument('--batch_size', type=int, default=64, help='吞吐量测试的批大小')
+    parser.add_argument('--iterations', type=int, default=200, help='单张延迟测试次数')
+    parser.add_argument('--num_threads', type=int, default=None, help='推理线程数')
+    parser.add_argument('--output', type=str, default=None, help='结果 JSON 保存路径')
+    parser.add_argument('--single', type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        result = measure(args.single, args.backend, args.num_threads, args.batch_size, args.iterations)
+        print(json.dumps(result))
+        return
+
+    if not args.models:
+        parser.error('--models is required')
+
+    results = [r for r in (run_isolated(path, args) for path in args.models) if r is not None]
+    if not results:
+        return
+
+    print(f"\n{'Model':<28} {'Backend':<12} {'Startup(s)':<11} {'First(ms)':<10} "
+          f"{'P50(ms)':<9} {'P95(ms)':<9} {'Samples/s':<10}")
+    print("-" * 92)
+    for r in results:
+        print(f"{os.path.basename(r['model']):<28} {r['backend']:<12} {r['startup_s']:<11.2f} "
+              f"{r['first_call_ms']:<10.1f} {r['latency_p50_ms']:<9.2f} {r['latency_p95_ms']:<9.2f} "
+              f"{r['throughput']:<10.0f}")
+
+    baseline = results[0]
+    if len(results) > 1:
+        print(f"\n[INFO] Relative to {os.path.basename(baseline['model'])} ({baseline['backend']}):")
+        for r in results[1:]:
+            print(f"  {os.path.basename(r['model'])}: startup {baseline['startup_s'] / r['startup_s']:.1f}x faster, "
+                  f"latency {baseline['latency_p50_ms'] / r['latency_p50_ms']:.1f}x, "
+                  f"throughput {r['throughput'] / baseline['throughput']:.1f}x")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"[SAVE] Results saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+数据加载吞吐量基准测试
+测量 create_dataset 在不同 worker 数下的 samples/sec，并与模型单步训练时间对比，
+判断数据管道是否跟得上训练
+
+--pipelines 同时比较 Python GeneratorDataset 与 MindRecord 原生管道；
+--train_batches 给出时再比较两种管道在非下沉/下沉模式下 model.train 的端到端吞吐量
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+# 添加 src 目录到路径
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from mindspore import nn, context, Tensor
+from mindspore.train import Model
+
+from model import SimpleCNN
+from train import create_dataset, configure_data_pipeline, LabelSmoothingCrossEntropy, SoftTargetCrossEntropy
+from mindrecord_dataset import ensure_mindrecord, create_mindrecord_dataset
+
+PIPELINES = ('generator', 'mindrecord')
+
+
+def build_dataset(pipeline, csv_path, batch_size, num_workers, augment, mixup, seed, mindrecord_dir=None):
+    """创建指定管道的训练集"""
+    if pipeline == 'mindrecord':
+        path = ensure_mindrecord(csv_path, mindrecord_dir)['Training']
+        return create_mindrecord_dataset(path, batch_size=batch_size, shuffle=True, augment=augment,
+                                         mixup=mixup, seed=seed, num_workers=num_workers)
+    return create_dataset(csv_path, usage='Training', batch_size=batch_size, shuffle=True,
+                          augment=augment, mixup=mixup, seed=seed, num_workers=num_workers)
+
+
+def measure_loader(csv_path, batch_size, num_workers, num_batches, augment, mixup, seed,
+                   pipeline='generator', mindrecord_dir=None):
+    """
+    测量数据管道吞吐量
+
+    Returns:
+        samples/sec（跳过第一个批次的启动开销）
+    """
+    ds = build_dataset(pipeline, csv_path, batch_size, num_workers, augment, mixup, seed, mindrecord_dir)
+    iterator = ds.create_tuple_iterator(num_epochs=1, output_numpy=True)
+
+    next(iterator)  # 预热：启动 worker、打开缓存
+    count = 0
+    start = time.perf_counter()
+    for _ in iterator:
+        count += 1
+        if count >= num_batches:
+            break
+    elapsed = time.perf_counter() - start
+    return count * batch_size / elapsed if elapsed > 0 else 0.0
+
+
+def measure_step_time(batch_size, mixup, num_steps=10):
+    """
+    测量模型单步训练时间（随机输入，不依赖数据管道）
+
+    Returns:
+        每步秒数
+    """
+    net = SimpleCNN(num_classes=7)
+    loss = SoftTargetCrossEntropy() if mixup else LabelSmoothingCrossEntropy(num_classes=7)
+    opt = nn.AdamWeightDecay(params=net.trainable_params(), learning_rate=1e-4)
+    train_step = nn.TrainOneStepCell(nn.WithLossCell(net, loss), opt)
+    train_step.set_train()
+
+    images = Tensor(np.random.rand(batch_size, 1, 48, 48).astype(np.float32))
+    if mixup:
+        labels = Tensor(np.eye(7, dtype=np.float32)[np.random.randint(0, 7, batch_size)])
+    else:
+        labels = Tensor(np.random.randint(0, 7, batch_size).astype(np.int32))
+
+    train_step(images, labels)  # 预热：图编译
+    start = time.perf_counter()
+    for _ in range(num_steps):
+        train_step(images, labels)
+    return (time.perf_counter() - start) / num_steps
+
+
+def measure_training(ds, batch_size, mixup, num_batches, sink):
+    """
+    测量 model.train 的端到端吞吐量（数据管道 + 训练步）
+
+    Returns:
+        samples/sec（第一个 epoch 用于图编译和启动管道，不计时）
+    """
+    ds = ds.take(num_batches)
+    net = SimpleCNN(num_classes=7)
+    loss = SoftTargetCrossEntropy() if mixup else LabelSmoothingCrossEntropy(num_classes=7)
+    opt = nn.AdamWeightDecay(params=net.trainable_params(), learning_rate=1e-4)
+    model = Model(net, loss_fn=loss, optimizer=opt)
+
+    model.train(1, ds, dataset_sink_mode=sink)  # 预热
+    start = time.perf_counter()
+    model.train(1, ds, dataset_sink_mode=sink)
+    return num_batches * batch_size / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数据加载吞吐量基准测试')
+    parser.add_argument('--data_csv', type=str, required=True, help='fer2013.csv 路径')
+    parser.add_argument('--batch_size', type=int, default=96)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8],
+                        help='要测试的 worker 数量')
+    parser.add_argument('--num_batches', type=int, default=50, help='每种配置测量的批次数')
+    parser.add_argument('--prefetch_size', type=int, default=None)
+    parser.add_argument('--augment', action='store_true')
+    parser.add_argument('--mixup', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--device_target', type=str, default='CPU', choices=['CPU', 'GPU', 'Ascend'])
+    parser.add_argument('--skip_model', action='store_true', help='不测量模型单步时间')
+    parser.add_argument('--pipelines', type=str, nargs='+', default=list(PIPELINES), choices=PIPELINES,
+                        help='要比较的数据管道')
+    parser.add_argument('--mindrecord_dir', type=str, default=None, help='MindRecord 目录（默认放在 CSV 旁边）')
+    parser.add_argument('--train_batches', type=int, default=0,
+                        help='大于 0 时用这么多批次比较非下沉/下沉模式的端到端训练吞吐量')
+    args = parser.parse_args()
+
+    context.set_context(mode=context.GRAPH_MODE, device_target=args.device_target)
+    configure_data_pipeline(prefetch_size=args.prefetch_size)
+
+    model_rate = None
+    if not args.skip_model:
+        step_time = measure_step_time(args.batch_size, args.mixup)
+        model_rate = args.batch_size / step_time
+        print(f"[INFO] Model step time: {step_time * 1000:.1f} ms "
+              f"({model_rate:.0f} samples/sec at batch size {args.batch_size})")
+
+    print(f"\n{'Pipeline':<12} {'Workers':<10} {'Samples/sec':<14} {'vs model':<10}")
+    print("-" * 52)
+    for pipeline in args.pipelines:
+        for num_workers in args.workers:
+            rate = measure_loader(args.data_csv, args.batch_size, num_workers, args.num_batches,
+                                  args.augment, args.mixup, args.seed, pipeline, args.mindrecord_dir)
+            ratio = f"{rate / model_rate:.2f}x" if model_rate else "-"
+            print(f"{pipeline:<12} {num_workers:<10} {rate:<14.0f} {ratio:<10}")
+
+    if model_rate:
+        print("\n[INFO] 比值 >= 1.0x 表示数据管道不会拖慢训练")
+
+    if args.train_batches > 0:
+        num_workers = max(args.workers)
+        print(f"\nEnd-to-end training ({args.train_batches} batches, {num_workers} workers)")
+        print(f"{'Pipeline':<12} {'Sink':<6} {'Samples/sec':<14}")
+        print("-" * 34)
+        for pipeline in args.pipelines:
+            for sink in (False, True):
+                ds = build_dataset(pipeline, args.data_csv, args.batch_size, num_workers, args.augment,
+                                   args.mixup, args.seed, args.mindrecord_dir)
+                rate = measure_training(ds, args.batch_size, args.mixup, args.train_batches, sink)
+                print(f"{pipeline:<12} {str(sink):<6} {rate:<14.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+人脸检测分辨率基准测试
+在录制的视频（或合成画面）上比较不同检测分辨率的检测耗时和召回率。
+参考框默认取原始分辨率下的检测结果；使用合成画面时取真实人脸位置。
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import cv2
+
+# 添加 src 目录到路径
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+from detection import FaceDetector, DETECT_POLICIES, load_face_cascade
+from pipeline import SyntheticFrameSource
+from tracking import box_iou
+
+
+def read_frames(args):
+    """读取测试帧及（合成画面时）真实人脸框"""
+    if args.video:
+        cap = cv2.VideoCapture(args.video)
+        if not cap.isOpened():
+            raise RuntimeError(f"Cannot open video: {args.video}")
+        source, truth = cap, None
+    else:
+        source = SyntheticFrameSource(width=args.width, height=args.height, num_frames=args.num_frames,
+                                      num_faces=args.num_faces, face_size=args.face_size, seed=args.seed)
+        truth = []
+
+    frames = []
+    while len(frames) < args.num_frames:
+        if truth is not None:
+            truth.append(source.face_boxes())
+        ret, frame = source.read()
+        if not ret:
+            break
+        frames.append(frame)
+    source.release()
+    if truth is not None:
+        truth = truth[:len(frames)]
+    return frames, truth
+
+
+def match_count(reference, boxes, iou_threshold):
+    """贪心匹配，返回命中的参考框数量"""
+    used = set()
+    hits = 0
+    for ref in reference:
+        best, best_iou = None, iou_threshold
+        for i, box in enumerate(boxes):
+            if i in used:
+                continue
+            iou = box_iou(tuple(ref), tuple(box))
+            if iou >= best_iou:
+                best, best_iou = i, iou
+        if best is not None:
+            used.add(best)
+            hits += 1
+    return hits
+
+
+def run_detector(detector, frames):
+    """逐帧检测，返回 (每帧耗时秒数, 每帧人脸框)"""
+    detector.detect(frames[0])  # 预热
+    times, results = [], []
+    for frame in frames:
+        start = time.perf_counter()
+        boxes = detector.detect(frame)
+        times.append(time.perf_counter() - start)
+        results.append(boxes)
+    return np.array(times), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='人脸检测分辨率基准测试')
+    parser.add_argument('--video', type=str, default=None, help='录制的视频文件（不指定时使用合成画面）')
+    parser.add_argument('--num_frames', type=int, default=200, help='测试帧数')
+    parser.add_argument('--max_sides', type=int, nargs='+', default=[0, 960, 640, 480, 320],
+                        help='要测试的检测长边像素数（0 表示原始分辨率）')
+    parser.add_argument('--policies', type=str, nargs='+', default=['single'], choices=DETECT_POLICIES)
+    parser.add_argument('--iou', type=float, default=0.5, help='判定命中的最小 IoU')
+    # 合成画面参数
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--num_faces', type=int, default=2)
+    parser.add_argument('--face_size', type=int, default=160)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    cv2.setNumThreads(1)
+    frames, truth = read_frames(args)
+    if not frames:
+        print("[ERROR] No frames read")
+        return
+    h, w = frames[0].shape[:2]
+    print(f"[INFO] {len(frames)} frames at {w}x{h} from {args.video or 'synthetic source'}")
+
+    cascade = load_face_cascade()
+    if truth is None:
+        # 录制的视频没有标注：以原始分辨率检测结果为参考
+        _, truth = run_detector(FaceDetector(cascade), frames)
+        print("[INFO] Reference: full-resolution detections")
+    else:
+        print("[INFO] Reference: synthetic ground-truth boxes")
+    num_truth = sum(len(t) for t in truth)
+
+    print(f"\n{'Max side':<10} {'Policy':<9} {'Mean(ms)':<10} {'P95(ms)':<10} {'Speedup':<9} "
+          f"{'Faces/frame':<12} {'Recall':<8}")
+    print("-" * 72)
+    baseline = None
+    for max_side in args.max_sides:
+        for policy in args.policies:
+            detector = FaceDetector(cascade, max_side=max_side, policy=policy)
+            times, results = run_detector(detector, frames)
+            mean_ms = times.mean() * 1000
+            if baseline is None:
+                baseline = mean_ms
+            hits = sum(match_count(t, r, args.iou) for t, r in zip(truth, results))
+            recall = hits / num_truth if num_truth > 0 else float('nan')
+            faces = sum(len(r) for r in results) / len(results)
+            label = str(max_side) if max_side else 'full'
+            print(f"{label:<10} {policy:<9} {mean_ms:<10.2f} {np.percentile(times, 95) * 1000:<10.2f} "
+                  f"{baseline / mean_ms:<9.2f} {faces:<12.2f} {recall:<8.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+性能基准测试套件（离线运行）
+覆盖 CSV 解码与 FER2013Dataset.__getitem__、数据增强、GeneratorDataset 与 MindRecord 原生数据管道、
+SimpleCNN 前向（批大小 1-256）、多种分辨率下的 Haar 人脸检测，以及合成视频上完整的 process_video。
+结果写入 JSON；compare 命令与保存的基线比较，超出阈值的退化会被标出（退出码 1）。
+
+没有指定数据或检查点时，在临时目录中生成合成 CSV（generate_synthetic_data.py）和随机初始化的检查点，
+因此不需要数据集、摄像头或网络。
+
+示例:
+    python tools/benchmark_suite.py run --output benchmarks/baseline.json
+    python tools/benchmark_suite.py run --output benchmarks/current.json --only forward detect
+    python tools/benchmark_suite.py compare benchmarks/baseline.json benchmarks/current.json --threshold 0.1
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# 添加 src 目录到路径
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+sys.path.insert(0, script_dir)
+
+from generate_synthetic_data import write_synthetic_csv, write_synthetic_video
+
+
+# 已注册的基准测试组：name -> function(ctx) -> [metric, ...]
+BENCHMARKS = OrderedDict()
+
+FORWARD_BATCH_SIZES = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+DETECT_RESOLUTIONS = ((320, 240), (640, 480), (1280, 720), (1920, 1080))
+
+
+def benchmark(name):
+    """注册基准测试组（装饰器）"""
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+def metric(name, value, unit, higher_is_better=True):
+    return {'name': name, 'value': float(value), 'unit': unit, 'higher_is_better': higher_is_better}
+
+
+def median_time(fn, repeats=5, number=1, warmup=1):
+    """fn 单次调用耗时的中位数（秒）"""
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number)
+    return float(np.median(times))
+
+
+class BenchmarkContext:
+    """基准测试共享的输入：CSV、检查点和工作目录（缺失时按需生成合成数据）"""
+
+    def __init__(self, args, workdir):
+        self.args = args
+        self.workdir = workdir
+        self._csv_path = args.data_csv
+        self._ckpt_path = args.ckpt_path
+
+    @property
+    def csv_path(self):
+        if self._csv_path is None:
+            self._csv_path = write_synthetic_csv(os.path.join(self.workdir, 'fer2013_synthetic.csv'),
+                                                 num_rows=self.args.csv_rows)
+        return self._csv_path
+
+    @property
+    def ckpt_path(self):
+        if self._ckpt_path is None:
+            from mindspore import save_checkpoint, set_seed
+            from model import SimpleCNN
+            set_seed(0)
+            self._ckpt_path = os.path.join(self.workdir, 'random_init.ckpt')
+            save_checkpoint(SimpleCNN(num_classes=7), self._ckpt_path)
+        return self._ckpt_path
+
+
+@benchmark('decode')
+def bench_decode(ctx):
+    from dataset import decode_fer2013_csv, FER2013Dataset
+
+    start = time.perf_counter()
+    _, labels, _ = decode_fer2013_csv(ctx.csv_path)
+    csv_rate = len(labels) / (time.perf_counter() - start)
+
+    ds = FER2013Dataset(ctx.csv_path, usage='Training')
+    count = min(len(ds), 2000)
+    indices = np.random.default_rng(0).permutation(len(ds))[:count]
+
+    def read_all():
+        for i in indices:
+            ds[i]
+
+    getitem_time = median_time(read_all, repeats=3)
+    return [
+        metric('decode.csv_parse', csv_rate, 'rows/s'),
+        metric('decode.getitem', count / getitem_time, 'samples/s'),
+    ]
+
+
+@benchmark('augment')
+def bench_augment(ctx):
+    from dataset import FER2013Dataset, FER2013BatchTransform
+
+    ds = FER2013Dataset(ctx.csv_path, usage='Training', augment=True)
+    images, labels = np.asarray(ds.images[:256]), np.asarray(ds.labels[:256])
+    np.random.seed(0)
+
+    def augment_samples():
+        for img in images:
+            ds._augment(img.astype(np.float32))
+
+    transform = FER2013BatchTransform(augment=True, seed=0)
+    sample_time = median_time(augment_samples, repeats=3)
+    batch_time = median_time(lambda: transform.transform(images, labels), repeats=5)
+    return [
+        metric('augment.sample', len(images) / sample_time, 'samples/s'),
+        metric('augment.batch', len(images) / batch_time, 'samples/s'),
+    ]
+
+
+@benchmark('pipeline')
+def bench_pipeline(ctx):
+    from train import create_dataset
+    from mindrecord_dataset import ensure_mindrecord, create_mindrecord_dataset
+
+    mindrecord = ensure_mindrecord(ctx.csv_path, os.path.join(ctx.workdir, 'mindrecord'))['Training']
+    results = []
+    for augment in (False, True):
+        suffix = '.augment' if augment else ''
+        for name, make in (
+                ('generator', lambda: create_dataset(ctx.csv_path, 'Training', 64, augment=augment, seed=0,
+                                                     num_workers=4)),
+                ('mindrecord', lambda: create_mindrecord_dataset(mindrecord, 64, augment=augment, seed=0,
+                                                                 num_workers=4))):
+            iterator = make().create_tuple_iterator(num_epochs=1, output_numpy=True)
+            next(iterator)  # 预热：启动管道
+            start = time.perf_counter()
+            count = sum(1 for _ in iterator)
+            results.append(metric(f'pipeline.{name}{suffix}', count * 64 / (time.perf_counter() - start),
+                                  'samples/s'))
+    return results
+
+
+@benchmark('forward')
+def bench_forward(ctx):
+    from mindspore import context, Tensor
+    from model_registry import load_network
+
+    context.set_context(mode=context.GRAPH_MODE, device_target='CPU')
+    results = []
+    for optimize in (False, True):
+        net = load_network(ctx.ckpt_path, cached=False, optimize=optimize)
+        suffix = '.folded' if optimize else ''
+        for batch_size in ctx.args.batch_sizes:
+            x = Tensor(np.random.rand(batch_size, 1, 48, 48).astype(np.float32))
+            seconds = median_time(lambda: net(x).asnumpy(), repeats=5, number=max(1, 64 // batch_size),
+                                  warmup=2)
+            results.append(metric(f'forward{suffix}.bs{batch_size}', batch_size / seconds, 'samples/s'))
+    return results
+
+
+@benchmark('detect')
+def bench_detect(ctx):
+    from detection import FaceDetector, load_face_cascade
+    from pipeline import SyntheticFrameSource
+
+    detector = FaceDetector(load_face_cascade())
+    results = []
+    for width, height in DETECT_RESOLUTIONS:
+        source = SyntheticFrameSource(width, height, num_frames=20, num_faces=2, face_size=height // 4)
+        frames = [source.read()[1] for _ in range(20)]
+
+        def detect_all():
+            for frame in frames:
+                detector.detect(frame)
+
+        seconds = median_time(detect_all, repeats=3) / len(frames)
+        results.append(metric(f'detect.{width}x{height}', seconds * 1000, 'ms/frame', higher_is_better=False))
+    return results
+
+
+@benchmark('video')
+def bench_video(ctx):
+    from visualize import FERVisualizer
+
+    video_path = write_synthetic_video(os.path.join(ctx.workdir, 'synthetic_clip'), ctx.args.video_frames)
+    visualizer = FERVisualizer(ctx.ckpt_path, output_dir=os.path.join(ctx.workdir, 'video_output'))
+    results = []
+    for label, options in (('video.full', {}), ('video.tracked', {'detect_interval': 5, 'smooth': True})):
+        visualizer.process_video(video_path, save_video=False, show_progress=False, **options)  # 预热
+        result = visualizer.process_video(video_path, save_video=False, show_progress=False, **options)
+        results.append(metric(label, result['processing_fps'], 'frames/s'))
+    return results
+
+
+def environment_info():
+    info = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+    }
+    for module in ('mindspore', 'cv2'):
+        try:
+            info[module] = __import__(module).__version__
+        except ImportError:
+            info[module] = None
+    try:
+        info['git_commit'] = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=project_root, capture_output=True,
+                                            text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        info['git_commit'] = None
+    return info
+
+
+def run(args):
+    groups = args.only or list(BENCHMARKS)
+    unknown = [g for g in groups if g not in BENCHMARKS]
+    if unknown:
+        raise ValueError(f"Unknown benchmark group(s): {', '.join(unknown)}. Available: {', '.join(BENCHMARKS)}")
+
+    report = {'environment': environment_info(), 'metrics': {}, 'errors': {}}
+    with tempfile.TemporaryDirectory(prefix='fer_bench_') as workdir:
+        ctx = BenchmarkContext(args, workdir)
+        for group in groups:
+            print(f"\n[INFO] Running benchmark group: {group}")
+            start = time.perf_counter()
+            try:
+                for m in BENCHMARKS[group](ctx):
+                    report['metrics'][m['name']] = m
+                    print(f"  {m['name']:<28} {m['value']:>12.2f} {m['unit']}")
+            except Exception as e:
+                report['errors'][group] = f"{type(e).__name__}: {e}"
+                print(f"[ERROR] Benchmark group {group} failed: {e}")
+            print(f"[INFO] {group} finished in {time.perf_counter() - start:.1f}s")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n[SAVE] Results saved to {args.output}")
+    return 1 if report['errors'] else 0
+
+
+def compare(args):
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(args.current, 'r', encoding='utf-8') as f:
+        current = json.load(f)
+
+    print(f"Baseline: {args.baseline} ({baseline['environment'].get('git_commit') or 'unknown commit'})")
+    print(f"Current:  {args.current} ({current['environment'].get('git_commit') or 'unknown commit'})")
+    print(f"\n{'Metric':<28} {'Baseline':>12} {'Current':>12} {'Change':>9}  {'Unit':<10} Status")
+    print("-" * 88)
+
+    regressions = []
+    for name, base in baseline['metrics'].items():
+        cur = current['metrics'].get(name)
+        if cur is None:
+            print(f"{name:<28} {base['value']:>12.2f} {'-':>12} {'':>9}  {base['unit']:<10} missing")
+            continue
+        change = (cur['value'] - base['value']) / base['value'] if base['value'] else 0.0
+        # 统一成“正数表示变好”
+        gain = change if base['higher_is_better'] else -change
+        if gain < -args.threshold:
+            status = 'REGRESSION'
+            regressions.append(name)
+        elif gain > args.threshold:
+            status = 'improved'
+        else:
+            status = 'ok'
+        print(f"{name:<28} {base['value']:>12.2f} {cur['value']:>12.2f} {change:>+9.1%}  {base['unit']:<10} {status}")
+
+    for name in current['metrics']:
+        if name not in baseline['metrics']:
+            cur = current['metrics'][name]
+            print(f"{name:<28} {'-':>12} {cur['value']:>12.2f} {'':>9}  {cur['unit']:<10} new")
+
+    if regressions:
+        print(f"\n[ERROR] {len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    print(f"\n[INFO] No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='性能基准测试套件')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='运行基准测试并保存 JSON')
+    run_parser.add_argument('--output', type=str, default='benchmarks/results.json', help='结果 JSON 保存路径')
+    run_parser.add_argument('--only', type=str, nargs='+', default=None,
+                            help=f"只运行指定的组: {' '.join(BENCHMARKS)}")
+    run_parser.add_argument('--data_csv', type=str, default=None, help='fer2013.csv 路径（默认生成合成 CSV）')
+    run_parser.add_argument('--csv_rows', type=int, default=5000, help='合成 CSV 的行数')
+    run_parser.add_argument('--ckpt_path', type=str, default=None, help='检查点路径（默认随机初始化的 SimpleCNN）')
+    run_parser.add_argument('--batch_sizes', type=int, nargs='+', default=list(FORWARD_BATCH_SIZES),
+                            help='前向测试的批大小')
+    run_parser.add_argument('--video_frames', type=int, default=90, help='合成视频的帧数')
+
+    compare_parser = subparsers.add_parser('compare', help='与基线比较并标出退化')
+    compare_parser.add_argument('baseline', type=str, help='基线结果 JSON')
+    compare_parser.add_argument('current', type=str, help='当前结果 JSON')
+    compare_parser.add_argument('--threshold', type=float, default=0.10, help='允许的相对退化（比例）')
+
+    args = parser.parse_args()
+    sys.exit(run(args) if args.command == 'run' else compare(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+合成测试数据生成器
+生成与 FER2013 格式相同的 CSV（emotion, pixels, Usage）、带类人脸图案的视频和按类别分目录的图片，
+用于在没有真实数据集和摄像头的环境中对训练、评估和可视化各模式做可复现的负载测试。
+
+    csv     任意规模的 FER2013 格式 CSV；类别分布和 Training/PublicTest/PrivateTest 比例与真实数据一致，
+            每张 48x48 图像是带表情特征（嘴型、眉毛、眼睛）的合成人脸
+    video   合成视频，人脸数量和大小可控，同时写出逐帧真实人脸框（JSON）
+    images  按表情分目录的图片（visualize.py --mode batch 的输入格式）
+    all     以上全部
+
+示例:
+    python tools/generate_synthetic_data.py csv --output data/fer2013_synthetic.csv --scale 10
+    python tools/generate_synthetic_data.py video --output_dir data/synthetic_videos --num_videos 4 --num_faces 3
+    python tools/generate_synthetic_data.py images --output_dir data/synthetic_images --per_class 200
+    python tools/generate_synthetic_data.py all --output_dir data/synthetic
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+# 添加 src 目录到路径
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+EMOTIONS = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
+
+# 真实 FER2013 的规模、类别分布与划分
+FER2013_ROWS = 35887
+EMOTION_COUNTS = [4953, 547, 5121, 8989, 6077, 4002, 6198]
+USAGE_COUNTS = [('Training', 28709), ('PublicTest', 3589), ('PrivateTest', 3589)]
+
+# 每种表情的面部特征：(嘴角弯曲, 嘴张开高度, 眉毛斜率, 眉毛抬高, 眼睛大小)
+# 图像 y 轴向下：弯曲为负时嘴角上扬（笑），为正时下垂
+EXPRESSION_FEATURES = {
+    'angry':    (0.02, 0.0, 0.45, -1.0, 1.0),
+    'disgust':  (0.05, 0.0, 0.25, -0.5, 0.8),
+    'fear':     (0.03, 2.0, -0.30, 2.0, 1.4),
+    'happy':    (-0.09, 1.0, 0.0, 0.5, 0.9),
+    'sad':      (0.07, 0.0, -0.40, 0.5, 0.9),
+    'surprise': (0.0, 4.0, 0.0, 3.0, 1.5),
+    'neutral':  (0.0, 0.0, 0.0, 0.0, 1.0),
+}
+
+_PIXEL_STRINGS = np.array([str(i) for i in range(256)], dtype=object)
+
+
+def render_faces(emotions, rng, size=48):
+    """
+    向量化绘制一批合成人脸
+
+    Args:
+        emotions: 表情编号数组 (N,)
+        rng: np.random.Generator
+
+    Returns:
+        uint8 (N, size, size)
+    """
+    n = len(emotions)
+    yy, xx = np.mgrid[0:size, 0:size].astype(np.float32)
+    yy, xx = yy[None] / size * 48, xx[None] / size * 48
+
+    def per_sample(low, high):
+        return rng.uniform(low, high, (n, 1, 1)).astype(np.float32)
+
+    features = np.array([EXPRESSION_FEATURES[EMOTIONS[e]] for e in emotions], dtype=np.float32)
+    curve, mouth_open, brow_slope, brow_raise, eye_size = (features[:, i, None, None] for i in range(5))
+
+    cx, cy = 24 + per_sample(-3, 3), 25 + per_sample(-3, 3)
+    ax, ay = per_sample(15, 19), per_sample(19, 23)
+    skin, background = per_sample(140, 210), per_sample(20, 110)
+
+    img = np.where(((xx - cx) / ax) ** 2 + ((yy - cy) / ay) ** 2 <= 1, skin, background)
+
+    # 眼睛和眉毛
+    dark = skin * per_sample(0.15, 0.35)
+    for side in (-1, 1):
+        ex, ey = cx + side * 7, cy - 5
+        eye = ((xx - ex) / (2.2 * eye_size)) ** 2 + ((yy - ey) / (1.3 * eye_size)) ** 2 <= 1
+        img = np.where(eye, dark, img)
+        brow_y = ey - 4 - brow_raise + side * brow_slope * (xx - ex)
+        brow = (np.abs(yy - brow_y) < 0.9) & (np.abs(xx - ex) < 4)
+        img = np.where(brow, dark, img)
+
+    # 嘴：抛物线，张嘴时为椭圆
+    my = cy + 10
+    mouth_line = (np.abs(yy - (my + curve * (xx - cx) ** 2)) < 1.0) & (np.abs(xx - cx) < 6)
+    open_mouth = (mouth_open > 0) & (((xx - cx) / 4) ** 2 + ((yy - my) / np.maximum(mouth_open, 0.1)) ** 2 <= 1)
+    img = np.where(mouth_line | open_mouth, dark, img)
+
+    img = img * per_sample(0.8, 1.2) + rng.normal(0, 8, img.shape)
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+
+def write_synthetic_csv(path, num_rows=None, scale=1.0, seed=0, chunk_size=2048):
+    """
+    写 FER2013 格式的 CSV
+
+    Args:
+        path: 输出路径
+        num_rows: 行数（None 表示 scale 倍的真实规模）
+        scale: 相对真实 FER2013（35887 行）的规模
+        seed: 随机种子（同样参数生成的文件完全相同）
+
+    Returns:
+        path
+    """
+    num_rows = int(num_rows if num_rows is not None else round(FER2013_ROWS * scale))
+    rng = np.random.default_rng(seed)
+
+    # 划分按真实比例依次排列（与原始 CSV 相同：Training 在前）
+    total = sum(count for _, count in USAGE_COUNTS)
+    bounds = np.cumsum([round(num_rows * count / total) for _, count in USAGE_COUNTS])
+    bounds[-1] = num_rows
+    usages = np.searchsorted(bounds, np.arange(num_rows), side='right')
+    probabilities = np.array(EMOTION_COUNTS, dtype=np.float64) / sum(EMOTION_COUNTS)
+    emotions = rng.choice(len(EMOTIONS), size=num_rows, p=probabilities)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    start = time.time()
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        f.write('emotion,pixels,Usage\n')
+        for begin in range(0, num_rows, chunk_size):
+            end = min(begin + chunk_size, num_rows)
+            faces = render_faces(emotions[begin:end], rng).reshape(end - begin, -1)
+            f.writelines(f"{emotion},{' '.join(_PIXEL_STRINGS[face])},{USAGE_COUNTS[usage][0]}\n"
+                         for emotion, face, usage in zip(emotions[begin:end], faces, usages[begin:end]))
+    print(f"[SAVE] {num_rows} rows written to {path} ({time.time() - start:.1f}s)")
+    return path
+
+
+def write_synthetic_video(path, num_frames=300, width=640, height=480, fps=30, num_faces=2, face_size=None,
+                          seed=0):
+    """
+    把合成帧源写成视频文件，并在同名 .json 中写出逐帧真实人脸框
+
+    Returns:
+        实际写入的视频路径（mp4 编码器不可用时改用 avi）
+    """
+    import cv2
+    from pipeline import SyntheticFrameSource
+
+    face_size = face_size or height // 4
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    for ext, fourcc in (('.mp4', 'mp4v'), ('.avi', 'MJPG')):
+        video_path = os.path.splitext(path)[0] + ext
+        writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*fourcc), fps, (width, height))
+        if not writer.isOpened():
+            continue
+        source = SyntheticFrameSource(width, height, num_frames=num_frames, num_faces=num_faces,
+                                      face_size=face_size, seed=seed)
+        boxes = []
+        while True:
+            frame_boxes = source.face_boxes()
+            ok, frame = source.read()
+            if not ok:
+                break
+            writer.write(frame)
+            boxes.append(frame_boxes)
+        writer.release()
+
+        with open(os.path.splitext(video_path)[0] + '.json', 'w', encoding='utf-8') as f:
+            json.dump({'width': width, 'height': height, 'fps': fps, 'frames': len(boxes),
+                       'num_faces': num_faces, 'face_size': face_size, 'boxes': boxes}, f)
+        return video_path
+    raise RuntimeError("No usable video encoder (tried mp4v and MJPG)")
+
+
+def write_synthetic_images(output_dir, per_class=100, image_size=320, faces_per_image=1, face_size=None,
+                           seed=0):
+    """
+    按表情分目录写图片（目录名即真实标签），每张图片上画 faces_per_image 个不重叠的人脸，
+    人脸由 render_faces 按该表情的 EXPRESSION_FEATURES 直接在 face_size 分辨率下绘制，内容与标签一致
+
+    Returns:
+        写入的图片总数
+    """
+    import cv2
+
+    rng = np.random.default_rng(seed)
+    grid = int(np.ceil(np.sqrt(faces_per_image)))
+    cell = image_size // grid
+    face_size = min(face_size or int(cell * 0.6), cell)
+
+    count = 0
+    for emotion in EMOTIONS:
+        emotion_dir = os.path.join(output_dir, emotion)
+        os.makedirs(emotion_dir, exist_ok=True)
+        for i in range(per_class):
+            img = rng.integers(60, 120, (image_size, image_size, 3), dtype=np.uint8)
+            slots = rng.permutation(grid * grid)[:faces_per_image]
+            faces = render_faces(np.full(len(slots), EMOTIONS.index(emotion)), rng, size=face_size)
+            for slot, face in zip(slots, faces):
+                gx, gy = slot % grid * cell, slot // grid * cell
+                x = gx + int(rng.integers(0, cell - face_size + 1))
+                y = gy + int(rng.integers(0, cell - face_size + 1))
+                img[y:y + face_size, x:x + face_size] = face[:, :, None]
+            cv2.imwrite(os.path.join(emotion_dir, f'{emotion}_{i:05d}.jpg'), img)
+            count += 1
+    print(f"[SAVE] {count} images written to {output_dir}")
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='合成 FER2013 数据、视频和图片生成器')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_csv_args(p):
+        p.add_argument('--rows', type=int, default=None, help='行数（默认按 --scale 计算）')
+        p.add_argument('--scale', type=float, default=1.0, help='相对真实 FER2013（35887 行）的规模')
+
+    def add_video_args(p):
+        p.add_argument('--num_videos', type=int, default=1)
+        p.add_argument('--num_frames', type=int, default=300)
+        p.add_argument('--width', type=int, default=640)
+        p.add_argument('--height', type=int, default=480)
+        p.add_argument('--fps', type=int, default=30)
+        p.add_argument('--num_faces', type=int, default=2, help='每帧人脸数')
+        p.add_argument('--face_size', type=int, default=None, help='人脸边长（像素，默认高度的 1/4）')
+
+    def add_image_args(p):
+        p.add_argument('--per_class', type=int, default=100, help='每个表情目录的图片数')
+        p.add_argument('--image_size', type=int, default=320)
+        p.add_argument('--faces_per_image', type=int, default=1)
+        p.add_argument('--image_face_size', type=int, default=None, help='图片中人脸边长（像素）')
+
+    csv_parser = subparsers.add_parser('csv', help='FER2013 格式 CSV')
+    csv_parser.add_argument('--output', type=str, default='data/fer2013_synthetic.csv')
+    add_csv_args(csv_parser)
+
+    video_parser = subparsers.add_parser('video', help='合成视频')
+    video_parser.add_argument('--output_dir', type=str, default='data/synthetic_videos')
+    add_video_args(video_parser)
+
+    image_parser = subparsers.add_parser('images', help='按表情分目录的图片')
+    image_parser.add_argument('--output_dir', type=str, default='data/synthetic_images')
+    add_image_args(image_parser)
+
+    all_parser = subparsers.add_parser('all', help='CSV、视频和图片')
+    all_parser.add_argument('--output_dir', type=str, default='data/synthetic')
+    add_csv_args(all_parser)
+    add_video_args(all_parser)
+    add_image_args(all_parser)
+
+    for p in (csv_parser, video_parser, image_parser, all_parser):
+        p.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == 'csv':
+        write_synthetic_csv(args.output, args.rows, args.scale, args.seed)
+        return
+
+    video_dir = args.output_dir if args.command == 'video' else os.path.join(args.output_dir, 'videos')
+    image_dir = args.output_dir if args.command == 'images' else os.path.join(args.output_dir, 'images')
+
+    if args.command == 'all':
+        write_synthetic_csv(os.path.join(args.output_dir, 'fer2013.csv'), args.rows, args.scale, args.seed)
+
+    if args.command in ('video', 'all'):
+        for i in range(args.num_videos):
+            path = write_synthetic_video(os.path.join(video_dir, f'synthetic_{i:03d}.mp4'), args.num_frames,
+                                         args.width, args.height, args.fps, args.num_faces, args.face_size,
+                                         seed=args.seed + i)
+            print(f"[SAVE] Video written to {path}")
+
+    if args.command in ('images', 'all'):
+        write_synthetic_images(image_dir, args.per_class, args.image_size, args.faces_per_image,
+                               args.image_face_size, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+本地推理服务（src/server.py）压测工具
+多个线程各保持一个 keep-alive 连接持续发请求，统计吞吐量和客户端延迟分位数，
+结束后读取服务端 /stats（排队/推理延迟和批大小分布）。
+
+请求内容默认用合成人脸（generate_synthetic_data.render_faces）或合成整帧，不需要数据集。
+
+示例:
+    python src/server.py --ckpt_path checkpoints/best_model.ckpt --port 8000
+    python tools/load_test_server.py --url http://127.0.0.1:8000 --mode image --concurrency 32 --duration 20
+    python tools/load_test_server.py --mode frame --images path/to/photos/*.jpg
+"""
+
+import argparse
+import base64
+import glob
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+sys.path.insert(0, script_dir)
+
+
+def build_payloads(mode, images=None, count=32, seed=0):
+    """
+    Returns:
+        [(path, body, content_type)]
+    """
+    import cv2
+
+    if images:
+        encoded = []
+        for path in images:
+            with open(path, 'rb') as f:
+                encoded.append(f.read())
+    elif mode == 'frame':
+        from pipeline import SyntheticFrameSource
+        source = SyntheticFrameSource(640, 480, num_frames=count, num_faces=2, face_size=120, seed=seed)
+        encoded = [cv2.imencode('.jpg', source.read()[1])[1].tobytes() for _ in range(count)]
+    else:
+        from generate_synthetic_data import render_faces
+        rng = np.random.default_rng(seed)
+        faces = render_faces(rng.integers(0, 7, count), rng)
+        if mode == 'pixels':
+            return [('/predict', json.dumps({'pixels': face.tolist()}).encode('utf-8'), 'application/json')
+                    for face in faces]
+        encoded = [cv2.imencode('.png', face)[1].tobytes() for face in faces]
+
+    if mode == 'json':
+        return [('/predict', json.dumps({'image': base64.b64encode(data).decode('ascii')}).encode('utf-8'),
+                 'application/json') for data in encoded]
+    path = '/predict/frame' if mode == 'frame' else '/predict/image'
+    return [(path, data, 'application/octet-stream') for data in encoded]
+
+
+def get_json(host, port, path):
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    try:
+        conn.request('GET', path)
+        return json.loads(conn.getresponse().read())
+    finally:
+        conn.close()
+
+
+def worker(host, port, payloads, deadline, offset, latencies, errors, lock):
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    local_latencies, local_errors = [], 0
+    i = offset
+    while time.perf_counter() < deadline:
+        path, body, content_type = payloads[i % len(payloads)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            conn.request('POST', path, body=body, headers={'Content-Type': content_type})
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                local_errors += 1
+                continue
+        except (OSError, http.client.HTTPException):
+            local_errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=30)
+            continue
+        local_latencies.append((time.perf_counter() - start) * 1000)
+    conn.close()
+    with lock:
+        latencies.extend(local_latencies)
+        errors.append(local_errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地推理服务压测')
+    parser.add_argument('--url', type=str, default='http://127.0.0.1:8000', help='服务地址')
+    parser.add_argument('--mode', type=str, default='image', choices=['image', 'json', 'pixels', 'frame'],
+                        help='image: 原始人脸图片; json: base64 人脸; pixels: 48x48 数组; frame: 整帧检测')
+    parser.add_argument('--images', type=str, nargs='+', default=None, help='使用这些图片作为请求（支持通配符）')
+    parser.add_argument('--concurrency', type=int, default=16, help='并发连接数')
+    parser.add_argument('--duration', type=float, default=10.0, help='压测时长（秒）')
+    parser.add_argument('--output', type=str, default=None, help='结果 JSON 保存路径')
+    args = parser.parse_args()
+
+    url = urlsplit(args.url)
+    host, port = url.hostname, url.port or 80
+    images = [p for pattern in args.images for p in sorted(glob.glob(pattern))] if args.images else None
+    payloads = build_payloads(args.mode, images)
+    print(f"[INFO] Server: {get_json(host, port, '/health')}")
+    print(f"[INFO] {args.concurrency} connections, {args.duration:.0f}s, mode={args.mode}, "
+          f"{len(payloads)} distinct payloads")
+
+    latencies, errors, lock = [], [], threading.Lock()
+    deadline = time.perf_counter() + args.duration
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(host, port, payloads, deadline, i, latencies, errors, lock))
+               for i in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    result = {'mode': args.mode, 'concurrency': args.concurrency, 'duration_s': elapsed,
+              'requests': len(latencies), 'errors': sum(errors),
+              'requests_per_s': len(latencies) / elapsed}
+    if latencies:
+        array = np.asarray(latencies)
+        result['latency_ms'] = {'p50': float(np.percentile(array, 50)), 'p95': float(np.percentile(array, 95)),
+                                'p99': float(np.percentile(array, 99)), 'mean': float(array.mean())}
+    result['server_stats'] = get_json(host, port, '/stats')
+
+    print(f"\nRequests:   {result['requests']} ({result['errors']} errors)")
+    print(f"Throughput: {result['requests_per_s']:.1f} req/s")
+    if latencies:
+        lat = result['latency_ms']
+        print(f"Latency:    p50 {lat['p50']:.2f} ms, p95 {lat['p95']:.2f} ms, p99 {lat['p99']:.2f} ms")
+    server = result['server_stats']
+    print(f"Server:     mean batch size {server['mean_batch_size']:.2f}, "
+          f"batch histogram {server['batch_size_histogram']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        print(f"\n[SAVE] Results saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
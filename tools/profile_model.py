@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+SimpleCNN 逐层剖析
+按 stem、每个 ResidualBlock、每个注意力模块、分类器统计参数量、FLOPs 和 CPU 实测延迟；
+给出 --data_csv 时逐个去掉注意力模块（替换为 Identity）评估准确率变化，
+用来判断哪些注意力模块值得它们在推理时的开销，并给出对应的 --attention 放置代码。
+
+FLOPs 按乘加各算一次统计卷积和全连接，注意力模块另计池化和逐元素乘法；BatchNorm、ReLU 忽略。
+
+延迟列是图模式下每个单元单独编译后的延迟中位数，接近部署时（图模式/导出模型）的开销，
+各单元之和与端到端延迟不一定相等。src/cell_timing.py 的 CellTimer 则是 PyNative 模式下
+整网前向中各 Cell 的实际耗时（含算子下发开销），用于定位 PyNative 下的热点，两者数值不可直接比较。
+
+示例:
+    python tools/profile_model.py --ckpt_path checkpoints/best_model.ckpt --data_csv data/fer2013.csv
+    python tools/profile_model.py --width 0.5 --depth 2 --attention last --batch_size 4
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+# 添加 src 目录到路径
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+sys.path.insert(0, os.path.join(project_root, 'src'))
+
+import mindspore.nn as nn
+from mindspore import context, Tensor
+
+from model import SimpleCNN, ChannelAttention, SpatialAttention, architecture_channels, architecture_summary, \
+    ATTENTION_PLACEMENTS
+from model_registry import load_param_dict, build_network, decode_arch_config
+from optimize import optimize_for_inference, forward_logits
+
+
+class _Stem(nn.Cell):
+    """SimpleCNN 的初始卷积（不重新挂载子 Cell，参数名保持不变）"""
+    def __init__(self, net):
+        super(_Stem, self).__init__(auto_prefix=False)
+        self.net = net
+
+    def construct(self, x):
+        return self.net.relu(self.net.bn1(self.net.conv1(x)))
+
+
+class _BlockBody(nn.Cell):
+    """残差块中注意力之前的部分，用于得到注意力模块的输入"""
+    def __init__(self, block):
+        super(_BlockBody, self).__init__(auto_prefix=False)
+        self.block = block
+
+    def construct(self, x):
+        out = self.block.relu(self.block.bn1(self.block.conv1(x)))
+        return self.block.bn2(self.block.conv2(out))
+
+
+class _Head(nn.Cell):
+    """全局池化 + 分类器"""
+    def __init__(self, net):
+        super(_Head, self).__init__(auto_prefix=False)
+        self.net = net
+
+    def construct(self, x):
+        return self.net.classifier(self.net.flatten(self.net.global_pool(x)))
+
+
+def cell_params(cell):
+    return int(sum(np.prod(p.shape) for p in cell.trainable_params()))
+
+
+def cell_flops(cell, output_shape):
+    """
+    卷积和全连接的 FLOPs（卷积的输出空间尺寸取 output_shape，SimpleCNN 的每个剖析单元内卷积输出尺寸相同）
+    注意力模块额外计入池化和逐元素乘法
+    """
+    _, _, h, w = output_shape if len(output_shape) == 4 else (0, 0, 1, 1)
+    flops = 0
+    for _, sub in cell.cells_and_names():
+        if isinstance(sub, nn.Conv2d):
+            kh, kw = sub.kernel_size
+            flops += 2 * sub.out_channels * (sub.in_channels // sub.group) * kh * kw * h * w
+        elif isinstance(sub, nn.Dense):
+            flops += 2 * sub.in_channels * sub.out_channels
+        elif isinstance(sub, ChannelAttention) and len(output_shape) == 4:
+            flops += 2 * output_shape[1] * h * w               # 全局平均池化 + 加权
+        elif isinstance(sub, SpatialAttention) and len(output_shape) == 4:
+            flops += 3 * output_shape[1] * h * w               # 通道均值、最大值 + 加权
+    return flops
+
+
+def time_cell(cell, x, runs, warmup=3):
+    """延迟中位数（毫秒）；前几次调用包含图编译，不计入"""
+    for _ in range(warmup):
+        cell(x).asnumpy()
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        cell(x).asnumpy()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times) * 1000)
+
+
+def profile(net, batch_size=1, runs=50):
+    """
+    逐单元剖析
+
+    Returns:
+        (rows, total_ms)；rows 为 [{'name', 'kind', 'params', 'flops', 'latency_ms', 'output_shape'}]，
+        注意力模块的数值同时包含在所属残差块中
+    """
+    x = Tensor(np.random.rand(batch_size, 1, 48, 48).astype(np.float32))
+    rows = []
+
+    def record(name, kind, cell, inputs, parts=None):
+        output = cell(inputs)
+        shape = tuple(output.shape)
+        parts = parts or [cell]
+        rows.append({
+            'name': name,
+            'kind': kind,
+            'params': sum(cell_params(part) for part in parts),
+            'flops': sum(cell_flops(part, (1,) + shape[1:]) for part in parts),
+            'latency_ms': time_cell(cell, inputs, runs),
+            'output_shape': list(shape[1:]),
+        })
+        return output
+
+    x = record('stem', 'stem', _Stem(net), x, parts=[net.conv1, net.bn1])
+    for i in range(1, 5):
+        layer = getattr(net, f'layer{i}')
+        for j in range(len(layer)):
+            block = layer[j]
+            name = f'layer{i}.{j}'
+            block_input = x
+            x = record(name, 'block', block, block_input)
+
+            out = _BlockBody(block)(block_input)
+            if block.use_channel_attention:
+                out = record(f'{name}.channel_attention', 'attention', block.channel_attention, out)
+            if block.use_spatial_attention:
+                record(f'{name}.spatial_attention', 'attention', block.spatial_attention, out)
+    record('classifier', 'classifier', _Head(net), x, parts=[net.classifier])
+
+    inputs = Tensor(np.random.rand(batch_size, 1, 48, 48).astype(np.float32))
+    total_ms = time_cell(net, inputs, runs)
+    return rows, total_ms
+
+
+def ablate_attention(net, rows, images, labels, batch_size):
+    """
+    逐个把注意力模块替换为 Identity 并评估准确率
+
+    Returns:
+        (baseline_accuracy, {模块名: 去掉后的准确率})
+    """
+    def accuracy():
+        logits = forward_logits(net, images, batch_size)
+        return float((logits.argmax(axis=1) == labels).mean())
+
+    baseline = accuracy()
+    results = {}
+    for row in rows:
+        if row['kind'] != 'attention':
+            continue
+        block_name, attr = row['name'].rsplit('.', 1)
+        layer_name, index = block_name.split('.')
+        block = getattr(net, layer_name)[int(index)]
+        original = getattr(block, attr)
+        setattr(block, attr, nn.Identity())
+        results[row['name']] = accuracy()
+        setattr(block, attr, original)
+        # 重新挂载会丢失参数名的层级前缀，按层级路径恢复，避免图模式下参数重名
+        for name, param in net.parameters_and_names():
+            param.name = name
+        print(f"  {row['name']:<32} {results[row['name']]:.2%} ({(results[row['name']] - baseline) * 100:+.2f}pp)")
+    return baseline, results
+
+
+def suggest_placement(net, ablation, baseline, min_gain):
+    """去掉后准确率下降不超过 min_gain 的注意力模块都移除，返回 --attention 放置代码"""
+    codes = []
+    for i in range(1, 5):
+        layer = getattr(net, f'layer{i}')
+        for j in range(len(layer)):
+            block = layer[j]
+            code = ''
+            for flag, attr, letter in ((block.use_channel_attention, 'channel_attention', 'c'),
+                                       (block.use_spatial_attention, 'spatial_attention', 's')):
+                name = f'layer{i}.{j}.{attr}'
+                if flag and baseline - ablation.get(name, 0.0) > min_gain:
+                    code += letter
+            codes.append(code or '-')
+    return ','.join(codes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SimpleCNN 逐层剖析：参数量、FLOPs、CPU 延迟与注意力模块消融')
+    parser.add_argument('--ckpt_path', type=str, default=None, help='检查点路径（不给时按结构参数随机初始化）')
+    parser.add_argument('--width', type=float, default=1.0, help='宽度系数（无检查点时）')
+    parser.add_argument('--depth', type=str, default='2', help='每个 stage 的残差块数（无检查点时）')
+    parser.add_argument('--attention', type=str, default='all',
+                        help=f"注意力放置（无检查点时）：{'/'.join(ATTENTION_PLACEMENTS)} 或逐块代码")
+    parser.add_argument('--reduction', type=int, default=16)
+    parser.add_argument('--spatial_kernel', type=int, default=7)
+    parser.add_argument('--batch_size', type=int, default=1, help='延迟测试的批大小（同时检测到的人脸数）')
+    parser.add_argument('--runs', type=int, default=50, help='每个单元的计时次数')
+    parser.add_argument('--no_optimize', action='store_true', help='不折叠 BatchNorm（默认按推理图剖析）')
+    parser.add_argument('--data_csv', type=str, default=None, help='fer2013.csv 路径，给出时做注意力消融')
+    parser.add_argument('--eval_samples', type=int, default=2000, help='消融评估使用的 PublicTest 样本数')
+    parser.add_argument('--min_gain', type=float, default=0.002, help='保留注意力模块所需的最小准确率贡献')
+    parser.add_argument('--output', type=str, default=None, help='结果 JSON 保存路径')
+    args = parser.parse_args()
+
+    context.set_context(mode=context.GRAPH_MODE, device_target='CPU')
+
+    if args.ckpt_path:
+        param_dict, _ = load_param_dict(args.ckpt_path)
+        net, architecture = build_network(param_dict)
+        if architecture not in ('simple_cnn', 'simple_cnn_config'):
+            raise ValueError(f"Profiling supports SimpleCNN checkpoints only, got {architecture}")
+        channels = (decode_arch_config(param_dict) or {}).get('channels')
+    else:
+        depth = [int(d) for d in args.depth.split(',')]
+        channels = architecture_channels(width=args.width, depth=depth if len(depth) > 1 else depth[0],
+                                         attention=args.attention, reduction=args.reduction,
+                                         spatial_kernel=args.spatial_kernel)
+        net = SimpleCNN(7, channels=channels)
+        net.set_train(False)
+    if channels is None:
+        channels = architecture_channels()
+    if not args.no_optimize:
+        net, _ = optimize_for_inference(net)
+
+    print(f"[INFO] Architecture: {architecture_summary(channels)}")
+    print(f"[INFO] Profiling with batch size {args.batch_size} ({args.runs} runs per cell)...")
+    rows, total_ms = profile(net, args.batch_size, args.runs)
+
+    ablation, baseline = {}, None
+    if args.data_csv:
+        from dataset import load_fer2013_split
+        images, labels = load_fer2013_split(args.data_csv, 'PublicTest')
+        images, labels = images[:args.eval_samples], labels[:args.eval_samples]
+        print(f"\n[INFO] Attention ablation on {len(labels)} PublicTest images:")
+        baseline, ablation = ablate_attention(net, rows, images, labels, 256)
+
+    total_params = sum(r['params'] for r in rows if r['kind'] != 'attention')
+    total_flops = sum(r['flops'] for r in rows if r['kind'] != 'attention')
+    header = f"{'Cell':<32} {'Params':>10} {'MFLOPs':>9} {'Latency(ms)':>12} {'Share':>7}"
+    if ablation:
+        header += f" {'Acc w/o':>9}"
+    print("\n" + header)
+    print("-" * len(header))
+    for r in rows:
+        indent = '  ' if r['kind'] == 'attention' else ''
+        line = (f"{indent + r['name']:<32} {r['params']:>10,} {r['flops'] / 1e6:>9.2f} "
+                f"{r['latency_ms']:>12.3f} {r['latency_ms'] / total_ms:>7.1%}")
+        if r['name'] in ablation:
+            r['accuracy_without'] = ablation[r['name']]
+            line += f" {(ablation[r['name']] - baseline) * 100:>+8.2f}pp"
+        print(line)
+    print("-" * len(header))
+    print(f"{'total (end-to-end)':<32} {total_params:>10,} {total_flops / 1e6:>9.2f} {total_ms:>12.3f}")
+
+    attention_rows = [r for r in rows if r['kind'] == 'attention']
+    attention_ms = sum(r['latency_ms'] for r in attention_rows)
+    attention_flops = sum(r['flops'] for r in attention_rows)
+    print(f"\n[INFO] Attention modules: {len(attention_rows)}, {attention_ms:.3f} ms "
+          f"({attention_ms / total_ms:.1%} of latency), {attention_flops / total_flops:.1%} of FLOPs")
+    print(f"[INFO] End-to-end: {1000 / total_ms:.0f} calls/s at batch {args.batch_size}")
+
+    result = {
+        'checkpoint': args.ckpt_path,
+        'architecture': architecture_summary(channels),
+        'channels': channels,
+        'batch_size': args.batch_size,
+        'optimized': not args.no_optimize,
+        'total': {'params': total_params, 'flops': total_flops, 'latency_ms': total_ms},
+        'cells': rows,
+    }
+    if ablation:
+        placement = suggest_placement(net, ablation, baseline, args.min_gain)
+        result['ablation'] = {'baseline_accuracy': baseline, 'samples': len(labels),
+                              'min_gain': args.min_gain, 'suggested_attention': placement}
+        print(f"[INFO] Baseline accuracy: {baseline:.2%}; attention modules contributing more than "
+              f"{args.min_gain * 100:.2f}pp: --attention {placement}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        print(f"[SAVE] Results saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()